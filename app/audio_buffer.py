@@ -0,0 +1,235 @@
+"""
+録音バッファ（上限までメモリ、超えた分は一時ファイルへ）
+
+録音コールバックから呼ばれるため、append() は確保済み配列へのコピーだけを行う。
+上限を超えた録音は埋まったブロックごとに書き出しスレッドへ渡して一時ファイルに
+書き、読み出し側には memmap を渡すので、長時間の録音でもプロセスのメモリ使用量は
+増えず、コールバックがディスク I/O を待つこともない。
+close() も書き出しスレッドに閉じるよう頼むだけで待たない。書き出しを待つのは view() だけなので、
+view() はコールバックの外（文字起こしのスレッドなど）で呼ぶ。
+"""
+
+import collections
+import logging
+import queue
+import tempfile
+import threading
+from pathlib import Path
+from typing import IO, Any, Deque, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+logger = logging.getLogger("voice_input")
+
+_DTYPE = np.dtype(np.float32)
+# 一時ファイルへ書き出す単位（秒）と、あらかじめ確保しておくブロック数
+_BLOCK_SECONDS = 1.0
+_SPARE_BLOCKS = 4
+
+# (種類 "write" / "flush" / "close", 対象のバッファ, 書くブロックか書き終えたら知らせるイベント)
+_Job = Tuple[str, "AudioBuffer", Any]
+
+
+class _SpillWriter:
+    """全バッファで共有する書き出しスレッド（依頼を受けた順に一時ファイルへ書く）"""
+
+    def __init__(self) -> None:
+        self._queue: "queue.SimpleQueue[_Job]" = queue.SimpleQueue()
+        thread = threading.Thread(target=self._run, name="audio-spill", daemon=True)
+        thread.start()
+
+    def write(self, buffer: "AudioBuffer", block: npt.NDArray[np.float32]) -> None:
+        self._queue.put(("write", buffer, block))
+
+    def flush(self, buffer: "AudioBuffer") -> None:
+        """それまでに渡したブロックを書き終えるまで待つ"""
+        done = threading.Event()
+        self._queue.put(("flush", buffer, done))
+        done.wait()
+
+    def close(self, buffer: "AudioBuffer") -> None:
+        """それまでに渡したブロックを書き終えたら一時ファイルを閉じる（待たない）"""
+        self._queue.put(("close", buffer, None))
+
+    def _run(self) -> None:
+        while True:
+            kind, buffer, payload = self._queue.get()
+            if kind == "write":
+                buffer._write_block(payload)
+            elif kind == "flush":
+                payload.set()
+            else:
+                buffer._close_file()
+
+
+_writer: Optional[_SpillWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _spill_writer() -> _SpillWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _SpillWriter()
+        return _writer
+
+
+class AudioBuffer:
+    """1回の録音ぶんのモノラル float32 バッファ（書き込みは録音コールバックのみ）"""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        max_memory_bytes: int,
+        max_seconds: float,
+        spill_dir: Optional[Path] = None,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.max_frames = int(max_seconds * sample_rate)
+        self._spill_dir = spill_dir
+        # 書き込むまで物理メモリは割り当てられない
+        self._memory = np.empty(
+            min(max_memory_bytes // _DTYPE.itemsize, self.max_frames), dtype=_DTYPE
+        )
+        # 書き出し中は _memory の代わりに _block へ書き、埋まったら書き出しスレッドへ渡す
+        self._block: Optional[npt.NDArray[np.float32]] = None
+        self._block_frames = 0
+        self._spare: Deque[npt.NDArray[np.float32]] = collections.deque()
+        self._block_size = max(1, int(_BLOCK_SECONDS * sample_rate))
+        self._file: Optional[IO[bytes]] = None
+        self._error: Optional[OSError] = None
+        self._frames = 0
+        self._lock = threading.Lock()
+        # 書き出しスレッドはコールバックの外（ここ）で用意しておく
+        self._writer = _spill_writer() if len(self._memory) < self.max_frames else None
+
+    def __len__(self) -> int:
+        return self._frames
+
+    @property
+    def seconds(self) -> float:
+        """録音済みの長さ（秒）"""
+        return self._frames / self.sample_rate
+
+    @property
+    def spilled(self) -> bool:
+        """一時ファイルに書き出しているか"""
+        return self._block is not None
+
+    @property
+    def full(self) -> bool:
+        """最大録音時間に達したか"""
+        return self._frames >= self.max_frames
+
+    def append(self, chunk: npt.NDArray[np.float32]) -> bool:
+        """
+        録音データを追記する（多チャンネルは先頭チャンネルのみ）。
+        最大録音時間を超えた分は捨て、上限に達したら False を返す。
+        """
+        samples = chunk[:, 0] if chunk.ndim > 1 else chunk
+        with self._lock:
+            room = self.max_frames - self._frames
+            if len(samples) > room:
+                samples = samples[:room]
+            if self._block is None and self._frames + len(samples) > len(self._memory):
+                self._spill()
+            if self._block is None:
+                self._memory[self._frames : self._frames + len(samples)] = samples
+            else:
+                self._append_blocks(samples)
+            self._frames += len(samples)
+            return self._frames < self.max_frames
+
+    def _spill(self) -> None:
+        """メモリ上の録音を書き出しスレッドへ渡し、以降はブロックに書く"""
+        assert self._writer is not None
+        if self._frames:
+            self._writer.write(self, self._memory[: self._frames])
+        self._memory = np.empty(0, dtype=_DTYPE)
+        self._block = self._take_block()
+
+    def _append_blocks(self, samples: npt.NDArray[np.float32]) -> None:
+        assert self._writer is not None and self._block is not None
+        while len(samples):
+            n = min(len(samples), len(self._block) - self._block_frames)
+            self._block[self._block_frames : self._block_frames + n] = samples[:n]
+            self._block_frames += n
+            samples = samples[n:]
+            if self._block_frames == len(self._block):
+                self._writer.write(self, self._block)
+                self._block = self._take_block()
+                self._block_frames = 0
+
+    def _take_block(self) -> npt.NDArray[np.float32]:
+        """書き終えたブロックを使い回す（書き出しが遅れている間だけ新しく確保する）"""
+        try:
+            return self._spare.popleft()
+        except IndexError:
+            return np.empty(self._block_size, dtype=_DTYPE)
+
+    def _write_block(self, block: npt.NDArray[np.float32]) -> None:
+        """書き出しスレッドで呼ばれる"""
+        try:
+            if self._file is None:
+                # 名前を持たない一時ファイル（閉じるかプロセスが終われば消える）
+                self._file = tempfile.TemporaryFile(prefix="stt-audio-", dir=self._spill_dir)
+            if self._error is None:
+                self._file.write(block.tobytes())
+        except OSError as e:
+            if self._error is None:
+                logger.error(f"録音の一時ファイルへの書き出しに失敗しました: {e}")
+            self._error = e
+        # _take_block() で確保したブロックだけを使い回す（メモリ上の録音の切り出しは捨てる）
+        if (
+            block.base is None
+            and len(block) == self._block_size
+            and len(self._spare) < _SPARE_BLOCKS
+        ):
+            self._spare.append(block)
+
+    def view(self) -> npt.NDArray[np.float32]:
+        """
+        録音全体をコピーせずに返す（一時ファイルの場合は読み取り専用の memmap）。
+        書き出しスレッドに渡したブロックを書き終えるまで待つ（録音コールバックからは呼ばない）。
+        書き出しに失敗していたら、そのときの OSError を送出する（録音は失われている）。
+        """
+        with self._lock:
+            if self._block is None:
+                return self._memory[: self._frames]
+            assert self._writer is not None
+            if self._block_frames:
+                # 途中まで埋まったブロックはコピーして渡す（以降の追記はそのまま続けられる）
+                self._writer.write(self, self._block[: self._block_frames].copy())
+                self._block_frames = 0
+            frames = self._frames
+        # 待つ間はロックを持たない（録音中でも append() を止めない）
+        self._writer.flush(self)
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            if not frames or self._file is None:
+                return np.empty(0, dtype=_DTYPE)
+            self._file.flush()
+            return np.memmap(self._file, dtype=_DTYPE, mode="r", shape=(frames,))
+
+    def close(self) -> None:
+        """
+        一時ファイルを閉じる（view() で返した memmap は参照が残る間は有効）。
+        書きかけのブロックは書き出しスレッドが書き終えてから閉じるので、ここでは待たない
+        """
+        with self._lock:
+            if self._block is not None:
+                assert self._writer is not None
+                self._writer.close(self)
+                self._block = None
+                self._block_frames = 0
+                self._spare.clear()
+            self._memory = np.empty(0, dtype=_DTYPE)
+            self._frames = 0
+
+    def _close_file(self) -> None:
+        """書き出しスレッドで呼ばれる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,223 @@
+"""
+録音経路の健全性の計測とブロックサイズのキャリブレーション
+
+AudioHealth は入力ストリームのコールバックを包み、入力のオーバーフロー・アンダーフローの
+回数、コールバック1回の処理時間、コールバック間隔の揺れ（期待間隔 = ブロック長との差）を
+数えてメトリクスに出す。記録はコールバックスレッドからのみ行い、数値の加算だけで済ませる。
+
+calibrate() は現在の入力デバイスでいくつかの blocksize / latency の組み合わせを試し、
+オーバーフローしない中で最もレイテンシの小さいものを選ぶ。結果はデバイス名ごとに
+settings.json の audio_calibration に保存され、以降の録音ストリームに使われる。
+
+    python main.py calibrate-audio
+"""
+
+import argparse
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.config import config
+from app.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger("voice_input")
+
+# コールバック処理時間・間隔の揺れのヒストグラムのバケット上限（ミリ秒）
+CALLBACK_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+# 試す (blocksize, latency) の組み合わせ（blocksize 0 はデバイス任せの可変長）
+CALIBRATION_CANDIDATES: Tuple[Tuple[int, Union[str, float]], ...] = (
+    (128, "low"),
+    (256, "low"),
+    (512, "low"),
+    (1024, "low"),
+    (0, "low"),
+    (1024, "high"),
+    (0, "high"),
+)
+
+Callback = Callable[[Any, int, Any, Any], None]
+
+
+def _has_flag(status: Any, name: str) -> bool:
+    """sd.CallbackFlags（または記録から再生した文字列）にフラグが立っているか"""
+    value = getattr(status, name, None)
+    if value is None:
+        return name.replace("_", " ") in str(status)
+    return bool(value)
+
+
+class AudioHealth:
+    """1本の入力ストリームのコールバック計測（記録はコールバックスレッドのみ）"""
+
+    def __init__(self, sample_rate: int, registry: Optional[MetricsRegistry] = metrics) -> None:
+        self.sample_rate = sample_rate
+        self._registry = registry
+        self.callbacks = 0
+        self.frames = 0
+        self.overflows = 0
+        self.underflows = 0
+        self.max_callback_ms = 0.0
+        self.total_callback_ms = 0.0
+        self.max_jitter_ms = 0.0
+        self.total_jitter_ms = 0.0
+        self._last_start: Optional[float] = None
+
+    @property
+    def mean_callback_ms(self) -> float:
+        return self.total_callback_ms / self.callbacks if self.callbacks else 0.0
+
+    @property
+    def mean_jitter_ms(self) -> float:
+        intervals = self.callbacks - 1
+        return self.total_jitter_ms / intervals if intervals > 0 else 0.0
+
+    @property
+    def mean_block_ms(self) -> float:
+        """1回のコールバックで届いた音声の平均の長さ（ミリ秒）"""
+        return self.frames / self.callbacks / self.sample_rate * 1000 if self.callbacks else 0.0
+
+    def wrap(self, callback: Callback) -> Callback:
+        """コールバックを計測付きで包む"""
+
+        def measured(indata: Any, frames: int, time_info: Any, status: Any) -> None:
+            start = time.perf_counter()
+            if status:
+                self._count_status(status)
+            if self._last_start is not None:
+                expected_ms = frames / self.sample_rate * 1000
+                jitter_ms = abs((start - self._last_start) * 1000 - expected_ms)
+                self.total_jitter_ms += jitter_ms
+                self.max_jitter_ms = max(self.max_jitter_ms, jitter_ms)
+                if self._registry:
+                    self._registry.observe(
+                        "stt_audio_callback_jitter_ms", jitter_ms, buckets=CALLBACK_BUCKETS_MS
+                    )
+            self._last_start = start
+            try:
+                callback(indata, frames, time_info, status)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.callbacks += 1
+                self.frames += frames
+                self.total_callback_ms += elapsed_ms
+                self.max_callback_ms = max(self.max_callback_ms, elapsed_ms)
+                if self._registry:
+                    self._registry.observe(
+                        "stt_audio_callback_ms", elapsed_ms, buckets=CALLBACK_BUCKETS_MS
+                    )
+
+        return measured
+
+    def _count_status(self, status: Any) -> None:
+        if _has_flag(status, "input_overflow"):
+            self.overflows += 1
+            if self._registry:
+                self._registry.inc("stt_audio_xruns_total", kind="input_overflow")
+        if _has_flag(status, "input_underflow"):
+            self.underflows += 1
+            if self._registry:
+                self._registry.inc("stt_audio_xruns_total", kind="input_underflow")
+
+    def summary(self) -> str:
+        return (
+            f"コールバック {self.callbacks}回 "
+            f"処理 平均{self.mean_callback_ms:.2f}ms 最大{self.max_callback_ms:.2f}ms / "
+            f"間隔の揺れ 平均{self.mean_jitter_ms:.2f}ms 最大{self.max_jitter_ms:.2f}ms / "
+            f"overflow {self.overflows} underflow {self.underflows}"
+        )
+
+
+def stream_settings(device: str) -> Dict[str, Any]:
+    """入力デバイスのキャリブレーション済みの blocksize / latency（未実施なら空）"""
+    return dict(config.snapshot.audio_calibration.get(device, {}))
+
+
+@dataclass
+class CalibrationTrial:
+    """1つの組み合わせを試した結果"""
+
+    blocksize: int
+    latency: Union[str, float]
+    latency_ms: float
+    overflows: int
+    callbacks: int
+    max_callback_ms: float
+    max_jitter_ms: float
+
+
+def calibrate(
+    stream_factory: Callable[..., Any],
+    sample_rate: int,
+    seconds: float = 2.0,
+    candidates: Sequence[Tuple[int, Union[str, float]]] = CALIBRATION_CANDIDATES,
+) -> Tuple[Optional[CalibrationTrial], List[CalibrationTrial]]:
+    """
+    各組み合わせで seconds 秒録音し、オーバーフローせずコールバックが届いた中で
+    入力レイテンシ（ストリームの報告値 + ブロック長）が最小のものを返す（なければ None）。
+    """
+    trials: List[CalibrationTrial] = []
+    for blocksize, latency in candidates:
+        health = AudioHealth(sample_rate, registry=None)
+        try:
+            stream = stream_factory(
+                samplerate=sample_rate,
+                channels=1,
+                dtype="float32",
+                blocksize=blocksize,
+                latency=latency,
+                callback=health.wrap(lambda *_: None),
+            )
+            stream.start()
+            time.sleep(seconds)
+            stream.stop()
+            stream.close()
+        except Exception as e:
+            logger.warning(f"[キャリブレーション] blocksize={blocksize} latency={latency}: {e}")
+            continue
+        trials.append(
+            CalibrationTrial(
+                blocksize=blocksize,
+                latency=latency,
+                latency_ms=float(stream.latency) * 1000 + health.mean_block_ms,
+                overflows=health.overflows,
+                callbacks=health.callbacks,
+                max_callback_ms=health.max_callback_ms,
+                max_jitter_ms=health.max_jitter_ms,
+            )
+        )
+    usable = [t for t in trials if t.overflows == 0 and t.callbacks > 0]
+    best = min(usable, key=lambda t: t.latency_ms) if usable else None
+    return best, trials
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """現在の入力デバイスをキャリブレーションして settings.json に保存する"""
+    import sounddevice as sd
+
+    parser = argparse.ArgumentParser(
+        prog="main.py calibrate-audio",
+        description="入力デバイスの blocksize / latency を計測して保存する",
+    )
+    parser.add_argument("--seconds", type=float, default=2.0, help="1つの組み合わせを試す秒数")
+    args = parser.parse_args(argv)
+
+    device = sd.query_devices(kind="input")["name"]
+    sample_rate = config.snapshot.sample_rate
+    print(f"デバイス: {device}（{sample_rate}Hz）")
+    best, trials = calibrate(sd.InputStream, sample_rate, args.seconds)
+
+    print(f"{'blocksize':>9} {'latency':>8} {'入力遅延ms':>10} {'overflow':>8} {'処理最大ms':>10}")
+    for t in trials:
+        print(
+            f"{t.blocksize:>9} {str(t.latency):>8} {t.latency_ms:>10.1f} "
+            f"{t.overflows:>8} {t.max_callback_ms:>10.2f}"
+        )
+    if best is None:
+        print("オーバーフローせずに録音できる組み合わせがありませんでした")
+        return 1
+
+    config.save_audio_calibration(device, {"blocksize": best.blocksize, "latency": best.latency})
+    print(f"保存しました: {asdict(best)}")
+    return 0
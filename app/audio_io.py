@@ -0,0 +1,66 @@
+"""
+音声ファイルの読み込みとサンプリングレート変換
+
+WAV は標準ライブラリの wave、FLAC は SpeechRecognition 同梱のデコーダで読む。
+"""
+
+import wave
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+AUDIO_SUFFIXES = (".wav", ".flac")
+
+
+def read_wav(path: Path) -> Tuple[npt.NDArray[np.float32], int]:
+    """WAV（PCM 8/16/24/32bit）を float32 の (frames, channels) 配列で読み込む"""
+    with wave.open(str(path), "rb") as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        rate = f.getframerate()
+        data = f.readframes(f.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)) | (
+            raw[:, 2].astype(np.int8).astype(np.int32) << 16
+        )
+        samples = ints.astype(np.float32) / (1 << 23)
+    else:
+        dtype = {2: np.int16, 4: np.int32}[width]
+        samples = np.frombuffer(data, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+    return samples.reshape(-1, channels), rate
+
+
+def read_flac(path: Path) -> Tuple[npt.NDArray[np.float32], int]:
+    """FLAC を SpeechRecognition（同梱の flac デコーダ）で読み込む"""
+    import speech_recognition as sr
+
+    with sr.AudioFile(str(path)) as source:
+        audio = sr.Recognizer().record(source)
+    samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16)
+    return (samples.astype(np.float32) / 32767).reshape(-1, 1), audio.sample_rate
+
+
+def load_audio(path: Path, sample_rate: int) -> npt.NDArray[np.float32]:
+    """音声ファイルをモノラル float32・指定サンプリングレートで読み込む"""
+    if path.suffix.lower() == ".flac":
+        frames, rate = read_flac(path)
+    else:
+        frames, rate = read_wav(path)
+    return resample(frames.mean(axis=1, dtype=np.float32), rate, sample_rate)
+
+
+def resample(
+    audio: npt.NDArray[np.float32], rate: int, sample_rate: int
+) -> npt.NDArray[np.float32]:
+    """サンプリングレートを変換する（線形補間。音声認識と効果音の用途には十分）"""
+    if rate == sample_rate or not len(audio):
+        return audio
+    count = int(round(len(audio) * sample_rate / rate))
+    positions = np.arange(count, dtype=np.float64) * (rate / sample_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
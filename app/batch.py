@@ -0,0 +1,148 @@
+"""
+ヘッドレス一括文字起こし（`python main.py batch`）
+
+WAV / FLAC ファイルをディレクトリまたはマニフェストから読み込み、対話モードと同じ
+パイプライン（STT → Gemini補正 → ワード変換）で処理して JSONL に書き出す。
+ファイルごとの処理はプロセスプールで並列に実行する。macOS 専用モジュールは読み込まない。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.audio_io import AUDIO_SUFFIXES, load_audio
+from app.pipeline import create_default_pipeline
+
+# ワーカープロセスごとのパイプライン（初期化時に1回だけ作成）
+_pipeline: Any = None
+
+
+def collect_inputs(source: Path) -> List[Path]:
+    """
+    入力ファイルの一覧を返す。
+    source がディレクトリなら配下の WAV / FLAC を、ファイルならマニフェスト
+    （1行1パス・空行と # 始まりは無視・相対パスはマニフェストの場所から解決）として読む。
+    """
+    if source.is_dir():
+        return sorted(
+            p for p in source.rglob("*") if p.is_file() and p.suffix.lower() in AUDIO_SUFFIXES
+        )
+    paths = []
+    for line in source.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        path = Path(line).expanduser()
+        paths.append(path if path.is_absolute() else source.parent / path)
+    return paths
+
+
+def _init_worker(pipeline_factory: Callable[[], Any]) -> None:
+    """ワーカープロセスの初期化（パイプラインを1回だけ作る）"""
+    global _pipeline
+    # ワーカー内の print が標準出力の JSONL に混ざらないようにする
+    sys.stdout = sys.stderr
+    _pipeline = pipeline_factory()
+
+
+def _process_file(path: str, sample_rate: int) -> Dict[str, Any]:
+    """1ファイルを処理して JSONL の1行分を返す（ワーカープロセスで実行）"""
+    record: Dict[str, Any] = {"path": path}
+    try:
+        audio = load_audio(Path(path), sample_rate)
+        result = _pipeline.process(audio)
+        record.update(asdict(result))
+        record["text"] = result.text
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def run_batch(
+    inputs: Iterable[Path],
+    output: IO[str],
+    workers: int,
+    sample_rate: int,
+    pipeline_factory: Callable[[], Any] = create_default_pipeline,
+) -> Dict[str, float]:
+    """
+    inputs を並列に処理し、完了した順に JSONL を output に書き出す。
+    未完了のタスクは workers の2倍までに抑え、大きなマニフェストでもメモリを使いすぎない。
+    処理件数・失敗件数・音声秒数・経過秒数を返す。
+    """
+    stats = {"files": 0, "errors": 0, "audio_seconds": 0.0, "elapsed": 0.0}
+    start = time.perf_counter()
+    max_pending = workers * 2
+
+    def drain(pending: Set[Future]) -> Set[Future]:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            record = future.result()
+            stats["files"] += 1
+            if "error" in record:
+                stats["errors"] += 1
+            stats["audio_seconds"] += record.get("audio_seconds", 0.0)
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return pending
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(pipeline_factory,)
+    ) as pool:
+        pending: Set[Future] = set()
+        for path in inputs:
+            while len(pending) >= max_pending:
+                pending = drain(pending)
+            pending.add(pool.submit(_process_file, str(path), sample_rate))
+        while pending:
+            pending = drain(pending)
+
+    output.flush()
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def format_throughput(stats: Dict[str, float]) -> str:
+    """処理速度の要約（1行）"""
+    elapsed = max(stats["elapsed"], 1e-9)
+    return (
+        f"[batch] {int(stats['files'])} files ({int(stats['errors'])} errors), "
+        f"{stats['audio_seconds']:.1f}s audio in {stats['elapsed']:.1f}s: "
+        f"{stats['files'] / elapsed:.2f} files/s, "
+        f"{stats['audio_seconds'] / elapsed:.2f}x realtime"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """`python main.py batch <source> [-o results.jsonl] [-j workers]`"""
+    parser = argparse.ArgumentParser(
+        prog="main.py batch", description="WAV / FLAC を一括で文字起こしして JSONL に書き出す"
+    )
+    parser.add_argument("source", type=Path, help="音声ファイルのディレクトリ、またはマニフェスト")
+    parser.add_argument("-o", "--output", type=Path, help="結果の JSONL（省略時は標準出力）")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="並列ワーカー数",
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers は 1 以上を指定してください")
+
+    from app.config import config
+
+    inputs = collect_inputs(args.source)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            stats = run_batch(inputs, output, args.workers, config.snapshot.sample_rate)
+    else:
+        stats = run_batch(inputs, sys.stdout, args.workers, config.snapshot.sample_rate)
+    print(format_throughput(stats), file=sys.stderr)
+    return 1 if stats["errors"] else 0
@@ -0,0 +1,349 @@
+"""
+ワード変換ルールのコンパイル済みバイナリ辞書（mmap で読み込む）
+
+CSV を毎回パースすると数十万件規模の辞書で起動が遅くなるため、
+ルールをソート済み文字列テーブルとしてバイナリ化し、起動時は mmap するだけにする。
+
+ファイルレイアウト（ネイティブエンディアン、先頭の BOM で検証）:
+    ヘッダ        : _HEADER
+    ルール表      : count × (input_off, input_len, output_off, output_len)  u32
+    ソート済み索引 : count × ルール番号（入力の UTF-8 バイト列順）        u32
+    文字列ブロブ   : UTF-8 バイト列
+"""
+
+import bisect
+import csv
+import hashlib
+import heapq
+import io
+import mmap
+import os
+import struct
+from array import array
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+MAGIC = b"SWRD"
+FORMAT_VERSION = 1
+_BOM = 0x01020304
+
+# magic, version, reserved, bom, count, max_key_bytes, source_size, source_mtime_ns, source_hash
+_HEADER = struct.Struct("=4sHHIIIqq32s")
+# ヘッダ内の source_size, source_mtime_ns の位置
+_STAMP = struct.Struct("=qq")
+_STAMP_OFFSET = struct.calcsize("=4sHHIII")
+_FIELDS_PER_RULE = 4
+
+
+def hash_bytes(data: bytes) -> bytes:
+    """CSV 内容のハッシュ（SHA-256）を返す"""
+    return hashlib.sha256(data).digest()
+
+
+def hash_file(path: Path) -> bytes:
+    """ファイル全体を読み込まずにハッシュを計算する"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.digest()
+
+
+def parse_csv(data: bytes) -> List[Tuple[str, str]]:
+    """CSV バイト列からルールを読み込む（input,output 形式）"""
+    rules: List[Tuple[str, str]] = []
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""))
+    for row in reader:
+        input_word = (row.get("input") or "").strip()
+        output_word = (row.get("output") or "").strip()
+        if input_word:
+            rules.append((input_word, output_word))
+    return rules
+
+
+def format_csv(rules: List[Tuple[str, str]]) -> bytes:
+    """ルールを CSV バイト列に変換する"""
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf)
+    writer.writerow(["input", "output"])
+    for input_word, output_word in rules:
+        writer.writerow([input_word, output_word])
+    return buf.getvalue().encode("utf-8")
+
+
+class CompiledDictionary:
+    """ソート済み文字列テーブルによるワード変換辞書（読み取り専用・スレッドセーフ）"""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap], mm: Optional[mmap.mmap] = None) -> None:
+        if len(buffer) < _HEADER.size:
+            raise ValueError("辞書ファイルが壊れています")
+        (
+            magic,
+            version,
+            _reserved,
+            bom,
+            self._count,
+            self._max_key_bytes,
+            self.source_size,
+            self.source_mtime_ns,
+            self.source_hash,
+        ) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or bom != _BOM:
+            raise ValueError("辞書ファイルの形式が一致しません")
+
+        self._buffer = buffer
+        self._mm = mm
+        self._view = memoryview(buffer)
+        table_start = _HEADER.size
+        index_start = table_start + self._count * _FIELDS_PER_RULE * 4
+        self._blob_start = index_start + self._count * 4
+        if len(buffer) < self._blob_start:
+            raise ValueError("辞書ファイルが壊れています")
+        self._table = self._view[table_start:index_start].cast("I")
+        self._index = self._view[index_start : self._blob_start].cast("I")
+
+    # ========== 生成 ==========
+
+    @staticmethod
+    def build(
+        rules: List[Tuple[str, str]],
+        source_hash: bytes = b"\0" * 32,
+        source_size: int = 0,
+        source_mtime_ns: int = 0,
+    ) -> bytes:
+        """ルール一覧からバイナリ辞書を生成する"""
+        blob = bytearray()
+        table = array("I")
+        keys: List[bytes] = []
+        for input_word, output_word in rules:
+            in_bytes = input_word.encode("utf-8")
+            out_bytes = output_word.encode("utf-8")
+            table.extend((len(blob), len(in_bytes), len(blob) + len(in_bytes), len(out_bytes)))
+            blob += in_bytes
+            blob += out_bytes
+            keys.append(in_bytes)
+
+        index = array("I", sorted(range(len(keys)), key=keys.__getitem__))
+        max_key_bytes = max((len(k) for k in keys), default=0)
+        header = _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            0,
+            _BOM,
+            len(keys),
+            max_key_bytes,
+            source_size,
+            source_mtime_ns,
+            source_hash,
+        )
+        return header + table.tobytes() + index.tobytes() + bytes(blob)
+
+    @classmethod
+    def from_rules(cls, rules: List[Tuple[str, str]]) -> "CompiledDictionary":
+        """メモリ上にだけ存在する辞書を作成する"""
+        return cls(cls.build(rules))
+
+    @classmethod
+    def open(cls, path: Path) -> "CompiledDictionary":
+        """バイナリ辞書を mmap で開く"""
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mm, mm)
+        except ValueError:
+            mm.close()
+            raise
+
+    @classmethod
+    def compile(
+        cls,
+        csv_data: bytes,
+        stat: os.stat_result,
+        out_path: Path,
+        rules: Optional[List[Tuple[str, str]]] = None,
+    ) -> None:
+        """
+        CSV をコンパイルしてバイナリ辞書をアトミックに書き出す。
+        rules に csv_data をパースした結果と同じルールを渡すとパースを省く。
+        """
+        if rules is None:
+            rules = parse_csv(csv_data)
+        data = cls.build(rules, hash_bytes(csv_data), stat.st_size, stat.st_mtime_ns)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        # 他プロセスが mmap 中でも旧 inode はそのまま有効
+        os.replace(tmp_path, out_path)
+
+    @staticmethod
+    def restamp(path: Path, stat: os.stat_result) -> None:
+        """
+        内容が同じ CSV のサイズと更新時刻をヘッダに書き直す（次回の起動でハッシュを計算しない）。
+        他プロセスが mmap 中でも、書き換えるのはヘッダのこの2つの値だけ。
+        """
+        with open(path, "r+b") as f:
+            f.seek(_STAMP_OFFSET)
+            f.write(_STAMP.pack(stat.st_size, stat.st_mtime_ns))
+
+    def is_fresh_for(self, stat: os.stat_result) -> bool:
+        """CSV のサイズと更新時刻が生成時と一致するか（ハッシュ計算前の高速判定）"""
+        return self.source_size == stat.st_size and self.source_mtime_ns == stat.st_mtime_ns
+
+    # ========== 参照 ==========
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def max_key_bytes(self) -> int:
+        """最長の入力の UTF-8 バイト数"""
+        return self._max_key_bytes
+
+    def _slice(self, off: int, length: int) -> bytes:
+        start = self._blob_start + off
+        return self._buffer[start : start + length]
+
+    def _key(self, pos: int) -> bytes:
+        """ソート済み索引 pos 番目の入力バイト列"""
+        base = self._index[pos] * _FIELDS_PER_RULE
+        return self._slice(self._table[base], self._table[base + 1])
+
+    def rule(self, i: int) -> Tuple[str, str]:
+        """i 番目のルールを返す"""
+        base = i * _FIELDS_PER_RULE
+        t = self._table
+        return (
+            self._slice(t[base], t[base + 1]).decode("utf-8"),
+            self._slice(t[base + 2], t[base + 3]).decode("utf-8"),
+        )
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for i in range(self._count):
+            yield self.rule(i)
+
+    def sorted_rules(self) -> Sequence[int]:
+        """入力の昇順（同じ入力はルール番号順）に並べたルール番号（ソート済み索引そのもの）"""
+        return self._index
+
+    def search(self, query: str) -> List[int]:
+        """
+        入力か出力に query を含むルール番号を昇順で返す。
+        ルールを1件ずつデコードせず、文字列ブロブを直接検索して一致位置からルールを引く。
+        """
+        needle = query.encode("utf-8")
+        if not needle or not self._count:
+            return []
+        t = self._table
+        # 各ルールの入力の開始位置（ブロブにはルール番号順に並ぶので単調増加）
+        starts = t[0::_FIELDS_PER_RULE]
+        found: List[int] = []
+        pos = self._buffer.find(needle, self._blob_start)
+        while pos != -1:
+            off = pos - self._blob_start
+            i = bisect.bisect_right(starts, off) - 1
+            base = i * _FIELDS_PER_RULE
+            end = off + len(needle)
+            out_start = t[base + 2]
+            out_end = out_start + t[base + 3]
+            # 入力と出力の境界や、隣のルールとの境界をまたぐ一致は数えない
+            if end <= t[base] + t[base + 1] or (off >= out_start and end <= out_end):
+                found.append(i)
+                pos = self._buffer.find(needle, self._blob_start + out_end)
+            else:
+                pos = self._buffer.find(needle, pos + 1)
+        return found
+
+    def _lower_bound(self, prefix: bytes, lo: int, hi: int) -> int:
+        """キー >= prefix となる最初の位置"""
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _prefix_end(self, prefix: bytes, lo: int, hi: int) -> int:
+        """[lo, hi) のうち prefix で始まるキーの終端位置"""
+        n = len(prefix)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[:n] <= prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def has_longer_key_with_prefix(self, prefix: str) -> bool:
+        """prefix で始まり prefix より長い入力があるか（続きの文字次第で一致しうるか）"""
+        data = prefix.encode("utf-8")
+        lo = self._lower_bound(data, 0, self._count)
+        hi = self._prefix_end(data, lo, self._count)
+        # prefix と完全一致するキーは範囲の先頭に並ぶので、末尾が最も長い候補
+        return hi > lo and len(self._key(hi - 1)) > len(data)
+
+    def _find_candidates(self, text: str) -> Set[int]:
+        """text に部分文字列として含まれる入力を持つルール番号を返す"""
+        found: Set[int] = set()
+        if not self._count:
+            return found
+        data = text.encode("utf-8")
+        size = len(data)
+        for start in range(size):
+            if data[start] & 0xC0 == 0x80:
+                continue  # UTF-8 継続バイト
+            lo, hi = 0, self._count
+            end = start
+            while lo < hi and end < size and end - start < self._max_key_bytes:
+                end += 1
+                while end < size and data[end] & 0xC0 == 0x80:
+                    end += 1
+                prefix = data[start:end]
+                lo = self._lower_bound(prefix, lo, hi)
+                hi = self._prefix_end(prefix, lo, hi)
+                # prefix と完全一致するキーは範囲の先頭に並ぶ
+                pos = lo
+                while pos < hi and self._table[self._index[pos] * _FIELDS_PER_RULE + 1] == len(
+                    prefix
+                ):
+                    found.add(self._index[pos])
+                    pos += 1
+        return found
+
+    def apply(self, text: str, trace: Optional[List[str]] = None) -> str:
+        """
+        ルールを番号順に適用する（str.replace を全ルールに順番に適用した結果と一致）。
+        text に含まれる入力だけを索引で探すため、辞書サイズにほぼ依存しない。
+        trace を渡すと、ルール適用で変化するたびの中間テキストを追記する。
+        """
+        if not text:
+            return text
+        heap = list(self._find_candidates(text))
+        heapq.heapify(heap)
+        last = -1
+        while heap:
+            i = heapq.heappop(heap)
+            if i <= last:
+                continue
+            last = i
+            input_word, output_word = self.rule(i)
+            replaced = text.replace(input_word, output_word)
+            if replaced == text:
+                continue
+            text = replaced
+            if trace is not None:
+                trace.append(text)
+            # 置換結果で新たに現れた入力を、後続のルールだけを対象に探し直す
+            heap = [j for j in self._find_candidates(text) if j > i]
+            heapq.heapify(heap)
+        return text
+
+    def close(self) -> None:
+        """mmap を解放する"""
+        self._table.release()
+        self._index.release()
+        self._view.release()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
@@ -7,10 +7,10 @@ import os
 import sys
 import threading
 from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Set
 
-from dotenv import load_dotenv, set_key
+from dotenv import dotenv_values, load_dotenv, set_key
 from pydantic import BaseModel, Field, PrivateAttr
-from pynput.keyboard import Key
 
 
 def _get_env_path() -> Path:
@@ -20,10 +20,6 @@ def _get_env_path() -> Path:
     return Path(__file__).parent.parent / "__generated__" / ".env"
 
 
-# 起動時に .env を読み込む
-load_dotenv(_get_env_path())
-
-
 def _get_user_data_dir() -> Path:
     """バンドル時は Application Support、開発時は __generated__ を返す"""
     if getattr(sys, "frozen", False):
@@ -38,20 +34,189 @@ def _get_config_dir() -> Path:
     return Path(__file__).parent.parent / "config"
 
 
+# settings.json に保存する項目（AppConfig のフィールド名）
+_SETTINGS_KEYS = (
+    "hotkey_profiles",
+    "gemini_models",
+    "gemini_output_token_ratio",
+    "gemini_max_output_tokens",
+    "gemini_thinking_budget",
+    "sound_enabled",
+    "sound_start_file",
+    "sound_stop_file",
+    "record_max_memory_bytes",
+    "record_max_seconds",
+    "vad_threshold",
+    "vad_silence_ms",
+    "audio_calibration",
+    "settings_prewarm",
+    "log_max_bytes",
+    "log_backup_count",
+    "log_rotate_when",
+    "log_queue_size",
+    "history_enabled",
+    "history_store_audio",
+    "metrics_port",
+    "profile_enabled",
+    "profile_min_ms",
+    "profile_interval_ms",
+    "profile_max_bytes",
+    "pipeline_worker",
+    "slo_target_ms",
+    "slo_recover_ratio",
+    "slo_max_queue",
+    "learn_corrections",
+    "learn_min_count",
+    "learn_auto_promote",
+    "service_url",
+    "service_port",
+    "service_max_concurrency",
+)
+
 # デフォルトのフォールバックプロンプト（prompts.jsonが読めない場合のみ使用）
 _FALLBACK_PROMPT = (
     "以下のテキストを補正してください。補正後のテキストのみを出力してください：\n{text}"
 )
 
 
+class HotkeyProfile(BaseModel):
+    """
+    ホットキーごとの文字起こしの設定。
+    例えば右 Command は Gemini補正あり、右 Option は STT + ワード変換だけ（ネットワーク補正なし）。
+    """
+
+    hotkey: str = Field(default="cmd_r", description="pynput.keyboard.Key の名前")
+    name: str = Field(default="", description="表示・ログ用の名前")
+    gemini: bool = Field(default=True, description="Gemini補正を使う（API キー未設定なら使わない）")
+    language: str = Field(default="", description="言語（空なら language 設定）")
+    insertion: Literal["type", "chunked"] = Field(
+        default="type",
+        description="入力方法（type: 1文字ずつ、chunked: 最大20文字ずつのキーイベント）",
+    )
+
+    @property
+    def label(self) -> str:
+        return self.name or self.hotkey
+
+    class Config:
+        frozen = True
+
+
+class GeminiModel(BaseModel):
+    """
+    Gemini補正に使うモデル。tier が小さいほど品質が高く、同じ tier の中で
+    直近の応答時間が最も短いモデルを使う（app/model_router.py）。
+    """
+
+    name: str = Field(description="モデル名（例: gemini-2.0-flash）")
+    tier: int = Field(default=0, ge=0, description="品質の段階（小さいほど優先）")
+    thinking_budget: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="このモデルの思考トークン数の上限（省略時は gemini_thinking_budget）",
+    )
+
+    class Config:
+        frozen = True
+
+
+class ConfigSnapshot(BaseModel):
+    """
+    ホットパス用の不変な設定スナップショット。
+    録音・文字起こし・補正の処理中はこれだけを参照し、ファイルやロックに触れない。
+    フィールドは AppConfig の同名フィールドからコピーされる。
+    """
+
+    version: int
+    hotkey: str
+    hotkey_profiles: List[HotkeyProfile]
+    sample_rate: int
+    language: str
+    min_duration: float
+    record_max_memory_bytes: int
+    record_max_seconds: float
+    vad_threshold: float
+    vad_silence_ms: int
+    audio_calibration: Dict[str, Dict[str, Any]]
+    gemini_api_key: str
+    gemini_model: str
+    gemini_models: List[GeminiModel]
+    gemini_timeout: int
+    gemini_prompt: str
+    gemini_output_token_ratio: float
+    gemini_max_output_tokens: int
+    gemini_thinking_budget: int
+    sound_enabled: bool
+    sound_start_file: str
+    sound_stop_file: str
+    history_enabled: bool
+    history_store_audio: bool
+    profile_enabled: bool
+    profile_min_ms: float
+    profile_interval_ms: float
+    profile_max_bytes: int
+    slo_target_ms: float
+    slo_recover_ratio: float
+    slo_max_queue: int
+    learn_corrections: bool
+    learn_min_count: int
+    learn_auto_promote: bool
+
+    @property
+    def gemini_enabled(self) -> bool:
+        """Gemini補正機能の有効/無効（APIキーとモデルが両方設定されていれば有効）"""
+        return bool(self.gemini_api_key) and bool(self.gemini_model or self.gemini_models)
+
+    @property
+    def active_hotkey_profiles(self) -> List[HotkeyProfile]:
+        """使うホットキーの一覧（hotkey_profiles が空なら hotkey だけの標準の設定）"""
+        return self.hotkey_profiles or [HotkeyProfile(hotkey=self.hotkey)]
+
+    @property
+    def active_gemini_models(self) -> List[GeminiModel]:
+        """使うモデルの一覧（優先順・gemini_models が空なら gemini_model だけ）"""
+        return self.gemini_models or [GeminiModel(name=self.gemini_model)]
+
+    class Config:
+        frozen = True
+
+
 class AppConfig(BaseModel):
     """アプリケーション設定"""
 
-    hotkey: Key = Field(default=Key.cmd_r, description="録音用ホットキー")
+    hotkey: str = Field(
+        default="cmd_r", description="録音用ホットキー（pynput.keyboard.Key の名前）"
+    )
+    hotkey_profiles: List[HotkeyProfile] = Field(
+        default_factory=list,
+        description="ホットキーごとの設定（Gemini補正・言語・入力方法）。空なら hotkey だけを使う",
+    )
     sample_rate: int = Field(default=16000, ge=8000, le=48000, description="サンプリングレート")
 
     language: str = Field(default="ja", description="言語")
     min_duration: float = Field(default=0.3, ge=0.1, description="最小録音時間（秒）")
+    record_max_memory_bytes: int = Field(
+        default=16 * 1024 * 1024,
+        ge=0,
+        description="録音をメモリに保持する上限（バイト）。超えた分は一時ファイルに書き出す",
+    )
+    record_max_seconds: float = Field(
+        default=1800.0, gt=0, description="最大録音時間（秒）。達すると自動的に録音を終了する"
+    )
+
+    # ハンズフリーモード（VAD）
+    vad_threshold: float = Field(
+        default=0.01, gt=0, le=1, description="発話とみなす最小の音量（RMS、-40dBFS 相当）"
+    )
+    vad_silence_ms: int = Field(
+        default=700, ge=100, description="発話の終わりとみなす無音の長さ（ミリ秒）"
+    )
+
+    # 入力デバイスごとの録音ストリーム設定（python main.py calibrate-audio で計測）
+    audio_calibration: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="入力デバイス名 → blocksize / latency（キャリブレーション結果）",
+    )
 
     # Gemini API 設定
     gemini_api_key: str = Field(
@@ -61,31 +226,178 @@ class AppConfig(BaseModel):
         default_factory=lambda: os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
         description="使用するGeminiモデル",
     )
+    gemini_models: List[GeminiModel] = Field(
+        default_factory=list,
+        description="応答時間で振り分けるモデルの一覧（優先順・空なら gemini_model だけ）",
+    )
     gemini_timeout: int = Field(default=5, ge=1, le=30, description="APIタイムアウト時間（秒）")
     gemini_prompt_file: Path = Field(
         default_factory=lambda: _get_user_data_dir() / "prompts.json",
         description="プロンプト設定ファイルパス",
     )
     gemini_prompt: str = Field(default="", description="Gemini補正プロンプト")
+    gemini_output_token_ratio: float = Field(
+        default=1.5, gt=0, description="入力1文字あたりに許す出力トークン数（出力の上限の計算用）"
+    )
+    gemini_max_output_tokens: int = Field(
+        default=4096, ge=64, description="出力トークン数の上限の最大値（長い録音でも超えない）"
+    )
+    gemini_thinking_budget: int = Field(
+        default=0,
+        ge=0,
+        description="思考に使うトークン数の上限（0 で思考しない。出力の上限に足して送る）",
+    )
 
     # サウンド設定
     sound_enabled: bool = Field(default=True, description="サウンド再生の有効/無効")
+    sound_start_file: str = Field(
+        default="/System/Library/Sounds/Frog.aiff", description="録音開始の効果音ファイル"
+    )
+    sound_stop_file: str = Field(
+        default="/System/Library/Sounds/Sosumi.aiff", description="録音終了の効果音ファイル"
+    )
     settings_file: Path = Field(
         default_factory=lambda: _get_config_dir() / "settings.json", description="設定ファイルパス"
     )
 
+    # 設定ウィンドウ
+    settings_prewarm: bool = Field(
+        default=False,
+        description="設定ウィンドウ用プロセスを事前起動しておく（メモリと引き換えに即時表示）",
+    )
+
+    # 発話履歴
+    history_enabled: bool = Field(default=True, description="発話履歴をSQLiteに保存する")
+    history_store_audio: bool = Field(default=False, description="発話履歴に圧縮した音声も保存する")
+
+    # メトリクス
+    metrics_port: int = Field(
+        default=0,
+        ge=0,
+        le=65535,
+        description="メトリクスを公開する localhost のポート番号（0 なら無効）",
+    )
+
+    # プロファイル
+    profile_enabled: bool = Field(
+        default=False,
+        description="発話ごとのプロファイルを保存する（環境変数 STT_PROFILE=1 でも有効）",
+    )
+    profile_min_ms: float = Field(
+        default=0.0, ge=0, description="この処理時間（ミリ秒）以上の発話だけプロファイルを保存する"
+    )
+    profile_interval_ms: float = Field(
+        default=5.0, gt=0, description="スタックを採取する間隔（ミリ秒）"
+    )
+    profile_max_bytes: int = Field(
+        default=50 * 1024 * 1024,
+        ge=0,
+        description="保存するプロファイルの合計サイズの上限（バイト）",
+    )
+
+    # ワーカープロセス
+    pipeline_worker: bool = Field(
+        default=False,
+        description="文字起こし（STT・補正・変換）を別プロセスで実行する",
+    )
+
+    # レイテンシ目標（SLO）
+    slo_target_ms: float = Field(
+        default=0.0,
+        ge=0,
+        description="ホットキーを離してから入力し終えるまでの p95 の目標（ミリ秒、0 なら無効）。"
+        "超えると Gemini補正を省略する",
+    )
+    slo_recover_ratio: float = Field(
+        default=0.8, gt=0, le=1, description="p95 が目標のこの割合以下に戻ったら省略をやめる"
+    )
+    slo_max_queue: int = Field(
+        default=2,
+        ge=0,
+        description="処理待ちの発話がこの数を超えたら Gemini補正を省略する（0 なら見ない）",
+    )
+
+    # Gemini補正の学習
+    learn_corrections: bool = Field(
+        default=False,
+        description="Gemini補正の結果から決まった直し方を学習し、"
+        "学習した直し方だけで済む発話は Gemini を呼ばない",
+    )
+    learn_min_count: int = Field(
+        default=3, ge=2, description="直し方・発話の型を学習済みとみなすまでの回数"
+    )
+    learn_auto_promote: bool = Field(
+        default=False, description="学習した直し方をワード変換ルールに自動で追加する"
+    )
+
+    # サービスモード
+    service_url: str = Field(
+        default="",
+        description="パイプラインをサービスに任せる場合の URL（例: http://127.0.0.1:8765）",
+    )
+    service_port: int = Field(
+        default=8765, ge=1, le=65535, description="サービスモードで待ち受けるポート番号"
+    )
+    service_max_concurrency: int = Field(
+        default=8, ge=1, description="サービスモードで同時に実行する上流呼び出し数"
+    )
+
+    # ログ設定
+    log_max_bytes: int = Field(
+        default=5 * 1024 * 1024, ge=0, description="ログファイルのローテーションサイズ（バイト）"
+    )
+    log_backup_count: int = Field(default=5, ge=0, description="保持する過去ログファイル数")
+    log_rotate_when: str = Field(
+        default="",
+        description="時刻でローテーションする場合の単位（例: midnight）。空ならサイズで判定",
+    )
+    log_queue_size: int = Field(
+        default=10000, ge=1, description="書き込み待ちログの上限（超えた分は破棄）"
+    )
+
     # プライベート属性
-    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+    _snapshot: Optional[ConfigSnapshot] = PrivateAttr(default=None)
+    # settings.json に書かれている・アプリから保存したキー（保存時はこれだけを書き出す）
+    _saved_keys: Set[str] = PrivateAttr(default_factory=set)
 
     @property
     def gemini_enabled(self) -> bool:
         """Gemini補正機能の有効/無効（APIキーとモデルが両方設定されていれば有効）"""
-        return bool(self.gemini_api_key) and bool(self.gemini_model)
+        return bool(self.gemini_api_key) and bool(self.gemini_model or self.gemini_models)
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """現在の設定スナップショット（参照の読み出しのみ・ロック不要）"""
+        return self._snapshot
 
     def model_post_init(self, _context) -> None:
         """モデル初期化後の処理"""
         self._load_prompt()
         self._load_settings()
+        self._publish()
+
+    def _publish(self) -> None:
+        """現在の値から新しいスナップショットを作成して差し替える"""
+        version = self._snapshot.version + 1 if self._snapshot else 1
+        fields = set(ConfigSnapshot.model_fields) - {"version"}
+        self._snapshot = ConfigSnapshot(version=version, **self.model_dump(include=fields))
+
+    def reload(self) -> ConfigSnapshot:
+        """
+        他プロセス（設定ウィンドウ）が書き込んだ .env / prompts.json / settings.json を
+        読み直し、スナップショットをアトミックに差し替える
+        """
+        with self._lock:
+            env_path = _get_env_path()
+            if env_path.exists():
+                env = dotenv_values(env_path)
+                self.gemini_api_key = env.get("GEMINI_API_KEY") or ""
+                self.gemini_model = env.get("GEMINI_MODEL") or self.gemini_model
+            self._load_prompt()
+            self._load_settings()
+            self._publish()
+            return self._snapshot
 
     def _load_prompt(self) -> None:
         """プロンプトをJSONから読み込み、なければデフォルトを保存"""
@@ -121,6 +433,7 @@ class AppConfig(BaseModel):
             with open(self.gemini_prompt_file, "w", encoding="utf-8") as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             self.gemini_prompt = new_prompt
+            self._publish()
 
     def reset_prompt_to_default(self) -> str:
         """プロンプトをデフォルトにリセット"""
@@ -136,7 +449,11 @@ class AppConfig(BaseModel):
             return default
 
     def _load_settings(self) -> None:
-        """設定をJSONから読み込み、なければデフォルトを保存"""
+        """
+        設定をJSONから読み込む（なければ作成する）。
+        不正な値のキーだけを読み飛ばし、ファイルは書き換えない。JSON として読めないときだけ
+        元のファイルを .bak に退避して作り直す。
+        """
         if not self.settings_file.exists():
             self.settings_file.parent.mkdir(parents=True, exist_ok=True)
             self._save_settings()
@@ -145,18 +462,44 @@ class AppConfig(BaseModel):
         try:
             with open(self.settings_file, "r", encoding="utf-8") as f:
                 data = json.load(f)
-                self.sound_enabled = data.get("sound_enabled", True)
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"[設定] settings.json読み込みエラー: {e}")
-            self.sound_enabled = True
+            if not isinstance(data, dict):
+                raise json.JSONDecodeError("オブジェクトではありません", "", 0)
+        except json.JSONDecodeError as e:
+            backup = self.settings_file.with_name(f"{self.settings_file.name}.bak")
+            print(f"[設定] settings.json を読み込めないため {backup.name} に退避します: {e}")
+            os.replace(self.settings_file, backup)
             self._save_settings()
+            return
+        except IOError as e:
+            print(f"[設定] settings.json読み込みエラー: {e}")
+            return
 
-    def _save_settings(self) -> None:
-        """設定をJSONに保存"""
-        data = {
-            "sound_enabled": self.sound_enabled,
-            "version": "1.0",
-        }
+        for key in _SETTINGS_KEYS:
+            if key not in data:
+                continue
+            try:
+                setattr(self, key, data[key])
+            except ValueError as e:
+                print(f"[設定] settings.json の {key} が不正なため無視します: {e}")
+                continue
+            self._saved_keys.add(key)
+
+    def _save_settings(self, *changed: str) -> None:
+        """
+        設定をJSONに保存する（未知のキー・読み飛ばした不正な値は保持する）。
+        書き出すのは settings.json にあったキーと changed だけで、未設定の値は既定値のまま
+        ファイルに固定しない。
+        """
+        self._saved_keys.update(changed)
+        try:
+            with open(self.settings_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        data.update(self.model_dump(mode="json", include=self._saved_keys & set(_SETTINGS_KEYS)))
+        data["version"] = "1.0"
         with open(self.settings_file, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
@@ -164,7 +507,15 @@ class AppConfig(BaseModel):
         """サウンド設定を保存（スレッドセーフ）"""
         with self._lock:
             self.sound_enabled = enabled
-            self._save_settings()
+            self._save_settings("sound_enabled")
+            self._publish()
+
+    def save_audio_calibration(self, device: str, settings: Dict[str, Any]) -> None:
+        """入力デバイスのキャリブレーション結果を保存（スレッドセーフ）"""
+        with self._lock:
+            self.audio_calibration = {**self.audio_calibration, device: settings}
+            self._save_settings("audio_calibration")
+            self._publish()
 
     def save_gemini_settings(self, api_key: str, model: str) -> None:
         """Gemini API設定を .env に保存してリロード（スレッドセーフ）"""
@@ -175,10 +526,31 @@ class AppConfig(BaseModel):
             env_path.parent.mkdir(parents=True, exist_ok=True)
             set_key(str(env_path), "GEMINI_API_KEY", self.gemini_api_key)
             set_key(str(env_path), "GEMINI_MODEL", self.gemini_model)
+            self._publish()
 
     class Config:
         arbitrary_types_allowed = True
+        validate_assignment = True
+
+
+_config: Optional[AppConfig] = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> AppConfig:
+    """グローバル設定インスタンスを取得（初回アクセス時に .env を読み込んで生成）"""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                load_dotenv(_get_env_path())
+                _config = AppConfig()
+                globals()["config"] = _config
+    return _config
 
 
-# グローバル設定インスタンス
-config = AppConfig()
+def __getattr__(name: str) -> Any:
+    """グローバル設定インスタンス `config` を初回アクセスまで遅延生成する"""
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,364 @@
+"""
+Gemini補正の結果からの直し方の学習
+
+STT の生テキストと Gemini補正後のテキストを文字単位で比べ、置き換えられた箇所
+（"ぱいそん" → "Python" など）を数える。ある入力が learn_min_count 回以上、
+それを含む発話のほぼ毎回で同じ出力に直されていれば、安定した直し方（学習済みルール）とみなす。
+learn_auto_promote なら学習済みルールをワード変換ルールに追加する。
+
+発話が学習済みルールだけで Gemini と同じ結果になるかは、学習済みルールの入力を伏せた
+「型」（"ぱいそんでじぇそんを…" → "\\0で\\0を…"）ごとに数える。同じ型で learn_min_count 回
+続けて一致していれば、その型の発話は Gemini を呼ばずに学習済みルールで補正する
+（PipelineResult.skipped は "gemini:learned"）。一度でも一致しなかった型は省略しない。
+省略している型も _PROBE_INTERVAL 回に1回は Gemini を呼び、まだ一致するか確かめる。
+
+学習するのは Gemini の完全な応答だけ（APIエラー・打ち切りで元のテキストを返した発話は
+学ばない。発話履歴では skipped が "gemini:failed"）。
+
+学習は発話の処理とは別のスレッドで行い、起動時は発話履歴から読み込む。
+
+    python main.py learn-corrections [--promote]
+"""
+
+import argparse
+import logging
+import queue
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+from app.config import config
+from app.history import HistoryEntry, UtteranceHistory
+from app.metrics import metrics
+
+logger = logging.getLogger("voice_input")
+
+# 学習済みルールとみなす、入力を含む発話のうち同じ出力に直された割合
+_MIN_AGREEMENT = 0.9
+# 学習する入力の最小文字数（1文字の置き換えは文脈に依存しすぎる）
+_MIN_INPUT_CHARS = 2
+# 数える入力・型の上限（超えたら回数の少ないもの・古いものから捨てる）
+_MAX_CANDIDATES = 5000
+_MAX_TEMPLATES = 10000
+# 起動時に読み込む発話履歴の件数
+_HISTORY_LIMIT = 5000
+# 学習待ちの上限（超えた分は学習しない）
+_QUEUE_SIZE = 1000
+# 省略している型でも Gemini を呼んで一致を確かめる間隔（省略した回数）
+_PROBE_INTERVAL = 20
+# 型で学習済みルールの入力を伏せる文字
+_PLACEHOLDER = "\x00"
+# 前後の置き換えと1つにまとめる文字（"ぱーす" → "パース" が "ぱ"・"す" に分かれないように）
+_JOINERS = "ー・"
+
+
+def diff_corrections(raw: str, corrected: str) -> List[Tuple[str, str]]:
+    """raw から corrected への置き換え箇所（入力, 出力）の一覧（挿入・削除だけの箇所は除く）"""
+    opcodes = SequenceMatcher(None, raw, corrected, autojunk=False).get_opcodes()
+    spans: List[List[int]] = []
+    current: Optional[List[int]] = None
+    for k, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag != "equal" or (
+            current is not None
+            and k + 1 < len(opcodes)
+            and _bridges(raw, corrected, current, raw[i1:i2], opcodes[k + 1])
+        ):
+            if current is None:
+                current = [i1, i2, j1, j2]
+            else:
+                current[1], current[3] = i2, j2
+        elif current is not None:
+            spans.append(current)
+            current = None
+    if current is not None:
+        spans.append(current)
+    return [(raw[i1:i2], corrected[j1:j2]) for i1, i2, j1, j2 in spans if i2 > i1 and j2 > j1]
+
+
+def _bridges(raw: str, corrected: str, current: List[int], equal: str, following: Tuple) -> bool:
+    """
+    置き換えに挟まれた一致部分を、前後の置き換えとまとめるか。
+    長音記号などの1文字か、前後の置き換えの端と同じ文字で境界がずれうる
+    （"りあくとと" → "Reactと" のどちらの "と" が残ったか決まらない）ときはまとめる。
+    """
+    if len(equal) == 1 and equal in _JOINERS:
+        return True
+    _, i1, i2, j1, j2 = following
+    return (
+        raw[current[0] : current[1]].endswith(equal)
+        or corrected[current[2] : current[3]].endswith(equal)
+        or raw[i1:i2].startswith(equal)
+        or corrected[j1:j2].startswith(equal)
+    )
+
+
+@dataclass
+class LearnedRule:
+    """学習済みルールと、その根拠の回数"""
+
+    input: str
+    output: str
+    # 入力が output に直された発話数 / 入力を含む発話数
+    count: int
+    seen: int
+
+
+class CorrectionLearner:
+    """Gemini補正の結果から直し方を学習する（スレッドセーフ・学習は別スレッド）"""
+
+    def __init__(self, history: Optional[UtteranceHistory] = None) -> None:
+        self._history = history
+        self._lock = threading.Lock()
+        # 入力 → 出力ごとの発話数
+        self._corrections: Dict[str, Counter] = {}
+        # 入力を含む発話数
+        self._seen: Dict[str, int] = {}
+        # 学習済みルール（入力 → 出力）と、その入力を探す正規表現
+        self._learned: Dict[str, str] = {}
+        self._pattern: Optional[Pattern[str]] = None
+        # 型 → 学習済みルールだけで Gemini と一致した回数と省略した回数の和（一致しなかった型は -1）
+        self._templates: "OrderedDict[str, int]" = OrderedDict()
+        self._queue: "queue.Queue[Tuple[str, str]]" = queue.Queue(_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        # Gemini を呼ばずに済んだ発話数
+        self.avoided = 0
+        metrics.gauge("stt_learned_rules", lambda: len(self._learned))
+
+    @property
+    def enabled(self) -> bool:
+        return config.snapshot.learn_corrections
+
+    # ========== 発話の処理から呼ぶ ==========
+
+    def correct(self, raw: str) -> Optional[str]:
+        """
+        raw の型が学習済みルールだけで補正できるなら補正後のテキスト、できなければ None
+        （省略している型でも、確かめる回には None を返して Gemini を呼ばせる）
+        """
+        min_count = config.snapshot.learn_min_count
+        with self._lock:
+            key = self._template(raw)
+            value = self._templates.get(key, 0)
+            if value < min_count:
+                return None
+            if (value - min_count) % _PROBE_INTERVAL == _PROBE_INTERVAL - 1:
+                # 次に observe() した結果で、一致し続けているか（回数が進むか）が決まる
+                metrics.inc("stt_gemini_learned_probes_total")
+                return None
+            self._templates[key] = value + 1
+            self.avoided += 1
+            corrected = self._apply(raw)
+        metrics.inc("stt_gemini_avoided_total")
+        return corrected
+
+    def submit(self, raw: str, corrected: str) -> None:
+        """Gemini補正の結果を学習待ちに入れる（学習は別スレッド・待たない）"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="correction-learner", daemon=True
+                    )
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((raw, corrected))
+        except queue.Full:
+            pass
+
+    def _run(self) -> None:
+        if self._history is not None:
+            try:
+                self.learn_history(self._history)
+            except Exception as e:
+                logger.warning(f"[学習] 発話履歴を読み込めません: {e}")
+        while True:
+            raw, corrected = self._queue.get()
+            try:
+                self.observe(raw, corrected)
+            except Exception as e:
+                logger.error(f"[学習] エラー: {e}")
+
+    # ========== 学習 ==========
+
+    def learn_history(self, history: UtteranceHistory, limit: int = _HISTORY_LIMIT) -> int:
+        """発話履歴のうち Gemini補正が成功した発話を古い順に学習し、学習した件数を返す"""
+        entries = [
+            e
+            for e in _recent(history, limit)
+            if e.gemini_ms > 0 and "gemini:failed" not in e.skipped.split(",")
+        ]
+        for entry in reversed(entries):
+            self.observe(entry.raw_text, entry.corrected_text)
+        return len(entries)
+
+    def observe(self, raw: str, corrected: str) -> None:
+        """1発話ぶんの生テキストと Gemini補正後のテキストを学習する"""
+        if not raw:
+            return
+        min_count = config.snapshot.learn_min_count
+        with self._lock:
+            new_inputs = []
+            for input_word, output_word in set(diff_corrections(raw, corrected)):
+                if len(input_word.strip()) < _MIN_INPUT_CHARS:
+                    continue
+                if input_word not in self._corrections:
+                    if len(self._corrections) >= _MAX_CANDIDATES:
+                        self._prune()
+                    self._corrections[input_word] = Counter()
+                    self._seen[input_word] = 0
+                    new_inputs.append(input_word)
+                self._corrections[input_word][output_word] += 1
+            # 初めて直された語を含む型は、Gemini がその語を直すかもしれないので省略しない
+            for key in self._templates:
+                if any(input_word in key for input_word in new_inputs):
+                    self._templates[key] = -1
+
+            changed = False
+            unlearned = False
+            for input_word, outputs in self._corrections.items():
+                if input_word not in raw:
+                    continue
+                self._seen[input_word] += 1
+                output_word, count = outputs.most_common(1)[0]
+                stable = count >= min_count and count >= _MIN_AGREEMENT * self._seen[input_word]
+                if stable and self._learned.get(input_word) != output_word:
+                    self._learned[input_word] = output_word
+                    changed = True
+                    logger.info(f"[学習] {input_word} → {output_word}（{count}回）")
+                elif not stable and input_word in self._learned:
+                    del self._learned[input_word]
+                    changed = True
+                unlearned = unlearned or not stable
+            if changed:
+                self._compile()
+
+            key = self._template(raw)
+            if not unlearned and self._apply(raw) == corrected:
+                value = self._templates.get(key, 0)
+                self._templates[key] = value + 1 if value >= 0 else value
+            else:
+                self._templates[key] = -1
+            self._templates.move_to_end(key)
+            while len(self._templates) > _MAX_TEMPLATES:
+                self._templates.popitem(last=False)
+            learned = dict(self._learned)
+
+        if changed and config.snapshot.learn_auto_promote:
+            promote(learned.items())
+
+    def rules(self) -> List[LearnedRule]:
+        """学習済みルールの一覧（根拠の回数が多い順）"""
+        with self._lock:
+            rules = [
+                LearnedRule(inp, out, self._corrections[inp][out], self._seen[inp])
+                for inp, out in self._learned.items()
+            ]
+        return sorted(rules, key=lambda r: (-r.count, r.input))
+
+    def _prune(self) -> None:
+        """回数の少ない入力から半分を捨てる（ロック内で呼ぶ）"""
+        ranked = sorted(self._corrections, key=lambda i: sum(self._corrections[i].values()))
+        for input_word in ranked[: len(ranked) // 2]:
+            if input_word not in self._learned:
+                del self._corrections[input_word]
+                del self._seen[input_word]
+
+    def _compile(self) -> None:
+        """学習済みルールの入力を長い順に探す正規表現を作る（ロック内で呼ぶ）"""
+        if not self._learned:
+            self._pattern = None
+            return
+        words = sorted(self._learned, key=len, reverse=True)
+        self._pattern = re.compile("|".join(re.escape(w) for w in words))
+
+    def _apply(self, raw: str) -> str:
+        if self._pattern is None:
+            return raw
+        return self._pattern.sub(lambda m: self._learned[m.group()], raw)
+
+    def _template(self, raw: str) -> str:
+        if self._pattern is None:
+            return raw
+        return self._pattern.sub(_PLACEHOLDER, raw)
+
+
+def _recent(history: UtteranceHistory, limit: int) -> Iterator[HistoryEntry]:
+    """発話履歴を新しい順に最大 limit 件"""
+    before: Optional[int] = None
+    while limit > 0:
+        page = history.page(before_id=before, limit=min(limit, 500))
+        if not page:
+            return
+        yield from page
+        limit -= len(page)
+        before = page[-1].id
+
+
+def promote(rules: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """ワード変換ルールにない入力の学習済みルールを追加し、追加したルールを返す"""
+    from app.rule_editor import RuleChanges
+    from app.word_replacement import word_replacer
+
+    # 設定画面など他プロセスが保存したルールを読み直してから追加する（上書きで消さない）
+    word_replacer.reload()
+    dictionary = word_replacer.dictionary
+    existing: Set[str] = {input_word for input_word, _ in dictionary}
+    additions = [(inp, out) for inp, out in rules if inp not in existing]
+    if not additions:
+        return []
+    try:
+        word_replacer.apply_changes(dictionary, RuleChanges(additions=additions))
+    except ValueError:
+        # 設定画面などで同時に保存された（次に学習したときに追加し直す）
+        return []
+    logger.info(f"[学習] ワード変換ルールに {len(additions)}件 追加しました")
+    return additions
+
+
+_learner: Optional[CorrectionLearner] = None
+_learner_lock = threading.Lock()
+
+
+def get_correction_learner() -> CorrectionLearner:
+    """グローバルインスタンスを取得（発話履歴から学習を始める）"""
+    global _learner
+    if _learner is None:
+        with _learner_lock:
+            if _learner is None:
+                from app.history import get_history
+
+                _learner = CorrectionLearner(get_history())
+    return _learner
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """発話履歴から学習した直し方と、Gemini を省略した発話数を表示する"""
+    from app.history import get_history
+
+    parser = argparse.ArgumentParser(
+        prog="main.py learn-corrections",
+        description="発話履歴の Gemini補正から、決まった直し方を学習して表示する",
+    )
+    parser.add_argument("--limit", type=int, default=_HISTORY_LIMIT, help="読み込む発話数")
+    parser.add_argument(
+        "--promote", action="store_true", help="学習したルールをワード変換ルールに追加する"
+    )
+    args = parser.parse_args(argv)
+
+    history = get_history()
+    learner = CorrectionLearner()
+    learned = learner.learn_history(history, args.limit)
+    avoided = sum("gemini:learned" in e.skipped.split(",") for e in _recent(history, args.limit))
+    rules = learner.rules()
+    print(f"Gemini補正を通した発話: {learned}件 / 学習で Gemini を省略した発話: {avoided}件")
+    for rule in rules:
+        print(f"{rule.input} → {rule.output}（{rule.count}/{rule.seen}回）")
+    if not rules:
+        print("学習済みの直し方はありません")
+    elif args.promote:
+        added = promote((r.input, r.output) for r in rules)
+        print(f"ワード変換ルールに {len(added)}件 追加しました")
+    return 0
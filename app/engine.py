@@ -2,69 +2,114 @@
 音声入力エンジン（録音・文字起こし・テキスト入力の統合制御）
 """
 
+import dataclasses
 import logging
-import subprocess
 import threading
 import time
-from pathlib import Path
-from typing import Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
 
 import numpy as np
 import numpy.typing as npt
-import sounddevice as sd
-from pynput import keyboard
-from pynput.keyboard import Key, KeyCode
-from Quartz.CoreGraphics import (
-    CGEventCreateKeyboardEvent,
-    CGEventKeyboardSetUnicodeString,
-    CGEventPost,
-    kCGHIDEventTap,
-)
-
-from app.config import config
+
+from app.audio_buffer import AudioBuffer
+from app.audio_health import AudioHealth, stream_settings
+from app.config import HotkeyProfile, config
 from app.gemini import GeminiCorrector
-from app.google_speech import GoogleSpeechTranscriber
-from app.word_replacement import word_replacer
+from app.history import get_history
+from app.logging_setup import dropped_records
+from app.metrics import metrics
+from app.pipeline import PipelineOptions, TranscriptionPipeline
+from app.profiler import ProfileSession, begin_profile
+from app.slo_controller import SloController
+from app.sound_player import sound_player
+from app.vad import VoiceActivitySegmenter
 
-# ログディレクトリとファイル設定
-LOG_DIR = Path.home() / ".sst-python" / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-LOG_FILE = LOG_DIR / "voice_input.log"
+if TYPE_CHECKING:
+    import sounddevice as sd
+    from pynput import keyboard
 
-# ロガー設定
-logger = logging.getLogger("voice_input")
-logger.setLevel(logging.INFO)
+    from app.google_speech import GoogleSpeechTranscriber
+    from app.session_recorder import SessionRecorder, StreamFactory
 
-# ファイルハンドラ
-file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
-file_handler.setLevel(logging.INFO)
-file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(file_formatter)
+# sounddevice / pynput / Quartz は使用時に読み込む（起動時間短縮・非macOSでのimport対応）
 
-# コンソールハンドラ
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_formatter = logging.Formatter("%(message)s")
-console_handler.setFormatter(console_formatter)
+logger = logging.getLogger("voice_input")
 
-# ハンドラを追加
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# ハンズフリーモードの録音ブロック長（ミリ秒）。長いほどコールバックの起床回数が減る
+_HANDS_FREE_BLOCK_MS = 100
 
+# chunked 入力で1回のキーイベントに載せる最大の UTF-16 コード単位数
+# （CGEventKeyboardSetUnicodeString が受け付ける上限）
+_CHUNK_UTF16_UNITS = 20
 
-def _play_sound(name: str = "Tink") -> None:
-    """macOS標準サウンドを再生（設定によって制御）"""
-    if not config.sound_enabled:
+
+def _play_sound(cue: str) -> None:
+    """録音開始（start）・終了（stop）の効果音を再生（設定によって制御）"""
+    snap = config.snapshot
+    if not snap.sound_enabled:
         return
+    sound_player.play(snap.sound_start_file if cue == "start" else snap.sound_stop_file)
+
+
+def _open_input_stream(**kwargs: Any) -> "sd.InputStream":
+    """
+    マイクの入力ストリームを作成（既定のストリームファクトリ）。
+    入力デバイスのキャリブレーション結果があれば、指定のない blocksize / latency に使う。
+    """
+    import sounddevice as sd
 
     try:
-        subprocess.Popen(
-            ["afplay", f"/System/Library/Sounds/{name}.aiff"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        device = sd.query_devices(kind="input")["name"]
     except Exception:
-        pass
+        device = ""
+    for key, value in stream_settings(device).items():
+        kwargs.setdefault(key, value)
+    return sd.InputStream(**kwargs)
+
+
+def _utf16_units(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def split_utf16_chunks(text: str, max_units: int = _CHUNK_UTF16_UNITS) -> List[str]:
+    """text を UTF-16 で max_units 単位以下の塊に分ける（サロゲートペアは分けない）"""
+    chunks: List[str] = []
+    start = 0
+    units = 0
+    for i, char in enumerate(text):
+        width = 2 if ord(char) > 0xFFFF else 1
+        if units + width > max_units:
+            chunks.append(text[start:i])
+            start, units = i, 0
+        units += width
+    if start < len(text):
+        chunks.append(text[start:])
+    return chunks
+
+
+def _post_unicode_events(chunks: List[str]) -> None:
+    """塊ごとに Unicode 文字列付きのキーイベント（押下・解放）を送る"""
+    from Quartz.CoreGraphics import (
+        CGEventCreateKeyboardEvent,
+        CGEventKeyboardSetUnicodeString,
+        CGEventPost,
+        kCGHIDEventTap,
+    )
+
+    time.sleep(0.1)
+
+    for chunk in chunks:
+        units = _utf16_units(chunk)
+        event_down = CGEventCreateKeyboardEvent(None, 0, True)
+        CGEventKeyboardSetUnicodeString(event_down, units, chunk)
+        CGEventPost(kCGHIDEventTap, event_down)
+
+        event_up = CGEventCreateKeyboardEvent(None, 0, False)
+        CGEventKeyboardSetUnicodeString(event_up, units, chunk)
+        CGEventPost(kCGHIDEventTap, event_up)
+
+        time.sleep(0.01)
 
 
 def type_text(text: str) -> None:
@@ -75,19 +120,31 @@ def type_text(text: str) -> None:
     """
     if not text:
         return
+    _post_unicode_events(list(text))
 
-    time.sleep(0.1)
 
-    for char in text:
-        event_down = CGEventCreateKeyboardEvent(None, 0, True)
-        CGEventKeyboardSetUnicodeString(event_down, len(char), char)
-        CGEventPost(kCGHIDEventTap, event_down)
+def type_text_chunked(text: str) -> None:
+    """
+    最大20文字（UTF-16）ずつのキーイベントで入力する。
+    1文字ずつより速いが、キー入力を1文字ずつ解釈するアプリでは取りこぼすことがある。
+    """
+    if not text:
+        return
+    _post_unicode_events(split_utf16_chunks(text))
 
-        event_up = CGEventCreateKeyboardEvent(None, 0, False)
-        CGEventKeyboardSetUnicodeString(event_up, len(char), char)
-        CGEventPost(kCGHIDEventTap, event_up)
 
-        time.sleep(0.01)
+# ホットキーごとの入力方法（HotkeyProfile.insertion）→ 入力関数
+_TYPERS: Dict[str, Callable[[str], None]] = {"type": type_text, "chunked": type_text_chunked}
+
+
+def pipeline_options(hotkey_profile: HotkeyProfile) -> PipelineOptions:
+    """ホットキーの設定から1発話ぶんのパイプラインの指定を作る"""
+    return PipelineOptions(gemini=hotkey_profile.gemini, language=hotkey_profile.language)
+
+
+def _hotkey_fields(hotkey_profile: Optional[HotkeyProfile]) -> Dict[str, Any]:
+    """セッション記録のイベントに残すホットキーの設定（再生時に同じ設定で処理するため）"""
+    return {} if hotkey_profile is None else {"hotkey_profile": hotkey_profile.model_dump()}
 
 
 class VoiceInputEngine:
@@ -95,68 +152,180 @@ class VoiceInputEngine:
 
     def __init__(
         self,
-        transcriber: GoogleSpeechTranscriber,
-        gemini: GeminiCorrector,
+        transcriber: Optional["GoogleSpeechTranscriber"],
+        gemini: Optional[GeminiCorrector],
         app: Optional[Any] = None,
+        pipeline: Optional[Any] = None,
+        stream_factory: Optional["StreamFactory"] = None,
+        typer: Optional[Callable[[str], None]] = None,
+        recorder: Optional["SessionRecorder"] = None,
+        clock: Callable[[], float] = time.perf_counter,
     ) -> None:
         self.whisper = transcriber
         self.gemini = gemini
+        # pipeline を渡すとそれを使う（サービスモードの RemotePipeline など）
+        self.pipeline = pipeline or TranscriptionPipeline(transcriber, gemini)
+        # マイク入力とキー入力の差し替え口（セッションの再生ではマイク・キーボードを使わない）
+        self._stream_factory: "StreamFactory" = stream_factory or _open_input_stream
+        # 指定がなければホットキーごとの入力方法（type / chunked）で入力する
+        self._typer = typer
+        # ホットキーを離してから入力し終えるまでの時間を測る時計（SLO の判断にも使う）
+        self._clock = clock
+        self.recorder = recorder
+        if recorder is not None:
+            self._stream_factory = recorder.wrap_stream_factory(self._stream_factory)
+            self.pipeline = recorder.wrap_pipeline(self.pipeline)
         self.app = app
         self.is_recording: bool = False
-        self.audio_chunks: List[npt.NDArray[np.float32]] = []
-        self.stream: Optional[sd.InputStream] = None
+        self.audio_buffer: Optional[AudioBuffer] = None
+        self._profile: Optional[ProfileSession] = None
+        # 録音中の発話を開始したホットキーの設定
+        self._hotkey_profile: Optional[HotkeyProfile] = None
+        self.hands_free: bool = False
+        self._hands_free_stream: Optional["sd.InputStream"] = None
+        self._segmenter: Optional[VoiceActivitySegmenter] = None
+        self.stream: Optional["sd.InputStream"] = None
+        # 直近の録音ストリームのコールバック計測（オーバーフロー・処理時間・間隔の揺れ）
+        self.audio_health: Optional[AudioHealth] = None
         self._lock = threading.Lock()
-
-    def start_keyboard_listener(self) -> keyboard.Listener:
+        # 文字起こし待ち・処理中の発話数
+        self._pending = 0
+        # 発話は1本のスレッドで順に処理する（発話ごとにスレッドを作らず、入力の順序も保つ）
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcribe")
+        # 遅延が目標を超えたときに Gemini補正を省略するか決める
+        self.slo = SloController(clock=clock)
+        # 効果音のデコードと出力ストリームの開始はバックグラウンドで行う
+        snap = config.snapshot
+        sound_player.preload([snap.sound_start_file, snap.sound_stop_file])
+        metrics.gauge("stt_queue_depth", lambda: self._pending)
+        metrics.gauge("stt_log_dropped_records", dropped_records)
+        metrics.gauge("stt_history_dropped_total", lambda: get_history().dropped)
+
+    @property
+    def pending(self) -> int:
+        """文字起こし待ち・処理中の発話数"""
+        return self._pending
+
+    def start_keyboard_listener(self) -> "keyboard.Listener":
         """キーボードリスナーを起動"""
+        from pynput import keyboard
+        from pynput.keyboard import Key, KeyCode
+
+        hotkeys: Dict[Any, HotkeyProfile] = {}
+        for hotkey_profile in config.snapshot.active_hotkey_profiles:
+            hotkey = getattr(Key, hotkey_profile.hotkey, None)
+            if hotkey is None:
+                logger.warning(f"[設定] 不明なホットキー {hotkey_profile.hotkey!r} を無視します")
+                continue
+            if hotkey in hotkeys:
+                logger.warning(f"[設定] ホットキー {hotkey_profile.hotkey!r} が重複しています")
+            hotkeys[hotkey] = hotkey_profile
+            logger.info(
+                f"[設定] ホットキー {hotkey_profile.label}: "
+                f"Gemini補正{'あり' if hotkey_profile.gemini else 'なし'} / "
+                f"言語 {hotkey_profile.language or config.snapshot.language} / "
+                f"入力 {hotkey_profile.insertion}"
+            )
+        if not hotkeys:
+            logger.warning("[設定] 有効なホットキーがないため cmd_r を使用します")
+            hotkeys[Key.cmd_r] = HotkeyProfile(hotkey="cmd_r")
 
         def on_press(key: Key | KeyCode | None) -> None:
-            if key == config.hotkey:
-                self.start_recording()
+            hotkey_profile = hotkeys.get(key)
+            if hotkey_profile is not None:
+                self.on_hotkey_press(hotkey_profile)
 
         def on_release(key: Key | KeyCode | None) -> None:
-            if key == config.hotkey:
-                if self.is_recording:
-                    self.stop_recording()
+            hotkey_profile = hotkeys.get(key)
+            if hotkey_profile is not None:
+                self.on_hotkey_release(hotkey_profile)
 
         listener = keyboard.Listener(on_press=on_press, on_release=on_release)
         listener.start()
         return listener
 
-    def _create_audio_stream(self) -> sd.InputStream:
+    def on_hotkey_press(self, hotkey_profile: Optional[HotkeyProfile] = None) -> None:
+        """
+        ホットキーが押された（キーリピートで繰り返し呼ばれる）。
+        録音中に別のホットキーが押されても、録音を始めたホットキーの設定のまま続ける。
+        """
+        if self.recorder:
+            self.recorder.event("press", **_hotkey_fields(hotkey_profile))
+        self.start_recording(hotkey_profile)
+
+    def on_hotkey_release(self, hotkey_profile: Optional[HotkeyProfile] = None) -> None:
+        """ホットキーが離された（録音を始めたのと別のホットキーなら無視する）"""
+        if self.recorder:
+            self.recorder.event("release", **_hotkey_fields(hotkey_profile))
+        active = self._hotkey_profile
+        if hotkey_profile is not None and active is not None and hotkey_profile != active:
+            return
+        if self.is_recording:
+            self.stop_recording()
+
+    def _create_audio_stream(
+        self, buffer: AudioBuffer, profile: Optional[ProfileSession] = None
+    ) -> "sd.InputStream":
         """オーディオストリームを作成"""
+        limit_reached = threading.Event()
 
         def audio_callback(
             indata: npt.NDArray[np.float32],
             _frames: int,
             _time_info: Any,
-            status: sd.CallbackFlags,
+            status: "sd.CallbackFlags",
         ) -> None:
             if status:
                 logger.warning(f"Audio: {status}")
-            self.audio_chunks.append(indata.copy())
-
-        return sd.InputStream(
-            samplerate=config.sample_rate,
+            if profile is not None:
+                profile.watch_current_thread("audio")
+            if not buffer.append(indata) and not limit_reached.is_set():
+                # コールバック内ではストリームを止められないので別スレッドで停止する
+                limit_reached.set()
+                logger.warning(
+                    f"[録音] 最大録音時間（{buffer.seconds:.0f}秒）に達したため録音を終了します"
+                )
+                threading.Thread(target=self.stop_recording, daemon=True).start()
+
+        self.audio_health = AudioHealth(config.snapshot.sample_rate)
+        return self._stream_factory(
+            samplerate=config.snapshot.sample_rate,
             channels=1,
             dtype="float32",
-            callback=audio_callback,
+            callback=self.audio_health.wrap(audio_callback),
         )
 
-    def start_recording(self) -> None:
-        """録音を開始"""
+    def _log_audio_health(self) -> None:
+        """停止したストリームの計測結果をログに出す（取りこぼしがあれば警告）"""
+        health = self.audio_health
+        if health is None:
+            return
+        if health.overflows or health.underflows:
+            logger.warning(f"[オーディオ] {health.summary()}")
+        else:
+            logger.debug(f"[オーディオ] {health.summary()}")
+
+    def start_recording(self, hotkey_profile: Optional[HotkeyProfile] = None) -> None:
+        """録音を開始（hotkey_profile が None なら最初のホットキーの設定で処理する）"""
         with self._lock:
-            if self.is_recording:
+            if self.is_recording or self.hands_free:
                 return
             self.is_recording = True
-            self.audio_chunks = []
+            snap = config.snapshot
+            self._hotkey_profile = hotkey_profile or snap.active_hotkey_profiles[0]
+            # 録音ごとに新しいバッファを使う（前の発話は文字起こしスレッドが参照中のため）
+            self.audio_buffer = AudioBuffer(
+                snap.sample_rate, snap.record_max_memory_bytes, snap.record_max_seconds
+            )
+        # プロファイルは録音開始から入力完了までを1発話として採取する（無効なら None）
+        self._profile = begin_profile()
 
         logger.info("🎙️ 録音開始")
-        _play_sound("Frog")
+        _play_sound("start")
         if self.app:
             self.app.set_recording()
 
-        self.stream = self._create_audio_stream()
+        self.stream = self._create_audio_stream(self.audio_buffer, self._profile)
         self.stream.start()
 
     def stop_recording(self) -> None:
@@ -170,53 +339,216 @@ class VoiceInputEngine:
             self.stream.stop()
             self.stream.close()
             self.stream = None
-
-        _play_sound("Sosumi")
-
-        if not self.audio_chunks:
+            self._log_audio_health()
+
+        released_at = self._clock()
+        _play_sound("stop")
+
+        buffer = self.audio_buffer
+        self.audio_buffer = None
+        profile, self._profile = self._profile, None
+        hotkey_profile = self._hotkey_profile
+        if buffer is None or buffer.seconds < config.snapshot.min_duration:
+            if buffer is not None:
+                buffer.close()
+            if profile is not None:
+                profile.cancel()
             if self.app:
                 self.app.set_idle()
             return
 
-        audio = np.concatenate(self.audio_chunks).flatten()
-        duration = len(audio) / config.sample_rate
-
-        if duration < config.min_duration:
+        # 長い録音は一時ファイルの memmap のまま渡す（コピーしない）
+        try:
+            audio = buffer.view()
+        except OSError as e:
+            logger.error(f"録音を読み出せないため、この発話は文字起こししません: {e}")
+            if profile is not None:
+                profile.cancel()
             if self.app:
                 self.app.set_idle()
             return
+        finally:
+            buffer.close()
+        self._submit(audio, released_at, profile, hotkey_profile)
 
-        threading.Thread(target=self._transcribe_and_type, args=(audio,), daemon=True).start()
+    def _submit(
+        self,
+        audio: Union[npt.NDArray[np.float32], AudioBuffer],
+        released_at: float,
+        profile: Optional[ProfileSession] = None,
+        hotkey_profile: Optional[HotkeyProfile] = None,
+    ) -> None:
+        """
+        1発話の文字起こしを開始する（ハンズフリーの発話はここからプロファイルし、
+        最初のホットキーの設定で処理する）
+        """
+        if profile is None:
+            profile = begin_profile()
+        if hotkey_profile is None:
+            hotkey_profile = config.snapshot.active_hotkey_profiles[0]
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(
+            self._transcribe_and_type, audio, released_at, profile, hotkey_profile
+        )
 
-    def _transcribe_and_type(self, audio: npt.NDArray[np.float32]) -> None:
-        """音声を文字起こしして入力"""
-        if self.app:
-            self.app.set_processing()
+    def close(self) -> None:
+        """処理待ちの発話をすべて処理してから、文字起こしのスレッドを止める"""
+        self._executor.shutdown(wait=True)
 
-        try:
-            text = self.whisper.transcribe(audio)
-            logger.info(f"[STT] {text}")
+    # ========== ハンズフリーモード ==========
+
+    def toggle_hands_free(self) -> bool:
+        """
+        ハンズフリーモード（聞き続けて VAD で発話を区切る）を切り替え、新しい状態を返す。
+        プッシュトゥトーク録音中は切り替えない。
+        """
+        if self.recorder:
+            self.recorder.event("hands_free")
+        with self._lock:
+            if self.is_recording:
+                return self.hands_free
+            self.hands_free = not self.hands_free
+            enabled = self.hands_free
+        if enabled:
+            self._start_hands_free()
+        else:
+            self._stop_hands_free()
+        return enabled
+
+    def _start_hands_free(self) -> None:
+        snap = config.snapshot
+        segmenter = VoiceActivitySegmenter(
+            snap.sample_rate,
+            # 録音コールバックの中から呼ばれる（バッファは文字起こしのスレッドで読む）
+            lambda buffer: self._submit(buffer, self._clock()),
+            threshold=snap.vad_threshold,
+            end_silence_ms=snap.vad_silence_ms,
+            min_duration=snap.min_duration,
+            max_seconds=snap.record_max_seconds,
+            max_memory_bytes=snap.record_max_memory_bytes,
+        )
+
+        def audio_callback(
+            indata: npt.NDArray[np.float32],
+            _frames: int,
+            _time_info: Any,
+            status: "sd.CallbackFlags",
+        ) -> None:
+            if status:
+                logger.warning(f"Audio: {status}")
+            segmenter.feed(indata)
 
-            if self.gemini.enabled and text:
-                corrected = self.gemini.correct(text)
-                if corrected != text:
-                    logger.info(f"[Gemini補正] {corrected}")
-                text = corrected
+        self._segmenter = segmenter
+        self.audio_health = AudioHealth(snap.sample_rate)
+        self._hands_free_stream = self._stream_factory(
+            samplerate=snap.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=snap.sample_rate * _HANDS_FREE_BLOCK_MS // 1000,
+            callback=self.audio_health.wrap(audio_callback),
+        )
+        self._hands_free_stream.start()
+        logger.info("🎧 ハンズフリー開始")
+        _play_sound("start")
+        if self.app:
+            self.app.set_idle()
+
+    def _take_utterance(self, buffer: AudioBuffer) -> npt.NDArray[np.float32]:
+        """
+        VAD が確定した発話のバッファを読んで閉じ、次の発話のバッファを用意する
+        （一時ファイルへの書き出しを待つので、録音コールバックではなく文字起こしのスレッドで呼ぶ）。
+        書き出しに失敗した発話は OSError を送出する
+        """
+        segmenter = self._segmenter
+        if segmenter is not None:
+            segmenter.prepare()
+        try:
+            return buffer.view()
+        finally:
+            buffer.close()
+
+    def _stop_hands_free(self) -> None:
+        if self._hands_free_stream:
+            self._hands_free_stream.stop()
+            self._hands_free_stream.close()
+            self._hands_free_stream = None
+            self._log_audio_health()
+        if self._segmenter:
+            # 話している途中で止めた場合も、そこまでを文字起こしする
+            self._segmenter.flush()
+            self._segmenter = None
+        logger.info("🎧 ハンズフリー終了")
+        _play_sound("stop")
+        if self.app:
+            self.app.set_idle()
 
-            replaced = word_replacer.apply(text)
-            if replaced != text:
-                logger.info(f"[ワード変換] {replaced}")
-            text = replaced
+    def _transcribe_and_type(
+        self,
+        audio: Union[npt.NDArray[np.float32], AudioBuffer],
+        released_at: Optional[float] = None,
+        profile: Optional[ProfileSession] = None,
+        hotkey_profile: Optional[HotkeyProfile] = None,
+    ) -> None:
+        """音声（ハンズフリーの発話は VAD から受け取ったバッファ）を文字起こしして入力"""
+        if hotkey_profile is None:
+            hotkey_profile = config.snapshot.active_hotkey_profiles[0]
+        if profile is not None:
+            profile.watch_current_thread("transcribe")
+        if released_at is None:
+            released_at = self._clock()
+        if self.app:
+            self.app.set_processing()
 
-            if text:
-                time.sleep(0.1)
-                type_text(text)
+        try:
+            if isinstance(audio, AudioBuffer):
+                audio = self._take_utterance(audio)
+            options = pipeline_options(hotkey_profile)
+            skipped: Dict[str, str] = {}
+            if options.gemini and config.snapshot.gemini_enabled:
+                reason = self.slo.allow("gemini", self._pending)
+                if reason:
+                    options = dataclasses.replace(options, gemini=False)
+                    skipped["gemini"] = reason
+                    metrics.inc("stt_stage_skipped_total", stage="gemini", reason=reason)
+            result = self.pipeline.process(audio, options=options)
+            if skipped:
+                result.skipped = ",".join(f"{stage}:{reason}" for stage, reason in skipped.items())
+
+            if result.text:
+                if self._typer is None:
+                    # ホットキーを離した直後のキーイベントと混ざらないよう少し待つ
+                    time.sleep(0.1)
+                typer = self._typer or _TYPERS[hotkey_profile.insertion]
+                start = time.perf_counter()
+                typer(result.text)
+                result.type_ms = (time.perf_counter() - start) * 1000
+                metrics.inc("stt_typing_chars_total", len(result.text))
+                metrics.inc("stt_typing_seconds_total", result.type_ms / 1000)
+
+            metrics.inc("stt_utterances_total")
+            metrics.inc("stt_audio_seconds_total", result.audio_seconds)
+            latency_ms = (self._clock() - released_at) * 1000
+            metrics.observe("stt_utterance_latency_ms", latency_ms)
+            # Gemini補正を通した発話だけ、その処理時間を段の推定に使う
+            stage_ms = {"gemini": result.gemini_ms} if result.gemini_ms else {}
+            self.slo.record(latency_ms, stage_ms, tuple(skipped))
+            if self.recorder:
+                self.recorder.record_result(result, audio)
+
+            if config.snapshot.history_enabled:
+                get_history().record(result, audio)
 
         except Exception as e:
+            metrics.inc("stt_pipeline_errors_total")
             logger.error(f"エラー: {e}")
             if self.app:
                 self.app.set_error(str(e)[:30])
                 time.sleep(2)
         finally:
+            if profile is not None:
+                profile.end((self._clock() - released_at) * 1000)
+            with self._lock:
+                self._pending -= 1
             if self.app:
                 self.app.set_idle()
@@ -2,33 +2,118 @@
 Gemini APIによるテキスト補正
 """
 import logging
+import math
 import threading
-from typing import Optional, Any
+import time
+from dataclasses import dataclass
+from typing import Optional, Any, Callable, Tuple
 
-from app.config import config
+from app.config import GeminiModel, config
+from app.metrics import metrics
+from app.model_router import ModelRouter, Route
 
 logger = logging.getLogger(__name__)
 
+# 出力トークン数の上限に足す余裕（句読点の追加や、短い入力での表記の違いのぶん）
+_OUTPUT_TOKEN_MARGIN = 32
+# トークン数のヒストグラムのバケット上限
+_TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# 思考（thinking_config）を受け付けないモデル名の接頭辞
+_NO_THINKING_PREFIXES = ("gemini-1.", "gemini-2.0-")
+
+
+@dataclass(frozen=True)
+class GeminiRequest:
+    """1回の補正リクエストの内容"""
+
+    model: str
+    # プロンプトのうち毎回同じ部分（システム指示として送る）
+    system_instruction: str
+    # 補正するテキスト
+    contents: str
+    # 出力トークン数の上限（思考トークンを含む。max_output_tokens として送る）
+    max_output_tokens: int
+    # 思考トークン数の上限（None なら thinking_config を送らない）
+    thinking_budget: Optional[int] = None
+
+
+def split_prompt(template: str) -> str:
+    """
+    プロンプトのテンプレートから {text} を除いた、毎回同じ部分（システム指示）を返す。
+    補正するテキストはユーザーの入力として別に送る。
+    """
+    return template.replace("{text}", "").strip()
+
+
+def output_token_budget(text: str, ratio: float, limit: int) -> int:
+    """
+    入力の長さに応じた出力トークン数の上限。
+    補正後の文章は入力とほぼ同じ長さなので、壊れた生成（同じ語の繰り返しなど）が長く続く前に打ち切る。
+    """
+    return min(limit, math.ceil(len(text) * ratio) + _OUTPUT_TOKEN_MARGIN)
+
+
+def thinking_budget(model: GeminiModel, default: int) -> Optional[int]:
+    """
+    モデルに送る思考トークン数の上限（思考を受け付けないモデルは None）。
+    gemini-2.5 系は思考トークンも max_output_tokens から使うので、補正の出力とは別に見積もる。
+    """
+    if model.name.startswith(_NO_THINKING_PREFIXES):
+        return None
+    return default if model.thinking_budget is None else model.thinking_budget
+
+
+def _finish_reason(response: Any) -> str:
+    """応答の終了理由（"STOP"・"MAX_TOKENS" など。取れなければ空文字）"""
+    candidates = getattr(response, "candidates", None) or []
+    if not candidates:
+        return ""
+    reason = getattr(candidates[0], "finish_reason", None)
+    return str(getattr(reason, "name", reason or ""))
+
 
 class GeminiCorrector:
     """Gemini APIによるテキスト補正（スレッドセーフ・遅延ロード）"""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        request: Optional[Callable[[GeminiRequest], Any]] = None,
+        router: Optional[ModelRouter] = None,
+    ) -> None:
         self._client: Optional[Any] = None
+        # クライアントを作ったときの (APIキー, タイムアウト秒)
+        self._client_settings: Tuple[str, int] = ("", 0)
         self._lock = threading.Lock()
+        # GeminiRequest を受け取って応答を返す関数（テストでは API の代わりを渡す）
+        self._request = request or self._generate
+        # gemini_models の中から応答時間でモデルを選ぶ
+        self.router = router or ModelRouter()
+        self._trace = threading.local()
+        # プロンプトのテンプレートと、そこから作ったシステム指示（プロンプトが変わるまで使い回す）
+        self._instruction = ("", "")
 
     @property
     def enabled(self) -> bool:
         """Gemini補正が利用可能かどうか"""
-        return config.gemini_enabled
-
-    def _get_client(self) -> Any:
-        """クライアントを取得（遅延ロード・ダブルチェックロッキング）"""
-        if self._client is None:
+        return config.snapshot.gemini_enabled
+
+    def _get_client(self, api_key: str, timeout: int) -> Any:
+        """
+        クライアントを取得（遅延ロード・ダブルチェックロッキング）。
+        設定プロセスでAPIキーやタイムアウトが変更された場合は自動的に作り直す。
+        応答のないリクエストで文字起こしのスレッドが止まらないよう、timeout 秒で打ち切る。
+        """
+        settings = (api_key, timeout)
+        if self._client is None or self._client_settings != settings:
             with self._lock:
-                if self._client is None:
+                if self._client is None or self._client_settings != settings:
                     from google import genai
-                    self._client = genai.Client(api_key=config.gemini_api_key)
+                    from google.genai import types
+                    self._client = genai.Client(
+                        api_key=api_key,
+                        http_options=types.HttpOptions(timeout=timeout * 1000),
+                    )
+                    self._client_settings = settings
         return self._client
 
     def reset_client(self) -> None:
@@ -37,39 +122,122 @@ class GeminiCorrector:
             self._client = None
             logger.debug("[Gemini] クライアントをリセットしました")
 
+    @property
+    def last_route(self) -> Optional[Route]:
+        """このスレッドで直前に補正したときのモデルの振り分け結果（セッション記録用）"""
+        return getattr(self._trace, "route", None)
+
+    @property
+    def last_ok(self) -> bool:
+        """
+        このスレッドで直前の補正が Gemini の完全な応答だったか
+        （APIエラー・打ち切り・空の応答・APIキーなしで元のテキストを返したときは False）
+        """
+        return getattr(self._trace, "ok", False)
+
+    def _system_instruction(self, template: str) -> str:
+        """テンプレートに対応するシステム指示（同じテンプレートなら作り直さない）"""
+        cached_template, instruction = self._instruction
+        if cached_template != template:
+            instruction = split_prompt(template)
+            self._instruction = (template, instruction)
+        return instruction
+
+    def _generate(self, request: GeminiRequest) -> Any:
+        """Gemini API にリクエストする"""
+        from google.genai import types
+
+        snap = config.snapshot
+        client = self._get_client(snap.gemini_api_key, snap.gemini_timeout)
+        return client.models.generate_content(
+            model=request.model,
+            contents=request.contents,
+            config=types.GenerateContentConfig(
+                system_instruction=request.system_instruction,
+                temperature=0.3,
+                max_output_tokens=request.max_output_tokens,
+                thinking_config=(
+                    types.ThinkingConfig(thinking_budget=request.thinking_budget)
+                    if request.thinking_budget is not None
+                    else None
+                ),
+            )
+        )
+
+    def _observe_usage(self, model: str, response: Any) -> None:
+        """送ったトークン数・受け取ったトークン数をメトリクスに記録する"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        counts = {
+            "prompt": getattr(usage, "prompt_token_count", None),
+            # 暗黙のキャッシュで再利用された分（システム指示など、毎回同じ先頭部分）
+            "cached": getattr(usage, "cached_content_token_count", None),
+            "output": getattr(usage, "candidates_token_count", None),
+            "thoughts": getattr(usage, "thoughts_token_count", None),
+        }
+        for kind, count in counts.items():
+            if count is not None:
+                metrics.observe(
+                    "stt_gemini_tokens", count, buckets=_TOKEN_BUCKETS, model=model, kind=kind
+                )
+        logger.debug(f"[Gemini] トークン数: 入力 {counts['prompt']}・出力 {counts['output']}")
+
     def correct(self, text: str) -> str:
         """音声認識テキストをGemini APIで補正する"""
+        self._trace.ok = False
         if not text.strip():
             return text
 
-        if not config.gemini_api_key:
+        snap = config.snapshot
+        if not snap.gemini_api_key:
             return text
 
+        models = snap.active_gemini_models
+        route = self.router.choose(models)
+        self._trace.route = route
+        model = next((m for m in models if m.name == route.model), GeminiModel(name=route.model))
+        thinking = thinking_budget(model, snap.gemini_thinking_budget)
+        output_tokens = output_token_budget(
+            text, snap.gemini_output_token_ratio, snap.gemini_max_output_tokens
+        )
+        request = GeminiRequest(
+            model=route.model,
+            system_instruction=self._system_instruction(snap.gemini_prompt),
+            contents=text,
+            # 思考トークンは補正の出力の上限とは別枠で足す（思考で出力の分を使い切らない）
+            max_output_tokens=output_tokens + (thinking or 0),
+            thinking_budget=thinking,
+        )
+        start = time.perf_counter()
         try:
-            from google.genai import types
-
-            client = self._get_client()
-            prompt = config.gemini_prompt.replace("{text}", text)
-
-            response = client.models.generate_content(
-                model=config.gemini_model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.3,
-                    max_output_tokens=500,
+            response = self._request(request)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.router.record(route.model, elapsed_ms, ok=True)
+            metrics.observe("stt_gemini_latency_ms", elapsed_ms, model=route.model)
+            self._observe_usage(route.model, response)
+
+            if _finish_reason(response) == "MAX_TOKENS":
+                # 上限で打ち切られた出力は途中までなので使わない
+                metrics.inc("stt_gemini_truncated_total", model=route.model)
+                logger.warning(
+                    f"[Gemini] 出力が上限（{request.max_output_tokens}トークン）に達したため"
+                    "元のテキストを使用します"
                 )
-            )
+                return text
 
             if response.text:
                 corrected_text = response.text.strip()
                 if corrected_text:
+                    self._trace.ok = True
                     return corrected_text
 
             return text
 
         except Exception as e:
+            self.router.record(route.model, (time.perf_counter() - start) * 1000, ok=False)
+            metrics.inc("stt_gemini_errors_total", kind=type(e).__name__)
             logger.error(f"[Gemini] APIエラー（元のテキストを使用）: {e}")
             return text
 
-
 gemini = GeminiCorrector()
@@ -2,6 +2,7 @@
 Google Speech Recognition APIによる音声認識
 """
 import threading
+import time
 from typing import Optional
 
 import numpy as np
@@ -9,6 +10,7 @@ import numpy.typing as npt
 import speech_recognition as sr
 
 from app.config import config
+from app.metrics import metrics
 
 
 class GoogleSpeechTranscriber:
@@ -31,9 +33,10 @@ class GoogleSpeechTranscriber:
                     print("[Google Speech] 認識エンジンの初期化完了")
         return self._recognizer
 
-    def transcribe(self, audio: npt.NDArray[np.float32]) -> str:
-        """音声データをテキストに変換"""
+    def transcribe(self, audio: npt.NDArray[np.float32], language: str = "") -> str:
+        """音声データをテキストに変換（language が空なら設定の言語）"""
         recognizer = self._get_recognizer()
+        snap = config.snapshot
 
         # numpy float32配列 -> int16 bytes -> AudioData
         # SpeechRecognitionは16-bit PCMを期待
@@ -41,23 +44,27 @@ class GoogleSpeechTranscriber:
         audio_bytes = audio_int16.tobytes()
 
         # AudioData作成 (sample_width=2は16-bit PCM)
-        audio_data = sr.AudioData(audio_bytes, config.sample_rate, 2)
+        audio_data = sr.AudioData(audio_bytes, snap.sample_rate, 2)
 
         try:
             # Google Speech Recognition APIで認識
             # 言語コードを "ja" -> "ja-JP" に変換
-            language_code = config.language
+            language_code = language or snap.language
             if language_code == "ja":
                 language_code = "ja-JP"
             elif language_code == "en":
                 language_code = "en-US"
 
+            start = time.perf_counter()
             text = recognizer.recognize_google(audio_data, language=language_code)
+            metrics.observe("stt_google_latency_ms", (time.perf_counter() - start) * 1000)
             return text.strip()
 
         except sr.UnknownValueError:
+            metrics.inc("stt_google_errors_total", kind="unknown_value")
             print("[Google Speech] 音声を認識できませんでした")
             return ""
         except sr.RequestError as e:
+            metrics.inc("stt_google_errors_total", kind="request")
             print(f"[Google Speech] APIエラー: {e}")
             return ""
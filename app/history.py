@@ -0,0 +1,316 @@
+"""
+発話履歴ストア（SQLite + FTS5 全文検索）
+
+書き込みはキューに積むだけで、専用スレッドがまとめてコミットする（呼び出し側は待たない）。
+読み出しはキーセットページング（id の降順）で、件数が増えても一定時間で返す。
+"""
+
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from app.pipeline import PipelineResult
+
+logger = logging.getLogger("voice_input")
+
+# まとめて書き込む最大件数と、最初の1件から書き込みまでの最大待ち時間（秒）
+_BATCH_SIZE = 100
+_FLUSH_INTERVAL = 1.0
+# 書き込み待ちの上限（超えた分は破棄）
+_QUEUE_SIZE = 10000
+# FTS5 の trigram トークナイザで検索できる最小文字数
+_TRIGRAM_MIN_CHARS = 3
+
+_STOP = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    raw_text TEXT NOT NULL,
+    corrected_text TEXT NOT NULL,
+    replaced_text TEXT NOT NULL,
+    audio_seconds REAL NOT NULL,
+    stt_ms REAL NOT NULL,
+    gemini_ms REAL NOT NULL,
+    replace_ms REAL NOT NULL,
+    type_ms REAL NOT NULL,
+    audio_path TEXT,
+    audio_sample_rate INTEGER,
+    skipped TEXT NOT NULL DEFAULT ''
+)
+"""
+
+# 後から追加した列（古い履歴ファイルには ALTER TABLE で足す）
+_ADDED_COLUMNS = {"skipped": "TEXT NOT NULL DEFAULT ''"}
+
+# HistoryEntry のフィールド名と一致させる
+_COLUMNS = (
+    "id",
+    "created_at",
+    "raw_text",
+    "corrected_text",
+    "replaced_text",
+    "audio_seconds",
+    "stt_ms",
+    "gemini_ms",
+    "replace_ms",
+    "type_ms",
+    "skipped",
+    "audio_path",
+)
+
+
+def _get_db_path() -> Path:
+    """バンドル時は Application Support、開発時は __generated__ を返す"""
+    if getattr(sys, "frozen", False):
+        return Path.home() / "Library" / "Application Support" / "stt-python" / "history.sqlite3"
+    return Path(__file__).parent.parent / "__generated__" / "history.sqlite3"
+
+
+@dataclass
+class HistoryEntry(PipelineResult):
+    """保存済みの発話履歴"""
+
+    id: int = 0
+    audio_path: Optional[str] = None
+
+
+class UtteranceHistory:
+    """発話履歴の保存・検索（スレッドセーフ・書き込みは非同期バッチ）"""
+
+    def __init__(self, db_path: Optional[Path] = None) -> None:
+        self._db_path = db_path or _get_db_path()
+        self._audio_dir = self._db_path.parent / "history_audio"
+        self._queue: "queue.Queue[Any]" = queue.Queue(_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._fts_tokenizer: Optional[str] = None
+        self.dropped = 0
+
+    # ========== 接続・スキーマ ==========
+
+    def _connect(self) -> sqlite3.Connection:
+        """接続を開き、スキーマを作成する"""
+        self._db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(utterances)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in existing:
+                conn.execute(f"ALTER TABLE utterances ADD COLUMN {name} {definition}")
+        self._fts_tokenizer = self._ensure_fts(conn)
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def _ensure_fts(conn: sqlite3.Connection) -> Optional[str]:
+        """全文検索用の FTS5 テーブルを作成し、トークナイザ名を返す（FTS5 がなければ None）"""
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'utterances_fts'").fetchone()
+        if row:
+            return "trigram" if "trigram" in row[0] else "unicode61"
+        # 日本語は空白で区切られないため、部分一致できる trigram を優先する
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE utterances_fts USING fts5("
+                    "raw_text, corrected_text, replaced_text, "
+                    f"content='utterances', content_rowid='id', tokenize='{tokenizer}')"
+                )
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        return None
+
+    def _get_reader(self) -> sqlite3.Connection:
+        """読み出し用接続を取得（遅延ロード）"""
+        if self._reader is None:
+            self._reader = self._connect()
+        return self._reader
+
+    # ========== 書き込み ==========
+
+    def record(
+        self, result: PipelineResult, audio: Optional[npt.NDArray[np.float32]] = None
+    ) -> None:
+        """発話を保存キューに積む（待たない・満杯なら破棄）"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait((result, audio))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """キューに積まれた発話がすべて書き込まれるまで待つ"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """書き込みスレッドを停止し、接続を閉じる"""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _writer_loop(self) -> None:
+        """キューから取り出した発話をまとめてコミットする（専用スレッド）"""
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + _FLUSH_INTERVAL
+            while batch[-1] is not _STOP and len(batch) < _BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            items = [item for item in batch if item is not _STOP]
+            try:
+                self._write(conn, items)
+            except Exception as e:
+                logger.error(f"[履歴] 書き込みエラー: {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if len(items) != len(batch):
+                conn.close()
+                return
+
+    def _save_audio(self, result: PipelineResult, audio: npt.NDArray[np.float32]) -> str:
+        """音声を 16bit PCM + zlib 圧縮で保存し、ファイル名を返す"""
+        self._audio_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{int(result.created_at * 1000)}-{uuid.uuid4().hex[:8]}.s16.zlib"
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        (self._audio_dir / name).write_bytes(zlib.compress(pcm))
+        return name
+
+    def _write(
+        self,
+        conn: sqlite3.Connection,
+        items: List[Tuple[PipelineResult, Optional[npt.NDArray[np.float32]]]],
+    ) -> None:
+        """発話をまとめて1トランザクションで書き込む"""
+        if not items:
+            return
+        from app.config import config
+
+        snap = config.snapshot
+        with conn:
+            for result, audio in items:
+                audio_path = None
+                if audio is not None and snap.history_store_audio:
+                    audio_path = self._save_audio(result, audio)
+                cursor = conn.execute(
+                    "INSERT INTO utterances (created_at, raw_text, corrected_text, replaced_text, "
+                    "audio_seconds, stt_ms, gemini_ms, replace_ms, type_ms, audio_path, "
+                    "audio_sample_rate, skipped) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        result.created_at or time.time(),
+                        result.raw_text,
+                        result.corrected_text,
+                        result.replaced_text,
+                        result.audio_seconds,
+                        result.stt_ms,
+                        result.gemini_ms,
+                        result.replace_ms,
+                        result.type_ms,
+                        audio_path,
+                        snap.sample_rate if audio_path else None,
+                        result.skipped,
+                    ),
+                )
+                if self._fts_tokenizer:
+                    conn.execute(
+                        "INSERT INTO utterances_fts (rowid, raw_text, corrected_text, "
+                        "replaced_text) VALUES (?, ?, ?, ?)",
+                        (
+                            cursor.lastrowid,
+                            result.raw_text,
+                            result.corrected_text,
+                            result.replaced_text,
+                        ),
+                    )
+
+    # ========== 読み出し ==========
+
+    def page(
+        self, before_id: Optional[int] = None, limit: int = 100, query: str = ""
+    ) -> List[HistoryEntry]:
+        """
+        新しい順に最大 limit 件を返す（キーセットページング）。
+        次のページは、返した最後の id を before_id に渡して取得する。
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+        if before_id is not None:
+            conditions.append("u.id < ?")
+            params.append(before_id)
+
+        with self._lock:
+            conn = self._get_reader()
+            source = "utterances u"
+            query = query.strip()
+            if query and self._can_match(query):
+                source = "utterances_fts f JOIN utterances u ON u.id = f.rowid"
+                conditions.append("utterances_fts MATCH ?")
+                params.append('"' + query.replace('"', '""') + '"')
+            elif query:
+                pattern = (
+                    "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                )
+                conditions.append(
+                    "(u.raw_text LIKE ? ESCAPE '\\' OR u.corrected_text LIKE ? ESCAPE '\\' "
+                    "OR u.replaced_text LIKE ? ESCAPE '\\')"
+                )
+                params.extend([pattern] * 3)
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            columns = ", ".join(f"u.{c}" for c in _COLUMNS)
+            rows = conn.execute(
+                f"SELECT {columns} FROM {source} {where} ORDER BY u.id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+
+        return [HistoryEntry(**dict(zip(_COLUMNS, row))) for row in rows]
+
+    def _can_match(self, query: str) -> bool:
+        """FTS5 で検索できるか（trigram は3文字未満を検索できない）"""
+        if self._fts_tokenizer is None:
+            return False
+        return self._fts_tokenizer != "trigram" or len(query) >= _TRIGRAM_MIN_CHARS
+
+
+_history: Optional[UtteranceHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> UtteranceHistory:
+    """グローバルインスタンスを取得（遅延ロード・ダブルチェックロッキング）"""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = UtteranceHistory()
+    return _history
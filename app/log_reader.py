@@ -0,0 +1,176 @@
+"""
+ログファイルの部分読み込み（末尾読み・遡り読み・追従・全文検索）
+
+ログは肥大化するため、ファイル全体を文字列として読み込まない。
+末尾から必要な行数だけシークして読み、検索は mmap 上で行う。
+"""
+
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# 後方読み込みのブロックサイズ
+_READ_BLOCK = 64 * 1024
+# 行番号索引の粒度（このバイト数ごとに累積改行数を記録）
+_INDEX_BLOCK = 1024 * 1024
+
+
+def _decode(data: bytes) -> List[str]:
+    """改行区切りのバイト列を行のリストに変換する"""
+    if not data:
+        return []
+    return data.decode("utf-8", errors="replace").split("\n")
+
+
+class LogTailReader:
+    """ログファイルを末尾から必要な分だけ読むリーダー（UIスレッド専用）"""
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        # 読み込み済み範囲 [_start, _end)。_end は常に行頭
+        self._start = 0
+        self._end = 0
+        self._inode: Optional[int] = None
+        # 行番号索引: _line_index[i] = ファイル先頭から i * _INDEX_BLOCK バイトまでの改行数
+        self._line_index = array("Q", [0])
+        self._index_inode: Optional[int] = None
+
+    @property
+    def at_beginning(self) -> bool:
+        """ファイル先頭まで読み込み済みか"""
+        return self._start == 0
+
+    def _reset(self, stat: Optional[os.stat_result]) -> None:
+        self._inode = stat.st_ino if stat else None
+        self._start = self._end = 0
+        self._line_index = array("Q", [0])
+
+    def _stat(self) -> Optional[os.stat_result]:
+        try:
+            return self._path.stat()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _last_line_end(f, size: int) -> int:
+        """最後の改行の直後のオフセット（書き込み途中の最終行は含めない）"""
+        pos = size
+        while pos > 0:
+            block_start = max(0, pos - _READ_BLOCK)
+            f.seek(block_start)
+            cut = f.read(pos - block_start).rfind(b"\n")
+            if cut >= 0:
+                return block_start + cut + 1
+            pos = block_start
+        return 0
+
+    @staticmethod
+    def _read_backward(f, end: int, n: int) -> Tuple[List[str], int]:
+        """行頭オフセット end の直前にある完全な行を最大 n 行読み、(行, 開始オフセット) を返す"""
+        pos = end
+        data = b""
+        # n 行の先頭を確定するには、その前の行の改行まで読む必要がある
+        while pos > 0 and data.count(b"\n") < n + 1:
+            block_start = max(0, pos - _READ_BLOCK)
+            f.seek(block_start)
+            data = f.read(pos - block_start) + data
+            pos = block_start
+        parts = data.split(b"\n")[:-1]
+        if pos > 0:
+            # 先頭要素は行の途中から読んでいる
+            parts = parts[1:]
+        selected = parts[-n:] if n else []
+        start = end - sum(len(line) + 1 for line in selected)
+        return [line.decode("utf-8", errors="replace") for line in selected], start
+
+    def tail(self, n: int) -> List[str]:
+        """末尾の n 行を読み込む（読み込み状態をリセット）"""
+        stat = self._stat()
+        self._reset(stat)
+        if stat is None:
+            return []
+        with open(self._path, "rb") as f:
+            # 書き込み途中の最終行は追従時に読む
+            self._end = self._last_line_end(f, stat.st_size)
+            lines, self._start = self._read_backward(f, self._end, n)
+        return lines
+
+    def older(self, n: int) -> List[str]:
+        """読み込み済み範囲より前の n 行を読み込む（遡りページング）"""
+        if self._start == 0 or self._stat() is None:
+            return []
+        with open(self._path, "rb") as f:
+            lines, self._start = self._read_backward(f, self._start, n)
+        return lines
+
+    def follow(self) -> Tuple[List[str], bool]:
+        """
+        前回以降に追記された完全な行を読む。
+        ファイルが削除・切り詰め・ローテーションされた場合は (空, True) を返す。
+        """
+        stat = self._stat()
+        if stat is None:
+            rotated = self._inode is not None
+            self._reset(None)
+            return [], rotated
+        if self._inode is None:
+            self._inode = stat.st_ino
+        elif stat.st_ino != self._inode or stat.st_size < self._end:
+            self._reset(stat)
+            return [], True
+        if stat.st_size == self._end:
+            return [], False
+        with open(self._path, "rb") as f:
+            f.seek(self._end)
+            data = f.read(stat.st_size - self._end)
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            return [], False
+        self._end += cut + 1
+        return _decode(data[:cut]), False
+
+    def _line_number(self, mm: mmap.mmap, pos: int) -> int:
+        """オフセット pos の行番号（1始まり）。索引は必要な範囲まで追記で構築する"""
+        block = pos // _INDEX_BLOCK
+        while len(self._line_index) <= block:
+            i = len(self._line_index) - 1
+            count = mm[i * _INDEX_BLOCK : (i + 1) * _INDEX_BLOCK].count(b"\n")
+            self._line_index.append(self._line_index[i] + count)
+        base = block * _INDEX_BLOCK
+        return self._line_index[block] + mm[base:pos].count(b"\n") + 1
+
+    def search(self, query: str, limit: int = 200) -> List[Tuple[int, str]]:
+        """
+        ファイル全体から query を含む行を (行番号, 行) で返す（新しい順・最大 limit 件）。
+        mmap 上を後方から検索するため、ファイル全体を読み込まない。
+        """
+        needle = query.encode("utf-8")
+        if not needle:
+            return []
+        stat = self._stat()
+        if stat is None or stat.st_size == 0:
+            return []
+        indexed_bytes = (len(self._line_index) - 1) * _INDEX_BLOCK
+        if stat.st_ino != self._index_inode or stat.st_size < indexed_bytes:
+            # 別ファイルに置き換わった（クリア・ローテーション）ので索引を作り直す
+            self._line_index = array("Q", [0])
+            self._index_inode = stat.st_ino
+
+        results: List[Tuple[int, str]] = []
+        with open(self._path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = len(mm)
+                while len(results) < limit:
+                    pos = mm.rfind(needle, 0, end)
+                    if pos < 0:
+                        break
+                    line_start = mm.rfind(b"\n", 0, pos) + 1
+                    line_end = mm.find(b"\n", pos)
+                    if line_end < 0:
+                        line_end = len(mm)
+                    line = mm[line_start:line_end].decode("utf-8", errors="replace")
+                    results.append((self._line_number(mm, line_start), line))
+                    end = line_start
+        return results
@@ -0,0 +1,101 @@
+"""
+ログ出力設定（ファイル + コンソール）
+
+録音コールバックや文字起こしスレッドがディスク書き込みで待たされないよう、
+ロガーにはキューに積むだけのハンドラを付け、実際の書き込みはバックグラウンドの
+QueueListener スレッドで行う。ログファイルはサイズまたは時刻でローテーションする。
+"""
+
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+from pathlib import Path
+from typing import Optional
+
+# ログディレクトリとファイル
+LOG_DIR = Path.home() / ".sst-python" / "logs"
+LOG_FILE = LOG_DIR / "voice_input.log"
+
+_setup_lock = threading.Lock()
+_queue_handler: Optional["DroppingQueueHandler"] = None
+_listener: Optional[QueueListener] = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """キューが満杯なら待たずに破棄し、破棄件数を数える QueueHandler"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def dropped_records() -> int:
+    """バックプレッシャーで破棄されたログレコード数"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def _create_file_handler() -> logging.Handler:
+    """設定に従ってサイズまたは時刻でローテーションするファイルハンドラを作成"""
+    from app.config import config
+
+    if config.log_rotate_when:
+        return TimedRotatingFileHandler(
+            LOG_FILE,
+            when=config.log_rotate_when,
+            backupCount=config.log_backup_count,
+            encoding="utf-8",
+        )
+    return RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=config.log_max_bytes,
+        backupCount=config.log_backup_count,
+        encoding="utf-8",
+    )
+
+
+def setup_logging() -> None:
+    """`voice_input` ロガーにハンドラを設定（初回呼び出し時のみ・スレッドセーフ）"""
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        from app.config import config
+
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+        # ファイルハンドラ
+        file_handler = _create_file_handler()
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+        # コンソールハンドラ
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        # 呼び出し側はキューに積むだけ、書き込みはリスナースレッドで行う
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(config.log_queue_size)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _listener = QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        logger = logging.getLogger("voice_input")
+        logger.setLevel(logging.INFO)
+        logger.addHandler(_queue_handler)
@@ -0,0 +1,171 @@
+"""
+プロセス内メトリクス（Prometheus テキスト形式で出力）
+
+記録側はロックを短時間取って数値を加算するだけ。整形は取得（scrape）時にのみ行う。
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Tuple
+
+# ラベルは (名前, 値) のソート済みタプルで保持する
+_Labels = Tuple[Tuple[str, str], ...]
+
+# レイテンシ系ヒストグラムのバケット上限（ミリ秒）
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _format_labels(labels: _Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """カウンタ・ヒストグラム・ゲージの登録と Prometheus 形式での出力（スレッドセーフ）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, _Labels], float] = {}
+        self._histograms: Dict[Tuple[str, _Labels], List[float]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """メトリクスの種類と説明を登録する（出力の # HELP / # TYPE 行）"""
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """カウンタを加算する"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS,
+        **labels: str,
+    ) -> None:
+        """ヒストグラムに観測値を追加する"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                self._buckets.setdefault(name, buckets)
+                # バケットごとの件数 + [+Inf] + 合計
+                state = self._histograms[key] = [0.0] * (len(buckets) + 2)
+            bounds = self._buckets[name]
+            state[bisect.bisect_left(bounds, value)] += 1
+            state[-1] += value
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """取得時に read() の値を返すゲージを登録する"""
+        self._gauges[name] = read
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        """カウンタの現在値（テスト・表示用）"""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render(self) -> str:
+        """Prometheus テキスト形式で出力する"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(state) for key, state in self._histograms.items()}
+        lines: List[str] = []
+        described = set()
+
+        def header(name: str, default_kind: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            kind, help_text = self._help.get(name, (default_kind, ""))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), state in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0.0
+            for bound, count in zip(self._buckets[name], state):
+                cumulative += count
+                le = _format_labels(labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{name}_bucket{le} {_format_value(cumulative)}")
+            cumulative += state[-2]
+            le = _format_labels(labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{le} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(state[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                continue
+            header(name, "gauge")
+            lines.append(f"{name} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+# グローバルインスタンス
+metrics = MetricsRegistry()
+
+metrics.describe("stt_utterances_total", "counter", "Transcribed utterances")
+metrics.describe("stt_audio_seconds_total", "counter", "Seconds of recorded audio transcribed")
+metrics.describe("stt_utterance_latency_ms", "histogram", "Release-to-typed latency")
+metrics.describe(
+    "stt_audio_xruns_total", "counter", "Input overflows/underflows reported by the audio device"
+)
+metrics.describe("stt_audio_callback_ms", "histogram", "Time spent in each audio callback")
+metrics.describe(
+    "stt_audio_callback_jitter_ms", "histogram", "Deviation of callback interval from block length"
+)
+metrics.describe("stt_pipeline_errors_total", "counter", "Utterances that failed in the pipeline")
+metrics.describe("stt_typing_chars_total", "counter", "Characters typed into the active window")
+metrics.describe("stt_typing_seconds_total", "counter", "Seconds spent typing text")
+metrics.describe("stt_google_latency_ms", "histogram", "Google Speech Recognition latency")
+metrics.describe("stt_google_errors_total", "counter", "Google Speech Recognition errors")
+metrics.describe("stt_gemini_latency_ms", "histogram", "Gemini correction latency")
+metrics.describe("stt_gemini_errors_total", "counter", "Gemini API errors")
+metrics.describe("stt_replacement_calls_total", "counter", "Word replacement calls")
+metrics.describe(
+    "stt_replacement_hits_total", "counter", "Word replacement calls that changed text"
+)
+metrics.describe("stt_queue_depth", "gauge", "Utterances waiting for or in transcription")
+metrics.describe("stt_log_dropped_records", "gauge", "Log records dropped under backpressure")
+metrics.describe("stt_history_dropped_total", "gauge", "History rows dropped under backpressure")
+metrics.describe(
+    "stt_stage_skipped_total", "counter", "Optional pipeline stages skipped, by stage and reason"
+)
+metrics.describe("stt_slo_transitions_total", "counter", "Latency SLO degrade/recover transitions")
+metrics.describe("stt_slo_degraded", "gauge", "1 while optional stages are skipped for the SLO")
+metrics.describe("stt_slo_p95_ms", "gauge", "Recent p95 release-to-typed latency incl. skipped")
+metrics.describe(
+    "stt_gemini_avoided_total", "counter", "Gemini calls avoided by learned corrections"
+)
+metrics.describe(
+    "stt_gemini_learned_probes_total",
+    "counter",
+    "Gemini calls made to re-check a template covered by learned corrections",
+)
+metrics.describe("stt_learned_rules", "gauge", "Corrections learned from Gemini output")
+metrics.describe(
+    "stt_gemini_routes_total", "counter", "Gemini requests routed, by model and reason"
+)
+metrics.describe("stt_gemini_tokens", "histogram", "Gemini tokens per request, by model and kind")
+metrics.describe(
+    "stt_gemini_truncated_total", "counter", "Gemini outputs cut off by the output-token limit"
+)
@@ -0,0 +1,77 @@
+"""
+メトリクス公開用の HTTP サーバー（localhost のみ・オプトイン）
+
+GET /metrics で Prometheus テキスト形式を返す。リクエストはバックグラウンドスレッドで処理する。
+"""
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from app.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger("voice_input")
+
+_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", _CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        # 取得のたびにログを出さない
+        pass
+
+
+class MetricsServer:
+    """127.0.0.1 で /metrics を公開するサーバー"""
+
+    def __init__(self, port: int, registry: MetricsRegistry = metrics) -> None:
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """待ち受けポート（0 を指定した場合は割り当てられた番号）"""
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        """バックグラウンドスレッドで待ち受けを開始"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"[メトリクス] http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self) -> None:
+        """待ち受けを停止"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def start_metrics_server(port: int) -> Optional[MetricsServer]:
+    """port が 0 でなければサーバーを起動する（起動できなければ None）"""
+    if not port:
+        return None
+    try:
+        server = MetricsServer(port)
+    except OSError as e:
+        logger.error(f"[メトリクス] ポート {port} で起動できません: {e}")
+        return None
+    server.start()
+    return server
@@ -0,0 +1,151 @@
+"""
+Gemini モデルの振り分け
+
+gemini_models の各モデルについて、直近の応答時間の指数移動平均（EWMA）と連続エラー数を持ち、
+リクエストごとに使うモデルを決める。
+
+- 品質の段階（tier）の小さい順に見て、使えるモデルがある最初の段階の中から選ぶ
+- まだ測っていないモデルがあれば優先順に試し、なければ EWMA が最も小さいモデルを使う
+- 一定時間測っていないモデルには1リクエストだけ振り分けて（プローブ）測り直す
+- 連続して失敗したモデルはしばらく使わず、時間が経ったら1リクエストで試し直す
+- すべて使えなければ、最も早く使えるようになるモデルを使う
+
+決めた理由は Route.reason（"unmeasured" / "fastest" / "probe" / "fallback"）として返し、
+ログ・メトリクス・セッション記録に残る。
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.config import GeminiModel
+from app.metrics import metrics
+
+logger = logging.getLogger("voice_input")
+
+# 応答時間の指数移動平均の重み
+_EWMA_ALPHA = 0.3
+# 測り直すまでの時間（秒）
+_PROBE_INTERVAL_SECONDS = 60.0
+# このモデルを使わなくする連続エラー数と、使わない時間（秒）
+_MAX_FAILURES = 3
+_COOLDOWN_SECONDS = 30.0
+
+
+@dataclass
+class ModelStats:
+    """1モデルの計測値"""
+
+    ewma_ms: Optional[float] = None
+    samples: int = 0
+    failures: int = 0
+    # この時刻まで使わない
+    unhealthy_until: float = 0.0
+    # 最後に計測した（計測のために振り分けた）時刻
+    last_measured: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Route:
+    """1リクエストの振り分け結果"""
+
+    model: str
+    tier: int
+    reason: str
+    # 選んだ時点の応答時間の推定（未計測なら None）
+    estimate_ms: Optional[float] = None
+
+    def describe(self) -> str:
+        estimate = "未計測" if self.estimate_ms is None else f"{self.estimate_ms:.0f}ms"
+        return f"{self.model}（tier {self.tier}・{self.reason}・{estimate}）"
+
+
+class ModelRouter:
+    """応答時間と失敗の記録からモデルを選ぶ（スレッドセーフ）"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats: Dict[str, ModelStats] = {}
+
+    def stats(self, model: str) -> ModelStats:
+        """model の計測値のコピー"""
+        with self._lock:
+            stats = self._stats.get(model, ModelStats())
+            return ModelStats(**vars(stats))
+
+    def choose(self, models: Sequence[GeminiModel]) -> Route:
+        """models（優先順）から1リクエストぶんのモデルを選ぶ"""
+        if not models:
+            raise ValueError("モデルが指定されていません")
+        now = self._clock()
+        with self._lock:
+            route = self._choose(models, now)
+        metrics.inc("stt_gemini_routes_total", model=route.model, reason=route.reason)
+        if route.reason == "fastest":
+            logger.debug(f"[Gemini] 振り分け: {route.describe()}")
+        else:
+            logger.info(f"[Gemini] 振り分け: {route.describe()}")
+        return route
+
+    def _choose(self, models: Sequence[GeminiModel], now: float) -> Route:
+        for tier in sorted({m.tier for m in models}):
+            healthy: List[GeminiModel] = []
+            for model in models:
+                if model.tier != tier:
+                    continue
+                stats = self._stats.setdefault(model.name, ModelStats())
+                if stats.unhealthy_until <= now:
+                    healthy.append(model)
+            if not healthy:
+                continue
+            # 同時に届いたリクエストが同じモデルに流れないよう、測るために振り分けた時点で
+            # last_measured を更新する
+            for model in healthy:
+                stats = self._stats[model.name]
+                if stats.ewma_ms is None and self._stale(stats, now):
+                    stats.last_measured = now
+                    return Route(model.name, tier, "unmeasured")
+            measured = [m for m in healthy if self._stats[m.name].ewma_ms is not None]
+            if not measured:
+                return Route(healthy[0].name, tier, "unmeasured")
+            best = min(measured, key=lambda m: self._stats[m.name].ewma_ms or 0.0)
+            for model in measured:
+                stats = self._stats[model.name]
+                if model is not best and self._stale(stats, now):
+                    stats.last_measured = now
+                    return Route(model.name, tier, "probe", stats.ewma_ms)
+            return Route(best.name, tier, "fastest", self._stats[best.name].ewma_ms)
+
+        # すべて使えない: 最も早く使えるようになるモデルを使う（優先順で同順）
+        model = min(models, key=lambda m: self._stats[m.name].unhealthy_until)
+        return Route(model.name, model.tier, "fallback", self._stats[model.name].ewma_ms)
+
+    @staticmethod
+    def _stale(stats: ModelStats, now: float) -> bool:
+        return stats.last_measured is None or now - stats.last_measured >= _PROBE_INTERVAL_SECONDS
+
+    def record(self, model: str, elapsed_ms: float, ok: bool) -> None:
+        """1リクエストの結果を記録する（失敗した応答時間は EWMA に含めない）"""
+        now = self._clock()
+        with self._lock:
+            stats = self._stats.setdefault(model, ModelStats())
+            if not ok:
+                stats.failures += 1
+                if stats.failures >= _MAX_FAILURES:
+                    stats.unhealthy_until = now + _COOLDOWN_SECONDS
+                    logger.warning(
+                        f"[Gemini] {model} が{stats.failures}回続けて失敗したため"
+                        f" {_COOLDOWN_SECONDS:.0f}秒使いません"
+                    )
+                return
+            stats.failures = 0
+            stats.unhealthy_until = 0.0
+            stats.samples += 1
+            stats.last_measured = now
+            if stats.ewma_ms is None:
+                stats.ewma_ms = elapsed_ms
+            else:
+                stats.ewma_ms += _EWMA_ALPHA * (elapsed_ms - stats.ewma_ms)
@@ -0,0 +1,176 @@
+"""
+文字起こしパイプライン（STT → Gemini補正 → ワード変換）
+
+録音やテキスト入力から切り離し、各段の結果と処理時間を PipelineResult にまとめる。
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from app.config import config
+
+if TYPE_CHECKING:
+    from app.correction_learner import CorrectionLearner
+    from app.gemini import GeminiCorrector
+    from app.google_speech import GoogleSpeechTranscriber
+    from app.word_replacement import WordReplacementManager
+
+logger = logging.getLogger("voice_input")
+
+
+@dataclass
+class PipelineResult:
+    """1発話ぶんのパイプライン処理結果"""
+
+    raw_text: str = ""
+    corrected_text: str = ""
+    replaced_text: str = ""
+    audio_seconds: float = 0.0
+    stt_ms: float = 0.0
+    gemini_ms: float = 0.0
+    replace_ms: float = 0.0
+    type_ms: float = 0.0
+    created_at: float = 0.0
+    # 省略した段と理由（"gemini:slo" のようにカンマ区切り）
+    skipped: str = ""
+
+    @property
+    def text(self) -> str:
+        """入力するテキスト（全段適用後）"""
+        return self.replaced_text
+
+    @property
+    def total_ms(self) -> float:
+        """全段の処理時間の合計"""
+        return self.stt_ms + self.gemini_ms + self.replace_ms + self.type_ms
+
+
+@dataclass(frozen=True)
+class PipelineOptions:
+    """1発話ぶんの処理の指定（ホットキーごとの設定から作る）"""
+
+    # Gemini補正を使う（False なら STT + ワード変換だけ）
+    gemini: bool = True
+    # STT の言語（空なら設定の language）
+    language: str = ""
+
+
+DEFAULT_OPTIONS = PipelineOptions()
+
+# 段ごとの途中結果を受け取るコールバック（段名, テキスト）
+StageCallback = Callable[[str, str], None]
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+class TranscriptionPipeline:
+    """STT → Gemini補正 → ワード変換を順に実行する（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        transcriber: "GoogleSpeechTranscriber",
+        gemini: "GeminiCorrector",
+        replacer: Optional["WordReplacementManager"] = None,
+        learner: Optional["CorrectionLearner"] = None,
+    ) -> None:
+        self.transcriber = transcriber
+        self.gemini = gemini
+        self._replacer = replacer
+        self._learner = learner
+
+    @property
+    def replacer(self) -> Any:
+        """ワード変換マネージャー（未指定ならグローバルインスタンス）"""
+        if self._replacer is None:
+            from app.word_replacement import word_replacer
+
+            return word_replacer
+        return self._replacer
+
+    @property
+    def learner(self) -> "CorrectionLearner":
+        """Gemini補正の学習（未指定ならグローバルインスタンス）"""
+        if self._learner is None:
+            from app.correction_learner import get_correction_learner
+
+            return get_correction_learner()
+        return self._learner
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        """
+        音声を文字起こしし、補正・変換したテキストを返す。
+        on_stage を渡すと、各段（stt / gemini / replace）の完了時に途中結果を通知する。
+        options でホットキーごとの言語と Gemini補正の有無を指定する。
+        """
+        result = PipelineResult(
+            audio_seconds=len(audio) / config.snapshot.sample_rate, created_at=time.time()
+        )
+
+        start = time.perf_counter()
+        if options.language:
+            text = self.transcriber.transcribe(audio, language=options.language)
+        else:
+            text = self.transcriber.transcribe(audio)
+        result.stt_ms = _elapsed_ms(start)
+        result.raw_text = text
+        logger.info(f"[STT] {text}")
+        if on_stage:
+            on_stage("stt", text)
+
+        if options.gemini and self.gemini.enabled and text:
+            learner = self.learner if config.snapshot.learn_corrections else None
+            learned = learner.correct(text) if learner else None
+            if learned is not None:
+                # 学習済みの直し方だけで Gemini と同じ結果になる型なので呼ばない
+                result.skipped = "gemini:learned"
+                if learned != text:
+                    logger.info(f"[学習済み補正] {learned}")
+                corrected = learned
+            else:
+                start = time.perf_counter()
+                corrected = self.gemini.correct(text)
+                result.gemini_ms = _elapsed_ms(start)
+                if corrected != text:
+                    logger.info(f"[Gemini補正] {corrected}")
+                if not self.gemini.last_ok:
+                    # 元のテキストのまま返ってきた（APIエラー・打ち切り）。学習には使わない
+                    result.skipped = "gemini:failed"
+                elif learner:
+                    learner.submit(text, corrected)
+            text = corrected
+            if on_stage:
+                on_stage("gemini", text)
+        result.corrected_text = text
+
+        start = time.perf_counter()
+        replaced = self.replacer.apply(text)
+        result.replace_ms = _elapsed_ms(start)
+        if replaced != text:
+            logger.info(f"[ワード変換] {replaced}")
+        result.replaced_text = replaced
+        if on_stage:
+            on_stage("replace", replaced)
+
+        return result
+
+
+def create_default_pipeline() -> TranscriptionPipeline:
+    """Google Speech + Gemini補正 + ワード変換の標準構成を作成する（macOS 専用モジュール不要）"""
+    from app.gemini import gemini
+    from app.google_speech import GoogleSpeechTranscriber
+
+    transcriber = GoogleSpeechTranscriber()
+    transcriber.load()
+    return TranscriptionPipeline(transcriber, gemini)
@@ -0,0 +1,327 @@
+"""
+パイプラインのワーカープロセス
+
+STT → Gemini補正 → ワード変換を常駐する別プロセスで実行し、録音コールバック・
+キーボードリスナー・メニューバー UI と GIL を共有しないようにする。
+音声は multiprocessing.shared_memory のセグメントに置いて名前と長さだけを送り
+（pickle しない）、ワーカーはセグメントを直接 NumPy 配列として読む。結果はパイプで返す。
+
+セグメントはプールして使い回す。呼び出し側の配列は履歴の書き込みスレッドなどが
+process() の後も参照するため、共有メモリへは1回だけコピーしてから渡す。
+
+ワーカーは設定・ワード変換ルール・プロンプトを自分のプロセスに読み込んでいるので、
+設定ウィンドウでの変更は reload() で ("reload", 変更種別) として送り、ワーカー側でも
+読み直す（送った後の発話から新しい設定で処理される）。
+
+spawn したワーカーにはログのハンドラがないので、"voice_input" ロガーのレコードは
+multiprocessing のキューで親へ送り、親の "voice_input" ロガー（ファイル・コンソール）に流す。
+"""
+
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from app.pipeline import (
+    DEFAULT_OPTIONS,
+    PipelineOptions,
+    PipelineResult,
+    StageCallback,
+    create_default_pipeline,
+)
+from app.settings import apply_change
+
+logger = logging.getLogger("voice_input")
+
+# ワーカー内で同時に処理する発話数（上流の待ち時間を重ねるため）
+_WORKER_THREADS = 4
+# 共有メモリセグメントの最小サイズ（バイト、16kHz で約16秒）
+_MIN_SEGMENT_BYTES = 1024 * 1024
+# ワーカーの起動（パイプラインの初期化）を待つ上限（秒）
+_START_TIMEOUT = 60.0
+
+_DTYPE = np.dtype(np.float32)
+
+
+class _ParentLogHandler(logging.Handler):
+    """ワーカーから届いたログレコードを、親プロセスの "voice_input" ロガーで処理する"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        logger.handle(record)
+
+
+def _worker_main(
+    conn: Connection,
+    factory: Callable[[], Any],
+    on_reload: Callable[[str], None],
+    log_queue: "multiprocessing.Queue[logging.LogRecord]",
+) -> None:
+    """
+    ワーカープロセスの本体
+    （親から (id, セグメント名, サンプル数, 途中結果の要否, PipelineOptions) を受け取る）
+    """
+    # パイプラインの初期化中のログも親へ送る
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    try:
+        pipeline = factory()
+    except Exception as e:
+        conn.send(("failed", str(e)))
+        return
+    conn.send(("ready",))
+
+    send_lock = threading.Lock()
+    # 名前 → アタッチ済みセグメント（親がプールして使い回すのでこちらも保持する）
+    segments: Dict[str, shared_memory.SharedMemory] = {}
+    segments_lock = threading.Lock()
+
+    def send(message: Tuple[Any, ...]) -> None:
+        with send_lock:
+            conn.send(message)
+
+    def attach(name: str) -> shared_memory.SharedMemory:
+        with segments_lock:
+            segment = segments.get(name)
+            if segment is None:
+                segment = segments[name] = shared_memory.SharedMemory(name=name)
+            return segment
+
+    def handle(
+        request_id: int, name: str, frames: int, stream: bool, options: PipelineOptions
+    ) -> None:
+        audio = np.ndarray((frames,), dtype=_DTYPE, buffer=attach(name).buf)
+        on_stage = (
+            (lambda stage, text: send(("stage", request_id, stage, text))) if stream else None
+        )
+        try:
+            result = pipeline.process(audio, on_stage, options)
+            message: Tuple[Any, ...] = ("result", request_id, result)
+        except Exception as e:
+            message = ("error", request_id, str(e))
+        # 親は結果を受け取るとセグメントを再利用・解放するので、先に参照を外す
+        del audio
+        send(message)
+
+    with ThreadPoolExecutor(max_workers=_WORKER_THREADS) as executor:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message is None:
+                break
+            if message[0] == "release":
+                # 親がプールから外したセグメントを閉じる
+                with segments_lock:
+                    segment = segments.pop(message[1], None)
+                if segment is not None:
+                    _close_segment(segment)
+                continue
+            if message[0] == "reload":
+                # 受信ループの中で読み直す（この後に届いた発話は新しい設定で処理される）
+                try:
+                    on_reload(message[1])
+                except Exception as e:
+                    logger.error(f"[ワーカー] 設定を読み直せません: {e}")
+                continue
+            executor.submit(handle, *message)
+
+    for segment in segments.values():
+        _close_segment(segment)
+
+
+def _close_segment(segment: shared_memory.SharedMemory) -> None:
+    try:
+        segment.close()
+    except BufferError:
+        # パイプラインが音声への参照を残している（プロセス終了時に解放される）
+        pass
+
+
+class WorkerPipeline:
+    """ワーカープロセスで文字起こしするパイプライン（process はスレッドセーフ）"""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any] = create_default_pipeline,
+        max_pool_bytes: int = 64 * 1024 * 1024,
+        on_reload: Callable[[str], None] = apply_change,
+    ) -> None:
+        self._factory = factory
+        self._on_reload = on_reload
+        self._max_pool_bytes = max_pool_bytes
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._conn: Optional[Connection] = None
+        self._log_listener: Optional[QueueListener] = None
+        # 処理中のリクエスト（id → (Future, 途中結果のコールバック)）
+        self._pending: Dict[int, Tuple[Future, Optional[StageCallback]]] = {}
+        # 空きセグメント（小さい順）
+        self._free: List[shared_memory.SharedMemory] = []
+
+    def start(self) -> None:
+        """ワーカーを起動し、パイプラインの初期化が終わるまで待つ（起動済みなら何もしない）"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            # fork だと親のスレッド（録音・UI）の状態を引き継ぐため spawn で起動する
+            ctx = multiprocessing.get_context("spawn")
+            parent_conn, child_conn = ctx.Pipe()
+            log_queue = ctx.Queue()
+            log_listener = QueueListener(log_queue, _ParentLogHandler())
+            log_listener.start()
+            process = ctx.Process(
+                target=_worker_main,
+                args=(child_conn, self._factory, self._on_reload, log_queue),
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            if not parent_conn.poll(_START_TIMEOUT):
+                process.terminate()
+                log_listener.stop()
+                raise RuntimeError("[ワーカー] 起動がタイムアウトしました")
+            message = parent_conn.recv()
+            if message[0] != "ready":
+                process.join()
+                log_listener.stop()
+                raise RuntimeError(f"[ワーカー] パイプラインを初期化できません: {message[1]}")
+            self._stop_log_listener()
+            self._log_listener = log_listener
+            self._process = process
+            self._conn = parent_conn
+            threading.Thread(target=self._receive, args=(parent_conn,), daemon=True).start()
+            logger.info(f"[ワーカー] 起動しました（pid={process.pid}）")
+
+    def close(self) -> None:
+        """ワーカーを終了し、共有メモリを解放する"""
+        with self._lock:
+            process, conn = self._process, self._conn
+            self._process = self._conn = None
+            if conn is not None:
+                try:
+                    with self._send_lock:
+                        conn.send(None)
+                except OSError:
+                    pass
+            if process is not None:
+                process.join(5)
+                if process.is_alive():
+                    process.terminate()
+            # ワーカーが終わるまでに送ったログを書き終えてから止める
+            self._stop_log_listener()
+            for segment in self._free:
+                segment.close()
+                segment.unlink()
+            self._free.clear()
+
+    def _stop_log_listener(self) -> None:
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
+
+    def reload(self, change: str) -> None:
+        """
+        設定の変更（app.settings の CHANGE_*）をワーカーに送って読み直させる
+        （起動前なら何もしない。起動時に最新の設定を読み込む）
+        """
+        with self._send_lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.send(("reload", change))
+            except OSError:
+                pass
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        """音声をワーカーで文字起こしし、補正・変換済みの結果を返す"""
+        self.start()
+        segment = self._acquire(max(len(audio), 1) * _DTYPE.itemsize)
+        try:
+            shared = np.ndarray((len(audio),), dtype=_DTYPE, buffer=segment.buf)
+            shared[:] = audio
+            del shared
+            request_id = next(self._ids)
+            future: Future = Future()
+            self._pending[request_id] = (future, on_stage)
+            try:
+                with self._send_lock:
+                    if self._conn is None:
+                        raise RuntimeError("[ワーカー] 停止しています")
+                    self._conn.send(
+                        (request_id, segment.name, len(audio), on_stage is not None, options)
+                    )
+                kind, payload = future.result()
+            finally:
+                self._pending.pop(request_id, None)
+        finally:
+            self._release(segment)
+        if kind == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def _acquire(self, nbytes: int) -> shared_memory.SharedMemory:
+        """nbytes 以上の空きセグメントを取り出す（なければ作る）"""
+        with self._lock:
+            for i, segment in enumerate(self._free):
+                if segment.size >= nbytes:
+                    return self._free.pop(i)
+        size = _MIN_SEGMENT_BYTES
+        while size < nbytes:
+            size *= 2
+        return shared_memory.SharedMemory(create=True, size=size)
+
+    def _release(self, segment: shared_memory.SharedMemory) -> None:
+        """セグメントをプールに戻す（合計が上限を超えるなら解放する）"""
+        with self._lock:
+            pooled = sum(s.size for s in self._free)
+            if self._conn is not None and pooled + segment.size <= self._max_pool_bytes:
+                self._free.append(segment)
+                self._free.sort(key=lambda s: s.size)
+                return
+        if self._conn is not None:
+            try:
+                with self._send_lock:
+                    self._conn.send(("release", segment.name))
+            except OSError:
+                pass
+        segment.close()
+        segment.unlink()
+
+    def _receive(self, conn: Connection) -> None:
+        """ワーカーからの結果を受け取り、待っている呼び出しに渡す（別スレッド用）"""
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind, request_id = message[0], message[1]
+            entry = self._pending.get(request_id)
+            if entry is None:
+                continue
+            future, on_stage = entry
+            if kind == "stage":
+                if on_stage is not None:
+                    on_stage(message[2], message[3])
+            else:
+                future.set_result((kind, message[2]))
+        # ワーカーが終了した（次の process() で起動し直す）
+        logger.warning("[ワーカー] ワーカープロセスが終了しました")
+        for future, _ in list(self._pending.values()):
+            if not future.done():
+                future.set_result(("error", "[ワーカー] ワーカープロセスが終了しました"))
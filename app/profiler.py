@@ -0,0 +1,182 @@
+"""
+発話ごとのサンプリングプロファイラ（オプトイン）
+
+有効にすると、録音開始から入力完了までの間、録音コールバックのスレッドと文字起こしの
+スレッドのスタックを一定間隔で採取し、発話ごとに folded 形式（flamegraph.pl / speedscope で
+読める `フレーム;フレーム;... 回数`）でログディレクトリの profiles/ に書き出す。
+処理時間がしきい値以上の発話だけを保存でき、保存先の合計サイズには上限がある。
+
+config.profile_enabled または環境変数 STT_PROFILE=1 で有効になる。
+"""
+
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Counter, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.logging_setup import LOG_DIR
+
+logger = logging.getLogger("voice_input")
+
+PROFILE_DIR = LOG_DIR / "profiles"
+
+
+def _env_enabled() -> bool:
+    """環境変数 STT_PROFILE で有効にされているか（呼ぶたびに読む）"""
+    return os.getenv("STT_PROFILE", "") not in ("", "0")
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """1発話ぶんのプロファイル（採取対象スレッドとスタックの集計）"""
+
+    def __init__(self, profiler: "SamplingProfiler", name: str) -> None:
+        self._profiler = profiler
+        self.name = name
+        self.started_at = time.time()
+        # スレッドID → ラベル（スタックの根に付ける）
+        self.threads: Dict[int, str] = {}
+        self.counts: Counter[Tuple[str, ...]] = collections.Counter()
+        self.samples = 0
+
+    def watch_current_thread(self, label: str) -> None:
+        """呼び出し元のスレッドを採取対象に加える（録音コールバックから毎回呼んでよい）"""
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = label
+
+    def cancel(self) -> None:
+        """採取を終え、何も書き出さない（短すぎて破棄した録音など）"""
+        self._profiler._finish(self, None)
+
+    def end(self, elapsed_ms: float) -> Optional[Path]:
+        """採取を終え、elapsed_ms がしきい値以上ならファイルに書き出してパスを返す"""
+        return self._profiler._finish(self, elapsed_ms)
+
+
+class SamplingProfiler:
+    """sys._current_frames() を一定間隔で読むサンプリングプロファイラ"""
+
+    def __init__(
+        self,
+        out_dir: Path = PROFILE_DIR,
+        interval_ms: float = 5.0,
+        min_ms: float = 0.0,
+        max_bytes: int = 50 * 1024 * 1024,
+    ) -> None:
+        self.out_dir = out_dir
+        self.interval_ms = interval_ms
+        self.min_ms = min_ms
+        self.max_bytes = max_bytes
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def begin(self, name: str = "utterance") -> ProfileSession:
+        """プロファイルを開始する（採取スレッドは実行中のセッションがある間だけ動く）"""
+        session = ProfileSession(self, name)
+        with self._lock:
+            self._sessions.append(session)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+                self._sampler.start()
+        return session
+
+    def _sample_loop(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._sampler = None
+                    return
+            frames = sys._current_frames()
+            # スタックはロックの外で辿り、集計への反映だけをロックの中で行う
+            sampled: List[Tuple[ProfileSession, List[Tuple[str, ...]]]] = []
+            for session in sessions:
+                stacks: List[Tuple[str, ...]] = []
+                for tid, label in list(session.threads.items()):
+                    frame = frames.get(tid)
+                    if frame is None or tid == me:
+                        continue
+                    stack: List[str] = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(label)
+                    stacks.append(tuple(reversed(stack)))
+                sampled.append((session, stacks))
+            with self._lock:
+                # 採取中に終わった（_finish で書き出し中の）セッションには反映しない
+                for session, stacks in sampled:
+                    if session not in self._sessions:
+                        continue
+                    session.samples += 1
+                    for stack in stacks:
+                        session.counts[stack] += 1
+            del frames
+            time.sleep(self.interval_ms / 1000)
+
+    def _finish(self, session: ProfileSession, elapsed_ms: Optional[float]) -> Optional[Path]:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        if elapsed_ms is None or elapsed_ms < self.min_ms or not session.counts:
+            return None
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started_at))
+        path = self.out_dir / f"{stamp}-{session.name}-{elapsed_ms:.0f}ms.folded"
+        lines = [f"{';'.join(stack)} {count}" for stack, count in session.counts.most_common()]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        self._enforce_retention()
+        logger.info(f"[プロファイル] {elapsed_ms:.0f}ms → {path}")
+        return path
+
+    def _enforce_retention(self) -> None:
+        """合計サイズが上限を超えたら古いファイルから削除する"""
+        files = []
+        for path in self.out_dir.glob("*.folded"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files[:-1]:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+_profiler: Optional[SamplingProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def begin_profile(name: str = "utterance") -> Optional[ProfileSession]:
+    """
+    プロファイルが有効ならセッションを開始する（無効なら None）。
+    ホットキーと VAD の両方のスレッドから呼ばれる
+    """
+    global _profiler
+    snap = config.snapshot
+    if not (snap.profile_enabled or _env_enabled()):
+        return None
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = SamplingProfiler()
+    profiler = _profiler
+    profiler.interval_ms = snap.profile_interval_ms
+    profiler.min_ms = snap.profile_min_ms
+    profiler.max_bytes = snap.profile_max_bytes
+    return profiler.begin(name)
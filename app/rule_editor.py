@@ -0,0 +1,207 @@
+"""
+ワード変換ルールの編集セッション（設定画面のテーブルの中身）
+
+数万件のルールを行ごとのオブジェクトにせず、コンパイル済み辞書をそのまま元データとして
+参照し、編集・追加・削除した行だけを上書きとして持つ。表示する行はルール番号の配列
+（絞り込み・並べ替えの結果）で表し、ルール自体はコピーしない。
+保存時は変更した行だけを RuleChanges として WordReplacementManager.apply_changes に渡す。
+
+行（row）は表示上の位置、ルール ID は元の辞書のルール番号（追加した行は辞書の件数以降）。
+並べ替えは表示だけで、ルールの適用順（保存される順番）は変わらない。
+"""
+
+import bisect
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from app.compiled_dictionary import CompiledDictionary
+
+# 列番号
+INPUT_COLUMN = 0
+OUTPUT_COLUMN = 1
+
+
+@dataclass
+class RuleChanges:
+    """元の辞書に対する変更（ルール番号で指定）"""
+
+    updates: Dict[int, Tuple[str, str]] = field(default_factory=dict)
+    deletions: FrozenSet[int] = frozenset()
+    additions: List[Tuple[str, str]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.updates or self.deletions or self.additions)
+
+
+class RuleEditor:
+    """コンパイル済み辞書の上に編集内容を重ねたルール表（UI スレッド専用）"""
+
+    def __init__(self, dictionary: CompiledDictionary) -> None:
+        self.base = dictionary
+        self._count = len(dictionary)
+        # 編集した元のルール（ルール ID → (入力, 出力)）
+        self._edits: Dict[int, Tuple[str, str]] = {}
+        # 追加したルール（ルール ID = 元の件数 + 位置）
+        self._added: List[Tuple[str, str]] = []
+        self._deleted: Set[int] = set()
+        # 表示する行のルール ID（None なら削除のないルール番号順の全件）
+        self._order: Optional[array] = None
+        self._query = ""
+        self._sort: Optional[Tuple[int, bool]] = None
+
+    # ========== 参照 ==========
+
+    def __len__(self) -> int:
+        """表示している行数"""
+        if self._order is None:
+            return self._count + len(self._added)
+        return len(self._order)
+
+    @property
+    def total(self) -> int:
+        """削除していないルールの件数（絞り込みに関係なく）"""
+        return self._count + len(self._added) - len(self._deleted)
+
+    @property
+    def query(self) -> str:
+        """現在の絞り込み条件"""
+        return self._query
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.changes())
+
+    def rule_id(self, row: int) -> int:
+        return row if self._order is None else self._order[row]
+
+    def cell(self, row: int, column: int) -> str:
+        return self._rule(self.rule_id(row))[column]
+
+    def _rule(self, rule_id: int) -> Tuple[str, str]:
+        if rule_id >= self._count:
+            return self._added[rule_id - self._count]
+        edited = self._edits.get(rule_id)
+        return edited if edited is not None else self.base.rule(rule_id)
+
+    def _matches(self, rule_id: int, query: str) -> bool:
+        input_word, output_word = self._rule(rule_id)
+        return query in input_word or query in output_word
+
+    # ========== 編集 ==========
+
+    def set_cell(self, row: int, column: int, text: str) -> None:
+        rule_id = self.rule_id(row)
+        rule = list(self._rule(rule_id))
+        rule[column] = text
+        new_rule = (rule[0], rule[1])
+        if rule_id >= self._count:
+            self._added[rule_id - self._count] = new_rule
+        elif new_rule == self.base.rule(rule_id):
+            self._edits.pop(rule_id, None)
+        else:
+            self._edits[rule_id] = new_rule
+
+    def append(self) -> int:
+        """空のルールを末尾（適用順の最後）に追加し、その行を返す（絞り込み中でも表示する）"""
+        self._added.append(("", ""))
+        if self._order is not None:
+            self._order.append(self._count + len(self._added) - 1)
+        return len(self) - 1
+
+    def remove_rows(self, row: int, count: int) -> None:
+        """表示上の row から count 行を削除する"""
+        if self._order is None:
+            self._order = array("I", range(len(self)))
+        self._deleted.update(self._order[row : row + count])
+        del self._order[row : row + count]
+
+    def changes(self) -> RuleChanges:
+        """元の辞書に対する変更（保存用）"""
+        return RuleChanges(
+            updates={i: r for i, r in self._edits.items() if i not in self._deleted},
+            deletions=frozenset(i for i in self._deleted if i < self._count),
+            additions=[
+                rule
+                for k, rule in enumerate(self._added)
+                if self._count + k not in self._deleted and rule != ("", "")
+            ],
+        )
+
+    # ========== 絞り込み・並べ替え ==========
+
+    def set_filter(self, query: str) -> None:
+        """入力か出力に query を含む行だけを表示する（空なら全件）"""
+        if query == self._query:
+            return
+        if self._query and self._query in query and self._order is not None:
+            # 条件を狭めただけなら、表示中の行から絞る（並び順もそのまま使える）
+            self._order = array("I", (i for i in self._order if self._matches(i, query)))
+        else:
+            self._order = self._matching_ids(query)
+            if self._sort is not None:
+                self._order = self._sorted(self._order, *self._sort)
+        self._query = query
+        self._normalize()
+
+    def sort(self, column: Optional[int], descending: bool = False) -> None:
+        """column の値で並べ替える（None ならルールの適用順に戻す）"""
+        if column is None and self._sort is None:
+            return
+        self._sort = None if column is None else (column, descending)
+        ids: Iterable[int] = range(len(self)) if self._order is None else self._order
+        if column is None:
+            self._order = array("I", sorted(ids))
+        else:
+            self._order = self._sorted(ids, column, descending)
+        self._normalize()
+
+    def _live_ids(self) -> Iterable[int]:
+        ids = range(self._count + len(self._added))
+        if not self._deleted:
+            return ids
+        return (i for i in ids if i not in self._deleted)
+
+    def _matching_ids(self, query: str) -> array:
+        """query に一致する行のルール ID（ルール番号順）"""
+        if not query:
+            return array("I", self._live_ids())
+        overlay = set(self._edits) | self._deleted
+        # 元の辞書はブロブを直接検索し、編集・追加した行だけを Python で確かめる
+        ids = [i for i in self.base.search(query) if i not in overlay]
+        ids.extend(i for i in self._edits if i not in self._deleted and self._matches(i, query))
+        ids.extend(
+            i
+            for i in range(self._count, self._count + len(self._added))
+            if i not in self._deleted and self._matches(i, query)
+        )
+        return array("I", sorted(ids))
+
+    def _sorted(self, ids: Iterable[int], column: int, descending: bool) -> array:
+        """ルール ID を column の値で並べ替える（同じ値はルール番号順）"""
+        if column == INPUT_COLUMN:
+            # 元の辞書のソート済み索引を使い、編集・追加した行だけを挿入する
+            visible = set(ids)
+            ordered = [i for i in self.base.sorted_rules() if i in visible and i not in self._edits]
+
+            def sort_key(i: int) -> Tuple[str, int]:
+                return self._rule(i)[0], i
+
+            for i in sorted((i for i in visible if i >= self._count or i in self._edits)):
+                ordered.insert(bisect.bisect_right(ordered, sort_key(i), key=sort_key), i)
+        else:
+            ordered = sorted(ids, key=lambda i: (self._rule(i)[column], i))
+        if descending:
+            ordered.reverse()
+        return array("I", ordered)
+
+    def _normalize(self) -> None:
+        """絞り込み・並べ替え・削除がなければ配列を持たない（全件表示を O(1) にする）"""
+        if (
+            self._order is not None
+            and not self._query
+            and self._sort is None
+            and not self._deleted
+            and len(self._order) == self._count + len(self._added)
+        ):
+            self._order = None
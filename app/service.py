@@ -0,0 +1,311 @@
+"""
+パイプラインのサービスモード（`python main.py serve`）
+
+1つのプロセスで STT / Gemini のクライアントとワード変換辞書を共有し、ローカルの HTTP API で
+音声を受け取って補正済みテキストを返す。ホットキー側は音声を送るだけの薄いクライアントになる。
+
+    POST /transcribe?rate=16000[&stream=1]   本文: 16bit リトルエンディアン PCM（モノラル）
+    GET  /health                             処理中・待機中の件数
+
+stream=1 のときは段ごとの途中結果を NDJSON（chunked）で順に返し、最後に結果全体を返す。
+上流（STT / Gemini）の同時呼び出し数はセマフォで制限する。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from app.audio_io import resample
+from app.pipeline import DEFAULT_OPTIONS, PipelineOptions, PipelineResult
+
+logger = logging.getLogger("voice_input")
+
+# 受け付ける音声の最大の長さ（最大録音時間）に上乗せする余裕（秒）
+_BODY_HEADROOM_SECONDS = 10
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Error"}
+
+
+class _BadRequest(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def result_to_dict(result: PipelineResult) -> Dict[str, Any]:
+    """PipelineResult を JSON 用の辞書に変換する"""
+    data = asdict(result)
+    data["text"] = result.text
+    return data
+
+
+class PipelineService:
+    """パイプラインを asyncio の HTTP サーバーとして公開する"""
+
+    def __init__(
+        self,
+        pipeline: Any,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_concurrency: int = 8,
+        sample_rate: int = 16000,
+        max_seconds: float = 1800.0,
+    ) -> None:
+        self.pipeline = pipeline
+        self._host = host
+        self._port = port
+        self._sample_rate = sample_rate
+        # 最大録音時間ぶんの 16bit PCM を受け付ける
+        self.max_body_bytes = int((max_seconds + _BODY_HEADROOM_SECONDS) * sample_rate) * 2
+        self._max_concurrency = max_concurrency
+        # パイプラインは同期 API なので、同時実行数ぶんのスレッドで動かす
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="pipeline")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self.in_flight = 0
+        self.waiting = 0
+
+    @property
+    def port(self) -> int:
+        """待ち受けポート（0 を指定した場合は割り当てられた番号）"""
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        """待ち受けを開始"""
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        logger.info(f"[サービス] http://{self._host}:{self.port} で待ち受け中")
+
+    async def serve_forever(self) -> None:
+        """停止されるまで待ち受ける"""
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """待ち受けを停止"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self._executor.shutdown(wait=False)
+
+    # ========== HTTP ==========
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """1接続ぶんのリクエストを順に処理する（keep-alive 対応）"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except _BadRequest as e:
+                    # 本文を読み飛ばせないので応答して接続を閉じる
+                    self._write_json(writer, e.status, {"error": str(e)})
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(method, target, body, writer)
+                except _BadRequest as e:
+                    self._write_json(writer, e.status, {"error": str(e)})
+                except Exception as e:
+                    logger.error(f"[サービス] エラー: {e}")
+                    self._write_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """リクエスト行・ヘッダー・本文を読む（接続が閉じられたら None）"""
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _version = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise _BadRequest(400, "malformed request line") from None
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise _BadRequest(400, "content-length must be an integer") from None
+        if length < 0:
+            raise _BadRequest(400, "content-length must not be negative")
+        if length > self.max_body_bytes:
+            raise _BadRequest(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def _dispatch(
+        self, method: str, target: str, body: bytes, writer: asyncio.StreamWriter
+    ) -> None:
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if method == "GET" and url.path == "/health":
+            self._write_json(
+                writer, 200, {"status": "ok", "in_flight": self.in_flight, "waiting": self.waiting}
+            )
+        elif method == "POST" and url.path == "/transcribe":
+            try:
+                rate = int(query.get("rate", [str(self._sample_rate)])[0])
+            except ValueError:
+                raise _BadRequest(400, "rate must be an integer") from None
+            if rate <= 0:
+                raise _BadRequest(400, "rate must be positive")
+            if len(body) % 2:
+                raise _BadRequest(400, "body must be 16-bit PCM")
+            audio = np.frombuffer(body, dtype="<i2").astype(np.float32) / 32767
+            audio = resample(audio, rate, self._sample_rate)
+            options = PipelineOptions(
+                gemini=query.get("gemini", ["1"])[0] not in ("", "0"),
+                language=query.get("language", [""])[0],
+            )
+            if query.get("stream", ["0"])[0] not in ("", "0"):
+                await self._transcribe_streaming(audio, writer, options)
+            else:
+                result = await self.transcribe(audio, options=options)
+                self._write_json(writer, 200, result_to_dict(result))
+        else:
+            raise _BadRequest(404, f"{method} {url.path} not found")
+
+    @staticmethod
+    def _write_json(writer: asyncio.StreamWriter, status: int, data: Dict[str, Any]) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+            + body
+        )
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: Dict[str, Any]) -> None:
+        line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(line):X}\r\n".encode("latin-1") + line + b"\r\n")
+
+    # ========== パイプライン ==========
+
+    async def transcribe(
+        self,
+        audio: np.ndarray,
+        queue: Optional["asyncio.Queue[Any]"] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        """
+        同時実行数の上限内でパイプラインを実行する。
+        queue を渡すと、段ごとの途中結果 (段名, テキスト) をイベントループ上で積む。
+        """
+        assert self._semaphore is not None
+        loop = asyncio.get_running_loop()
+        on_stage = None
+        if queue is not None:
+
+            def on_stage(stage: str, text: str) -> None:
+                loop.call_soon_threadsafe(queue.put_nowait, (stage, text))
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(
+                self._executor, self.pipeline.process, audio, on_stage, options
+            )
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _transcribe_streaming(
+        self,
+        audio: np.ndarray,
+        writer: asyncio.StreamWriter,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> None:
+        """段ごとの途中結果を chunked で返し、最後に結果全体を返す"""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson; charset=utf-8\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        task = asyncio.create_task(self.transcribe(audio, queue, options))
+        while True:
+            getter = asyncio.create_task(queue.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            stage, text = getter.result()
+            self._write_chunk(writer, {"stage": stage, "text": text})
+            await writer.drain()
+        # 完了通知より後に届いた途中結果も順に返す
+        while not queue.empty():
+            stage, text = queue.get_nowait()
+            self._write_chunk(writer, {"stage": stage, "text": text})
+        try:
+            self._write_chunk(writer, {"stage": "done", **result_to_dict(task.result())})
+        except Exception as e:
+            self._write_chunk(writer, {"stage": "error", "error": f"{type(e).__name__}: {e}"})
+        writer.write(b"0\r\n\r\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """`python main.py serve [--host 127.0.0.1] [--port 8765] [--concurrency 8]`"""
+    from app.config import config
+    from app.logging_setup import setup_logging
+    from app.pipeline import create_default_pipeline
+
+    parser = argparse.ArgumentParser(
+        prog="main.py serve", description="文字起こしパイプラインをローカル HTTP API で公開する"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス")
+    parser.add_argument("--port", type=int, default=config.service_port, help="待ち受けポート")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=config.service_max_concurrency,
+        help="上流（STT / Gemini）の同時呼び出し数",
+    )
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    service = PipelineService(
+        create_default_pipeline(),
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.concurrency,
+        sample_rate=config.snapshot.sample_rate,
+        max_seconds=config.snapshot.record_max_seconds,
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
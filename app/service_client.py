@@ -0,0 +1,95 @@
+"""
+サービスモードの薄いクライアント
+
+TranscriptionPipeline と同じ process() を持ち、音声をサービスへ送って結果を受け取る。
+ホットキー側のプロセスは STT / Gemini のクライアントを持たずに済む。
+"""
+
+import http.client
+import json
+import threading
+from dataclasses import fields
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+import numpy.typing as npt
+
+from app.config import config
+from app.pipeline import DEFAULT_OPTIONS, PipelineOptions, PipelineResult, StageCallback
+
+_RESULT_FIELDS = {f.name for f in fields(PipelineResult)}
+
+
+def _to_result(data: Dict[str, Any]) -> PipelineResult:
+    return PipelineResult(**{k: v for k, v in data.items() if k in _RESULT_FIELDS})
+
+
+class RemotePipeline:
+    """サービスに音声を送って文字起こしするパイプライン（スレッドごとに接続を再利用）"""
+
+    def __init__(self, url: str, timeout: float = 30.0) -> None:
+        parts = urlsplit(url)
+        self._host = parts.hostname or "127.0.0.1"
+        self._port = parts.port or 80
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, path: str, body: bytes) -> http.client.HTTPResponse:
+        """リクエストを送る（keep-alive 切れの場合は1回だけ接続し直す）"""
+        headers = {"Content-Type": "audio/L16", "Content-Length": str(len(body))}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return conn.getresponse()
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.BadStatusLine):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        """音声を送信し、補正・変換済みの結果を返す（on_stage で途中結果を受け取れる）"""
+        pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        params: Dict[str, Any] = {"rate": config.snapshot.sample_rate}
+        if not options.gemini:
+            params["gemini"] = 0
+        if options.language:
+            params["language"] = options.language
+        path = f"/transcribe?{urlencode(params)}"
+        if on_stage is None:
+            response = self._request(path, pcm)
+            data = json.loads(response.read())
+            if response.status != 200:
+                raise RuntimeError(f"[サービス] {data.get('error', response.status)}")
+            return _to_result(data)
+
+        response = self._request(path + "&stream=1", pcm)
+        if response.status != 200:
+            data = json.loads(response.read())
+            raise RuntimeError(f"[サービス] {data.get('error', response.status)}")
+        for line in response:
+            event = json.loads(line)
+            stage = event.pop("stage")
+            if stage == "done":
+                response.read()
+                return _to_result(event)
+            if stage == "error":
+                response.read()
+                raise RuntimeError(f"[サービス] {event['error']}")
+            on_stage(stage, event["text"])
+        raise RuntimeError("[サービス] 結果を受け取る前に接続が閉じられました")
@@ -0,0 +1,269 @@
+"""
+ディクテーションセッションの記録（再現用）
+
+ホットキーの押下・解放、録音ブロック（生の float32）、STT / Gemini の応答と処理時間、
+発話ごとの結果を、記録開始からの経過時間付きで1つの JSONL ファイルに書き出す。
+タイミングに依存する不具合（処理スレッドの重なり、録音中フラグの競合など）を
+app/session_replay.py でマイク・キーボード・ネットワークなしに再現するために使う。
+
+録音コールバックではブロックのコピーをキューに積むだけで、エンコードと書き込みは
+専用スレッドで行う。環境変数 STT_RECORD_SESSION=ファイルパス で有効になる。
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from app.config import config
+from app.pipeline import DEFAULT_OPTIONS, PipelineOptions, PipelineResult
+
+logger = logging.getLogger("voice_input")
+
+# ファイル形式のバージョン（互換性のない変更をしたら上げる）
+FORMAT_VERSION = 1
+
+# 記録先（未設定なら記録しない）
+RECORD_PATH_ENV = "STT_RECORD_SESSION"
+
+# 入力ストリームを作る関数（sd.InputStream と同じキーワード引数を受け取る）
+StreamFactory = Callable[..., Any]
+
+_STOP = object()
+
+
+def audio_key(audio: npt.NDArray[np.float32]) -> str:
+    """音声の内容から STT 応答を引くキーを作る（再生時に同じ音声なら同じキーになる）"""
+    data = np.ascontiguousarray(audio, dtype=np.float32)
+    return hashlib.sha1(data.tobytes()).hexdigest()
+
+
+def encode_block(block: npt.NDArray[np.float32]) -> str:
+    return base64.b64encode(np.ascontiguousarray(block, dtype=np.float32).tobytes()).decode()
+
+
+def decode_block(data: str, channels: int) -> npt.NDArray[np.float32]:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32).reshape(-1, channels)
+
+
+class _RecordingTranscriber:
+    """transcribe の応答と処理時間を記録する STT のラッパー"""
+
+    def __init__(self, inner: Any, recorder: "SessionRecorder") -> None:
+        self._inner = inner
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def transcribe(self, audio: npt.NDArray[np.float32], **kwargs: Any) -> str:
+        key = audio_key(audio)
+        start = time.perf_counter()
+        try:
+            text = self._inner.transcribe(audio, **kwargs)
+        except Exception as e:
+            self._recorder.event("stt", key=key, ms=_elapsed_ms(start), error=str(e))
+            raise
+        self._recorder.event("stt", key=key, ms=_elapsed_ms(start), text=text)
+        return text
+
+
+class _RecordingCorrector:
+    """correct の応答と処理時間を記録する Gemini 補正のラッパー"""
+
+    def __init__(self, inner: Any, recorder: "SessionRecorder") -> None:
+        self._inner = inner
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def correct(self, text: str) -> str:
+        start = time.perf_counter()
+        try:
+            corrected = self._inner.correct(text)
+        except Exception as e:
+            self._recorder.event("gemini", key=text, ms=_elapsed_ms(start), error=str(e))
+            raise
+        route = getattr(self._inner, "last_route", None)
+        # どのモデルに振り分けたか（再生では使わない・調査用）
+        fields: Dict[str, Any] = {"model": route.model, "route": route.reason} if route else {}
+        if not getattr(self._inner, "last_ok", True):
+            # 元のテキストのまま返ってきた（APIエラー・打ち切り）。再生でも学習に使わない
+            fields["ok"] = False
+        self._recorder.event("gemini", key=text, ms=_elapsed_ms(start), text=corrected, **fields)
+        return corrected
+
+
+class _RecordingPipeline:
+    """段ごとの上流を持たないパイプライン（RemotePipeline など）の結果をまとめて記録する"""
+
+    def __init__(self, inner: Any, recorder: "SessionRecorder") -> None:
+        self._inner = inner
+        self._recorder = recorder
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[Any] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> Any:
+        key = audio_key(audio)
+        start = time.perf_counter()
+        try:
+            result = self._inner.process(audio, on_stage, options)
+        except Exception as e:
+            self._recorder.event("pipeline", key=key, ms=_elapsed_ms(start), error=str(e))
+            raise
+        self._recorder.event("pipeline", key=key, ms=_elapsed_ms(start), result=asdict(result))
+        return result
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+class SessionRecorder:
+    """セッションのイベントを JSONL に書き出す（event はスレッドセーフで待たない）"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._t0 = time.perf_counter()
+        self._streams = 0
+        self._stream_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+        snap = config.snapshot
+        self.event(
+            "session",
+            version=FORMAT_VERSION,
+            sample_rate=snap.sample_rate,
+            min_duration=snap.min_duration,
+            record_max_memory_bytes=snap.record_max_memory_bytes,
+            record_max_seconds=snap.record_max_seconds,
+            vad_threshold=snap.vad_threshold,
+            vad_silence_ms=snap.vad_silence_ms,
+        )
+        logger.info(f"[セッション記録] {path}")
+
+    def event(self, kind: str, **fields: Any) -> None:
+        """イベントを記録する（書き込みは専用スレッド）"""
+        fields["type"] = kind
+        fields["t"] = time.perf_counter() - self._t0
+        self._queue.put(fields)
+
+    def record_result(self, result: PipelineResult, audio: npt.NDArray[np.float32]) -> None:
+        """1発話の最終結果（入力したテキストと段ごとの処理時間）を記録する"""
+        self.event("result", key=audio_key(audio), **asdict(result))
+
+    def wrap_stream_factory(self, factory: StreamFactory) -> StreamFactory:
+        """作成するストリームのコールバックに届く録音ブロックを記録するようにする"""
+
+        def create(**kwargs: Any) -> Any:
+            with self._stream_lock:
+                stream_id = self._streams
+                self._streams += 1
+            callback = kwargs["callback"]
+            channels = kwargs.get("channels", 1)
+            self.event(
+                "stream",
+                id=stream_id,
+                samplerate=kwargs.get("samplerate"),
+                channels=channels,
+                blocksize=kwargs.get("blocksize", 0),
+            )
+
+            def recording_callback(indata: Any, frames: int, time_info: Any, status: Any) -> None:
+                # PortAudio はバッファを再利用するのでコピーしてから積む
+                self.event("audio", stream=stream_id, block=indata.copy(), status=str(status))
+                callback(indata, frames, time_info, status)
+
+            kwargs["callback"] = recording_callback
+            return factory(**kwargs)
+
+        return create
+
+    def wrap_pipeline(self, pipeline: Any) -> Any:
+        """STT / Gemini の応答を記録するようにする（段ごとの上流がなければ結果全体を記録）"""
+        if hasattr(pipeline, "transcriber") and hasattr(pipeline, "gemini"):
+            pipeline.transcriber = _RecordingTranscriber(pipeline.transcriber, self)
+            pipeline.gemini = _RecordingCorrector(pipeline.gemini, self)
+            return pipeline
+        return _RecordingPipeline(pipeline, self)
+
+    def close(self) -> None:
+        """未書き込みのイベントを書き出してファイルを閉じる"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._file.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            block = item.pop("block", None)
+            if block is not None:
+                item["channels"] = block.shape[1] if block.ndim > 1 else 1
+                item["data"] = encode_block(block)
+            self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+            if self._queue.empty():
+                self._file.flush()
+
+
+def recorder_from_env() -> Optional[SessionRecorder]:
+    """環境変数 STT_RECORD_SESSION が設定されていれば記録を開始する"""
+    path = os.getenv(RECORD_PATH_ENV, "")
+    if not path:
+        return None
+    return SessionRecorder(Path(path).expanduser())
+
+
+def load_session(path: Path) -> Dict[str, Any]:
+    """記録ファイルを読み、ヘッダ・イベント・録音ブロック・上流の応答に分けて返す"""
+    header: Dict[str, Any] = {}
+    events = []
+    streams: Dict[int, list] = {}
+    upstream: Dict[str, Dict[str, Dict[str, Any]]] = {"stt": {}, "gemini": {}, "pipeline": {}}
+    results = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            kind = item["type"]
+            if kind == "session":
+                header = item
+            elif kind == "audio":
+                block = decode_block(item["data"], item["channels"])
+                streams.setdefault(item["stream"], []).append((item["t"], block, item["status"]))
+            elif kind in upstream:
+                upstream[kind][item["key"]] = item
+            elif kind == "result":
+                results.append(item)
+            else:
+                events.append(item)
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"未対応の記録ファイルです: {path}")
+    return {
+        "header": header,
+        "events": events,
+        "streams": streams,
+        "upstream": upstream,
+        "results": results,
+    }
@@ -0,0 +1,375 @@
+"""
+記録したディクテーションセッションの再生
+
+app/session_recorder.py が書き出したファイルから、ホットキーの押下・解放と録音ブロックを
+記録どおりの時刻（--speed で加速）に VoiceInputEngine へ流す。マイク・キーボード・
+ネットワークは使わず、STT / Gemini は記録した応答を記録した処理時間だけ待ってから返す。
+最後に、入力されたテキストと段ごとの処理時間を記録と照合する。
+
+    python main.py replay session.jsonl --speed 4
+"""
+
+import argparse
+import contextlib
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from app.config import HotkeyProfile, config
+from app.pipeline import (
+    DEFAULT_OPTIONS,
+    PipelineOptions,
+    PipelineResult,
+    TranscriptionPipeline,
+)
+from app.session_recorder import audio_key, load_session
+
+# 最後のイベントのあと、残りの発話の処理を待つ上限（秒）
+_DRAIN_TIMEOUT = 30.0
+
+# 記録時の設定のうち、再生でも同じ値を使うもの
+_REPLAYED_SETTINGS = (
+    "sample_rate",
+    "min_duration",
+    "record_max_memory_bytes",
+    "record_max_seconds",
+    "vad_threshold",
+    "vad_silence_ms",
+)
+
+
+class _ReplayClock:
+    """記録時刻を再生時刻に変換する（speed 倍速）"""
+
+    def __init__(self, speed: float) -> None:
+        self.speed = speed
+        self.start = time.perf_counter()
+
+    def at(self, t: float) -> float:
+        return self.start + t / self.speed
+
+    def sleep_until(self, t: float) -> None:
+        delay = self.at(t) - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def sleep_ms(self, ms: float) -> None:
+        time.sleep(ms / 1000 / self.speed)
+
+
+class _ReplayStream:
+    """記録した録音ブロックを記録時刻どおりにコールバックへ渡す入力ストリーム"""
+
+    def __init__(
+        self,
+        blocks: List[Tuple[float, npt.NDArray[np.float32], str]],
+        callback: Callable[..., None],
+        clock: _ReplayClock,
+    ) -> None:
+        self._blocks = blocks
+        self._callback = callback
+        self._clock = clock
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        for t, block, status in self._blocks:
+            if not self._stopping.is_set():
+                self._stopping.wait(max(0.0, self._clock.at(t) - time.perf_counter()))
+            self._callback(block, len(block), None, status)
+
+    def stop(self) -> None:
+        # 実際のストリームと同じく、停止前に届いていたブロックはすべて渡してから戻る
+        self._stopping.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self) -> None:
+        pass
+
+
+class _ReplayTranscriber:
+    """記録した STT の応答を、記録した処理時間だけ待って返す"""
+
+    def __init__(self, responses: Dict[str, Dict[str, Any]], clock: _ReplayClock) -> None:
+        self._responses = responses
+        self._clock = clock
+
+    def transcribe(self, audio: npt.NDArray[np.float32], **_kwargs: Any) -> str:
+        item = self._responses.get(audio_key(audio))
+        if item is None:
+            raise RuntimeError("記録にない音声です（録音ブロックが記録と一致しません）")
+        self._clock.sleep_ms(item["ms"])
+        if "error" in item:
+            raise RuntimeError(item["error"])
+        return item["text"]
+
+
+class _ReplayCorrector:
+    """
+    記録した Gemini の応答を、記録した処理時間だけ待って返す。
+    記録中に一度も呼ばれていなければ無効として扱い、記録にない入力はそのまま返す
+    （記録中に補正を切り替えた場合）。
+    """
+
+    def __init__(self, responses: Dict[str, Dict[str, Any]], clock: _ReplayClock) -> None:
+        self._responses = responses
+        self._clock = clock
+        self.enabled = bool(responses)
+        # 直前の応答が完全だったか（記録の "ok"。記録にない入力は False）
+        self.last_ok = False
+
+    def correct(self, text: str) -> str:
+        item = self._responses.get(text)
+        self.last_ok = False
+        if item is None:
+            return text
+        self._clock.sleep_ms(item["ms"])
+        if "error" in item:
+            raise RuntimeError(item["error"])
+        self.last_ok = item.get("ok", True)
+        return item["text"]
+
+
+class _ReplayLearner:
+    """記録中に学習済みの直し方で Gemini を省略した発話だけ、記録した補正結果を返す"""
+
+    def __init__(self, results: List[Dict[str, Any]]) -> None:
+        self._learned = {
+            item["raw_text"]: item["corrected_text"]
+            for item in results
+            if "gemini:learned" in item.get("skipped", "").split(",")
+        }
+
+    def correct(self, raw: str) -> Optional[str]:
+        return self._learned.get(raw)
+
+    def submit(self, raw: str, corrected: str) -> None:
+        pass
+
+
+class _ReplayPipeline:
+    """結果全体を記録したパイプライン（サービスモード）の応答を返す"""
+
+    def __init__(self, responses: Dict[str, Dict[str, Any]], clock: _ReplayClock) -> None:
+        self._responses = responses
+        self._clock = clock
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[Any] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        item = self._responses.get(audio_key(audio))
+        if item is None:
+            raise RuntimeError("記録にない音声です（録音ブロックが記録と一致しません）")
+        self._clock.sleep_ms(item["ms"])
+        if "error" in item:
+            raise RuntimeError(item["error"])
+        result = PipelineResult(**item["result"])
+        for stage in ("stt_ms", "gemini_ms", "replace_ms"):
+            setattr(result, stage, getattr(result, stage) / self._clock.speed)
+        return result
+
+
+class _CollectingPipeline:
+    """再生中の発話ごとの結果を集める（type_ms はエンジンが入力後に書き込む）"""
+
+    def __init__(self, inner: Any) -> None:
+        self._inner = inner
+        self.results: Dict[str, PipelineResult] = {}
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[Any] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        result = self._inner.process(audio, on_stage, options)
+        self.results[audio_key(audio)] = result
+        return result
+
+
+@dataclass
+class ReplayReport:
+    """再生結果（記録との照合に使う）"""
+
+    speed: float
+    expected_typed: List[str] = field(default_factory=list)
+    typed: List[str] = field(default_factory=list)
+    # 音声キー → 記録した結果
+    expected: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # 音声キー → 再生した結果
+    replayed: Dict[str, PipelineResult] = field(default_factory=dict)
+
+    def failures(self, tolerance_ms: float = 50.0, local_ratio: float = 2.0) -> List[str]:
+        """
+        記録と一致しない点を返す（空なら一致）。
+        上流（STT / Gemini）の処理時間は記録 / speed との差が tolerance_ms 以内か、
+        ワード変換（ローカル処理）は記録の local_ratio 倍 + tolerance_ms を超えていないかを見る。
+        """
+        problems = []
+        if self.typed != self.expected_typed:
+            problems.append(
+                f"入力テキストが一致しません: 記録 {self.expected_typed!r} / 再生 {self.typed!r}"
+            )
+        for key, recorded in self.expected.items():
+            result = self.replayed.get(key)
+            if result is None:
+                problems.append(f"発話 {key[:8]} が再生されませんでした")
+                continue
+            for stage in ("stt_ms", "gemini_ms"):
+                want = recorded[stage] / self.speed
+                got = getattr(result, stage)
+                if abs(got - want) > tolerance_ms:
+                    problems.append(
+                        f"発話 {key[:8]} の {stage} が記録と異なります: "
+                        f"{got:.0f}ms（期待 {want:.0f}ms）"
+                    )
+            limit = recorded["replace_ms"] * local_ratio + tolerance_ms
+            if result.replace_ms > limit:
+                problems.append(
+                    f"発話 {key[:8]} のワード変換が遅くなっています: "
+                    f"{result.replace_ms:.1f}ms（記録 {recorded['replace_ms']:.1f}ms）"
+                )
+        extra = set(self.replayed) - set(self.expected)
+        if extra:
+            problems.append(f"記録にない発話が {len(extra)} 件あります")
+        return problems
+
+
+@contextlib.contextmanager
+def _replay_config(header: Dict[str, Any]) -> Iterator[None]:
+    """再生中だけ記録時の設定を使い、効果音・履歴・プロファイルを止める"""
+    saved = config.snapshot
+    update = {name: header[name] for name in _REPLAYED_SETTINGS if name in header}
+    # SLO による省略は再生速度で変わるため、再生中は常に全段を通す。
+    # 学習済みの直し方による省略は _ReplayLearner が記録どおりに再現する
+    update.update(
+        sound_enabled=False,
+        history_enabled=False,
+        profile_enabled=False,
+        slo_target_ms=0.0,
+        learn_corrections=True,
+    )
+    config._snapshot = saved.model_copy(update=update)
+    try:
+        yield
+    finally:
+        config._snapshot = saved
+
+
+def replay(path: Path, speed: float = 1.0) -> ReplayReport:
+    """記録ファイルを再生し、照合用のレポートを返す"""
+    from app.engine import VoiceInputEngine
+
+    session = load_session(path)
+    header = session["header"]
+    upstream = session["upstream"]
+    report = ReplayReport(speed=speed)
+    for item in session["results"]:
+        report.expected[item["key"]] = item
+        if item["replaced_text"]:
+            report.expected_typed.append(item["replaced_text"])
+    type_ms = {item["replaced_text"]: item["type_ms"] for item in session["results"]}
+
+    clock = _ReplayClock(speed)
+    if upstream["pipeline"]:
+        inner: Any = _ReplayPipeline(upstream["pipeline"], clock)
+    else:
+        inner = TranscriptionPipeline(
+            _ReplayTranscriber(upstream["stt"], clock),
+            _ReplayCorrector(upstream["gemini"], clock),
+            learner=_ReplayLearner(session["results"]),
+        )
+    pipeline = _CollectingPipeline(inner)
+
+    streams: List[_ReplayStream] = []
+
+    def stream_factory(**kwargs: Any) -> _ReplayStream:
+        stream = _ReplayStream(session["streams"].get(len(streams), []), kwargs["callback"], clock)
+        streams.append(stream)
+        return stream
+
+    def typer(text: str) -> None:
+        report.typed.append(text)
+        clock.sleep_ms(type_ms.get(text, 0.0))
+
+    with _replay_config(header):
+        engine = VoiceInputEngine(
+            None, None, pipeline=pipeline, stream_factory=stream_factory, typer=typer
+        )
+        for event in session["events"]:
+            kind = event["type"]
+            if kind not in ("press", "release", "hands_free"):
+                continue
+            clock.sleep_until(event["t"])
+            # 記録時のホットキーの設定（Gemini補正の有無・言語・入力方法）で処理する
+            fields = event.get("hotkey_profile")
+            hotkey_profile = HotkeyProfile(**fields) if fields else None
+            if kind == "press":
+                engine.on_hotkey_press(hotkey_profile)
+            elif kind == "release":
+                engine.on_hotkey_release(hotkey_profile)
+            else:
+                engine.toggle_hands_free()
+
+        # 記録の最後まで流し、残りの発話の処理を待つ
+        times = [t for blocks in session["streams"].values() for t, _, _ in blocks]
+        times += [item["t"] for item in session["results"]]
+        clock.sleep_until(max(times, default=0.0))
+        deadline = time.perf_counter() + _DRAIN_TIMEOUT
+        while time.perf_counter() < deadline:
+            if engine.pending == 0 and len(pipeline.results) >= len(report.expected):
+                break
+            time.sleep(0.01)
+        for stream in streams:
+            stream.stop()
+        engine.close()
+
+    report.replayed = dict(pipeline.results)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインから再生し、記録と一致しなければ 1 を返す"""
+    parser = argparse.ArgumentParser(
+        prog="main.py replay", description="記録したセッションを再生して記録と照合する"
+    )
+    parser.add_argument("session", type=Path, help="STT_RECORD_SESSION で記録したファイル")
+    parser.add_argument("--speed", type=float, default=1.0, help="再生速度（2 なら2倍速）")
+    parser.add_argument(
+        "--tolerance-ms", type=float, default=50.0, help="処理時間の許容誤差（ミリ秒）"
+    )
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed は正の数を指定してください")
+
+    report = replay(args.session, args.speed)
+    print(f"{'utterance':<10} {'stt ms':>15} {'gemini ms':>15} {'replace ms':>15}  text")
+    for key, recorded in report.expected.items():
+        result = report.replayed.get(key)
+        cells = []
+        for stage in ("stt_ms", "gemini_ms", "replace_ms"):
+            got = f"{getattr(result, stage):.0f}" if result else "-"
+            cells.append(f"{recorded[stage]:.0f}→{got}")
+        text = recorded["replaced_text"]
+        print(f"{key[:8]:<10} {cells[0]:>15} {cells[1]:>15} {cells[2]:>15}  {text}")
+
+    problems = report.failures(args.tolerance_ms)
+    for problem in problems:
+        print(f"NG: {problem}", file=sys.stderr)
+    if not problems:
+        print(f"OK: {len(report.expected)} 発話が記録と一致しました")
+    return 1 if problems else 0
@@ -1,41 +1,196 @@
 """
 設定ウィンドウ管理（薄いラッパー）
+
+設定ウィンドウは別プロセスで動かす。メインプロセスとは双方向パイプでやり取りする:
+    子 → 親: ("changed", 変更種別) / ("ready", 構築秒数, RSSバイト) / ("shown",)
+    親 → 子: "show"（事前起動モードのみ）
+変更通知はこのプロセスに反映したうえで、add_change_listener() で登録した先
+（パイプラインのワーカープロセスなど）にも渡す。
 """
 
+import logging
 import multiprocessing
+import resource
 import sys
-from typing import Optional
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("voice_input")
+
+# 設定プロセス → エンジンプロセスへ送る変更通知
+CHANGE_CONFIG = "config"
+CHANGE_REPLACEMENT = "replacement"
+
+# 事前起動した設定プロセスへのコマンド
+_CMD_SHOW = "show"
 
-from PyQt6.QtWidgets import QApplication
 
+def _rss_bytes() -> int:
+    """このプロセスの最大常駐メモリ（バイト）"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux は KB 単位
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _build_dialog(conn: Connection) -> Any:
+    """QApplication と SettingsDialog を構築し、構築時間とメモリを親へ報告する"""
+    start = time.perf_counter()
+    # PyQt6 は子プロセスでのみ読み込む（メニューバー側の起動を軽くする）
+    from PyQt6.QtWidgets import QApplication
 
-def _run_settings_window() -> None:
-    """PyQt6ウィンドウを実行（別プロセス用）"""
     from ui.settings_window import SettingsDialog
 
     app = QApplication(sys.argv)
-    dialog = SettingsDialog()
+    dialog = SettingsDialog(notify=lambda change: conn.send(("changed", change)))
+    conn.send(("ready", time.perf_counter() - start, _rss_bytes()))
+    return app, dialog
+
+
+def _run_settings_window(conn: Connection) -> None:
+    """PyQt6ウィンドウを実行（別プロセス用・開くたびに起動）"""
+    app, dialog = _build_dialog(conn)
+    conn.send(("shown",))
     dialog.exec()
     sys.exit()
 
 
+def _run_settings_helper(conn: Connection) -> None:
+    """
+    PyQt6ウィンドウを非表示のまま待機させる（別プロセス用・事前起動）。
+    親から "show" を受け取るたびに表示し、閉じても終了せず非表示に戻る。
+    """
+    from PyQt6.QtCore import QSocketNotifier
+
+    app, dialog = _build_dialog(conn)
+    app.setQuitOnLastWindowClosed(False)
+
+    def on_readable() -> None:
+        while conn.poll():
+            try:
+                command = conn.recv()
+            except (EOFError, OSError):
+                # 親プロセスが終了した
+                app.quit()
+                return
+            if command == _CMD_SHOW:
+                dialog.refresh()
+                dialog.show()
+                dialog.raise_()
+                dialog.activateWindow()
+                conn.send(("shown",))
+
+    notifier = QSocketNotifier(conn.fileno(), QSocketNotifier.Type.Read)
+    notifier.activated.connect(on_readable)
+    app.exec()
+    sys.exit()
+
+
+def apply_change(change: str) -> None:
+    """設定プロセスからの変更通知をこのプロセスのインメモリ状態へ反映する"""
+    if change == CHANGE_REPLACEMENT:
+        from app.word_replacement import word_replacer
+
+        word_replacer.reload()
+        logger.info("[設定] ワード変換ルールを再読み込みしました")
+    else:
+        from app.config import config
+
+        snapshot = config.reload()
+        logger.info(f"[設定] 設定を再読み込みしました（version={snapshot.version}）")
+
+
 class SettingsWindow:
     """設定ウィンドウ管理クラス"""
 
     def __init__(self) -> None:
         self._window_process: Optional[multiprocessing.Process] = None
+        self._conn: Optional[Connection] = None
         self._is_open: bool = False
+        self._prewarmed: bool = False
+        self._show_requested_at: float = 0.0
+        # 事前起動の判断材料（待機中プロセスのメモリ・構築時間・表示までの時間）
+        self.stats: Dict[str, float] = {}
+        self._change_listeners: List[Callable[[str], None]] = []
+
+    def add_change_listener(self, listener: Callable[[str], None]) -> None:
+        """変更通知を、このプロセスへの反映の後に listener(変更種別) にも渡す"""
+        self._change_listeners.append(listener)
+
+    def _start_process(self, target: Any) -> None:
+        """設定プロセスを起動し、親側の受信スレッドを開始する"""
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self._window_process = multiprocessing.Process(
+            target=target, args=(child_conn,), daemon=True
+        )
+        self._window_process.start()
+        # 子プロセス終了時に EOF を受け取れるよう、親側に残る子の端は閉じる
+        child_conn.close()
+        self._conn = parent_conn
+        threading.Thread(target=self._watch, args=(parent_conn,), daemon=True).start()
+
+    def start_helper(self) -> None:
+        """設定プロセスを事前起動して非表示で待機させる"""
+        if self._window_process and self._window_process.is_alive():
+            return
+        self._prewarmed = True
+        self._start_process(_run_settings_helper)
 
     def show(self) -> None:
         """設定ウィンドウを表示（既に開いている場合は無視）"""
-        if self._is_open and self._window_process and self._window_process.is_alive():
+        alive = self._window_process is not None and self._window_process.is_alive()
+        self._show_requested_at = time.perf_counter()
+
+        if self._prewarmed and alive and self._conn is not None:
+            try:
+                self._conn.send(_CMD_SHOW)
+                return
+            except OSError:
+                pass
+
+        if self._is_open and alive:
             print("[設定] ウィンドウは既に開いています")
             return
 
         self._is_open = True
+        self._prewarmed = False
         # 別プロセスでGUIを実行
-        self._window_process = multiprocessing.Process(target=_run_settings_window, daemon=True)
-        self._window_process.start()
+        self._start_process(_run_settings_window)
+
+    def _watch(self, conn: Connection) -> None:
+        """設定プロセスが終了するまでメッセージを受け取る（別スレッド用）"""
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    self._handle_message(message)
+                except Exception as e:
+                    logger.error(f"[設定] メッセージ処理エラー: {e}")
+
+    def _handle_message(self, message: Any) -> None:
+        """設定プロセスからのメッセージを処理する"""
+        kind = message[0]
+        if kind == "changed":
+            apply_change(message[1])
+            for listener in self._change_listeners:
+                listener(message[1])
+        elif kind == "ready":
+            _, build_seconds, rss = message
+            self.stats["build_seconds"] = build_seconds
+            self.stats["helper_rss_mb"] = rss / (1024 * 1024)
+            logger.info(
+                f"[設定] 設定プロセス準備完了: 構築 {build_seconds:.2f}s, "
+                f"メモリ {rss / (1024 * 1024):.1f} MB"
+            )
+        elif kind == "shown":
+            elapsed = time.perf_counter() - self._show_requested_at
+            mode = "事前起動" if self._prewarmed else "都度起動"
+            self.stats["time_to_window_seconds"] = elapsed
+            logger.info(f"[設定] ウィンドウ表示まで {elapsed * 1000:.0f} ms（{mode}）")
 
 
 # グローバルインスタンス
@@ -0,0 +1,137 @@
+"""
+レイテンシ目標（SLO）による省略可能な段の制御
+
+発話ごとの「ホットキーを離してから入力し終えるまで」の時間を見て、直近の p95 が
+目標（slo_target_ms）を超えたら Gemini補正のような省略できる段を飛ばし、
+目標を十分下回るまで戻らない（ヒステリシス）。処理待ちの発話が多いときも飛ばす。
+
+段を飛ばした発話は、その段を通していた場合の時間（実測 + 直近の段の処理時間）で
+数えるため、飛ばしたことで速くなった分を「回復した」と誤認しない。
+飛ばしている間も一定間隔で1発話だけ段を通し（プローブ）、段の処理時間を更新する。
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.metrics import metrics
+
+logger = logging.getLogger("voice_input")
+
+# 省略できる段
+OPTIONAL_STAGES = ("gemini",)
+
+# p95 を計算する期間（秒）と、判断に必要な最小の発話数
+_WINDOW_SECONDS = 120.0
+_MIN_SAMPLES = 5
+# 期間内に保持する発話数の上限（発話が続けて届いても記録が増え続けないように）
+_MAX_SAMPLES = 1000
+# 段を飛ばし始めてから戻すまでの最短時間（秒）
+_MIN_HOLD_SECONDS = 10.0
+# 飛ばしている間に段を通して処理時間を測り直す間隔（秒）
+_PROBE_INTERVAL_SECONDS = 30.0
+# 段の処理時間の指数移動平均の重み
+_EWMA_ALPHA = 0.3
+
+
+def percentile(values: List[float], q: float) -> float:
+    """values の q パーセンタイル（最近傍法、values は空でないこと）"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class SloController:
+    """発話ごとに省略可能な段を通すか決める（スレッドセーフ）"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (時刻, 全段を通した場合の推定処理時間 ms)
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=_MAX_SAMPLES)
+        # 段ごとの処理時間の指数移動平均（ms）
+        self._stage_ms: Dict[str, float] = {}
+        # 段を飛ばし始めた時刻（飛ばしていなければ None）
+        self._degraded_since: Dict[str, Optional[float]] = {s: None for s in OPTIONAL_STAGES}
+        self._last_probe: Dict[str, float] = {s: 0.0 for s in OPTIONAL_STAGES}
+        metrics.gauge("stt_slo_degraded", lambda: float(self.degraded))
+        metrics.gauge("stt_slo_p95_ms", self.p95_ms)
+
+    @property
+    def degraded(self) -> bool:
+        """いずれかの段を飛ばしているか"""
+        return any(since is not None for since in self._degraded_since.values())
+
+    def p95_ms(self) -> float:
+        """直近の期間の、全段を通した場合の処理時間の p95（発話がなければ 0）"""
+        with self._lock:
+            self._expire(self._clock())
+            values = [ms for _, ms in self._samples]
+        return percentile(values, 95) if values else 0.0
+
+    def allow(self, stage: str, queue_depth: int = 0) -> Optional[str]:
+        """
+        stage を通すなら None、飛ばすなら理由（"slo" / "queue"）を返す。
+        queue_depth はこの発話を含む処理待ちの発話数。
+        """
+        snap = config.snapshot
+        if snap.slo_target_ms <= 0:
+            return None
+        if snap.slo_max_queue and queue_depth > snap.slo_max_queue:
+            return "queue"
+        now = self._clock()
+        with self._lock:
+            self._update(stage, now, snap.slo_target_ms, snap.slo_recover_ratio)
+            if self._degraded_since[stage] is None:
+                return None
+            if now - self._last_probe[stage] >= _PROBE_INTERVAL_SECONDS and queue_depth <= 1:
+                self._last_probe[stage] = now
+                return None
+        return "slo"
+
+    def record(self, total_ms: float, stage_ms: Dict[str, float], skipped: Tuple[str, ...]) -> None:
+        """
+        1発話の結果を記録する。total_ms はホットキーを離してから入力し終えるまで、
+        stage_ms は実行した段の処理時間、skipped は飛ばした段。
+        """
+        now = self._clock()
+        with self._lock:
+            for stage, ms in stage_ms.items():
+                if stage in skipped:
+                    continue
+                previous = self._stage_ms.get(stage)
+                self._stage_ms[stage] = (
+                    ms if previous is None else previous + _EWMA_ALPHA * (ms - previous)
+                )
+            full_ms = total_ms + sum(self._stage_ms.get(stage, 0.0) for stage in skipped)
+            self._samples.append((now, full_ms))
+            self._expire(now)
+
+    def _expire(self, now: float) -> None:
+        while self._samples and now - self._samples[0][0] > _WINDOW_SECONDS:
+            self._samples.popleft()
+
+    def _update(self, stage: str, now: float, target_ms: float, recover_ratio: float) -> None:
+        """p95 と目標を比べて、段を飛ばすかどうかを切り替える（ロック内で呼ぶ）"""
+        self._expire(now)
+        values = [ms for _, ms in self._samples]
+        p95 = percentile(values, 95) if values else 0.0
+        since = self._degraded_since[stage]
+        if since is None:
+            if len(values) >= _MIN_SAMPLES and p95 > target_ms:
+                self._degraded_since[stage] = now
+                self._last_probe[stage] = now
+                metrics.inc("stt_slo_transitions_total", stage=stage, state="degraded")
+                logger.warning(
+                    f"[SLO] p95 {p95:.0f}ms が目標 {target_ms:.0f}ms を超えたため"
+                    f" {stage} を省略します"
+                )
+        elif now - since >= _MIN_HOLD_SECONDS and (
+            len(values) < _MIN_SAMPLES or p95 <= target_ms * recover_ratio
+        ):
+            self._degraded_since[stage] = None
+            metrics.inc("stt_slo_transitions_total", stage=stage, state="recovered")
+            logger.info(f"[SLO] p95 {p95:.0f}ms まで回復したため {stage} を再開します")
@@ -0,0 +1,189 @@
+"""
+効果音プレーヤー（録音開始・終了の合図）
+
+効果音は起動時に一度だけデコードしてメモリに保持し、常駐する低レイテンシの出力ストリームの
+コールバック（バックグラウンドのオーディオスレッド）で再生する。play() は再生要求を
+キューに積むだけなので、録音開始のクリティカルパスでプロセス起動やファイル読み込みをしない。
+"""
+
+import collections
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Deque, Dict, Iterable, Optional, Set
+
+import numpy as np
+import numpy.typing as npt
+
+from app.audio_io import read_wav, resample
+
+if TYPE_CHECKING:
+    import sounddevice as sd
+
+logger = logging.getLogger("voice_input")
+
+# 出力デバイスの既定レートが取れない場合のサンプリングレート
+_DEFAULT_RATE = 44100
+
+
+def decode_sound(path: Path, sample_rate: int) -> npt.NDArray[np.float32]:
+    """
+    効果音ファイルをモノラル float32・指定サンプリングレートに変換する。
+    WAV 以外（AIFF / CAF / MP3 など）は macOS の afconvert で一度 WAV に変換してから読む。
+    """
+    if path.suffix.lower() == ".wav":
+        frames, rate = read_wav(path)
+    else:
+        if shutil.which("afconvert") is None:
+            raise ValueError(f"{path.suffix} を変換できません（afconvert が見つかりません）")
+        with tempfile.TemporaryDirectory(prefix="stt-sound-") as tmp:
+            wav = Path(tmp) / "cue.wav"
+            subprocess.run(
+                ["afconvert", "-f", "WAVE", "-d", "LEI16", str(path), str(wav)],
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            frames, rate = read_wav(wav)
+    return resample(frames.mean(axis=1, dtype=np.float32), rate, sample_rate)
+
+
+class SoundPlayer:
+    """メモリ上の効果音を常駐出力ストリームで再生する（play はスレッドセーフ）"""
+
+    def __init__(self, sample_rate: Optional[int] = None) -> None:
+        self._sample_rate = sample_rate
+        self._cues: Dict[str, npt.NDArray[np.float32]] = {}
+        # 再生要求（deque の append / popleft はスレッドセーフ）
+        self._requests: Deque[npt.NDArray[np.float32]] = collections.deque()
+        self._current: Optional[npt.NDArray[np.float32]] = None
+        self._pos = 0
+        self._stream: Optional["sd.OutputStream"] = None
+        self._loading: Set[str] = set()
+        # 読み込めなかった効果音（再試行しない）
+        self._failed: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def sample_rate(self) -> int:
+        """出力サンプリングレート（未指定なら出力デバイスの既定値）"""
+        if self._sample_rate is None:
+            try:
+                import sounddevice as sd
+
+                self._sample_rate = int(sd.query_devices(kind="output")["default_samplerate"])
+            except Exception:
+                self._sample_rate = _DEFAULT_RATE
+        return self._sample_rate
+
+    def load(self, path: str) -> bool:
+        """効果音をデコードしてメモリに保持する（読み込めなければ False）"""
+        try:
+            cue = decode_sound(Path(path).expanduser(), self.sample_rate)
+        except Exception as e:
+            logger.warning(f"[サウンド] {path} を読み込めません: {e}")
+            self._failed.add(path)
+            return False
+        self._cues[path] = cue
+        return True
+
+    def preload(self, paths: Iterable[str]) -> None:
+        """バックグラウンドで効果音をデコードし、出力ストリームを開始する"""
+        pending = []
+        with self._lock:
+            for path in paths:
+                known = path in self._cues or path in self._loading or path in self._failed
+                if path and not known:
+                    self._loading.add(path)
+                    pending.append(path)
+
+        def run() -> None:
+            for path in pending:
+                self.load(path)
+                with self._lock:
+                    self._loading.discard(path)
+            self.start()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def start(self) -> None:
+        """出力ストリームを開始する（開始済みなら何もしない）"""
+        with self._lock:
+            if self._stream is not None:
+                return
+            try:
+                import sounddevice as sd
+
+                stream = sd.OutputStream(
+                    samplerate=self.sample_rate,
+                    channels=1,
+                    dtype="float32",
+                    latency="low",
+                    callback=self._callback,
+                )
+                stream.start()
+            except Exception as e:
+                logger.warning(f"[サウンド] 出力ストリームを開けません: {e}")
+                return
+            self._stream = stream
+
+    def close(self) -> None:
+        """出力ストリームを停止する"""
+        with self._lock:
+            if self._stream is not None:
+                self._stream.stop()
+                self._stream.close()
+                self._stream = None
+
+    def play(self, path: str) -> None:
+        """
+        効果音の再生を要求する（キューに積むだけ）。
+        まだ読み込まれていない効果音は afplay で鳴らし、以降のためにバックグラウンドで読み込む。
+        """
+        cue = self._cues.get(path)
+        if cue is not None and self._stream is not None:
+            self._requests.append(cue)
+            return
+        self._play_fallback(path)
+        if cue is None:
+            self.preload([path])
+
+    @staticmethod
+    def _play_fallback(path: str) -> None:
+        try:
+            subprocess.Popen(
+                ["afplay", str(Path(path).expanduser())],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except Exception:
+            pass
+
+    def _callback(
+        self,
+        outdata: npt.NDArray[np.float32],
+        frames: int,
+        _time_info: Any,
+        _status: Any,
+    ) -> None:
+        """出力コールバック（オーディオスレッド）。新しい要求があれば再生中の音を置き換える"""
+        while self._requests:
+            self._current = self._requests.popleft()
+            self._pos = 0
+        cue = self._current
+        if cue is None:
+            outdata.fill(0)
+            return
+        n = min(frames, len(cue) - self._pos)
+        outdata[:n, 0] = cue[self._pos : self._pos + n]
+        outdata[n:] = 0
+        self._pos += n
+        if self._pos >= len(cue):
+            self._current = None
+
+
+# グローバルインスタンス
+sound_player = SoundPlayer()
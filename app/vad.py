@@ -0,0 +1,184 @@
+"""
+ハンズフリーモード用の発話区間検出（VAD）
+
+録音コールバックから届くブロックごとに、まず平均パワーだけを計算する（安価なエネルギーゲート）。
+しきい値を下回る無音ブロックはリングバッファに残すだけで終わり、フレーム単位の解析
+（フレームごとのパワーとゼロ交差率）はゲートを通過したブロックにだけ行う。
+発話の開始・終了はヒステリシス（開始に必要な発話長・終了に必要な無音長）で判定する。
+
+確定した発話は AudioBuffer のまま on_utterance に渡す（view() と close() は受け取った側が
+コールバックの外で呼ぶ）。次の発話のバッファも prepare() でコールバックの外で確保しておく。
+"""
+
+from typing import Callable, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from app.audio_buffer import AudioBuffer
+
+# 解析フレーム長（ミリ秒）
+_FRAME_MS = 30
+# これを超えるゼロ交差率のフレームは雑音（摩擦音より高い帯域のノイズ）として扱う
+_MAX_ZERO_CROSSING_RATE = 0.5
+# ノイズフロアの追従係数と、しきい値をノイズフロアの何倍にするか（パワー比、約6dB）
+_NOISE_FLOOR_ALPHA = 0.05
+_NOISE_FLOOR_RATIO = 4.0
+
+
+class VoiceActivitySegmenter:
+    """
+    録音ブロックを受け取り、発話が終わるたびに on_utterance(バッファ) を呼ぶ
+    （feed / flush はコールバック専用。バッファの持ち主は on_utterance の呼び出し先に移る）
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        on_utterance: Callable[[AudioBuffer], None],
+        threshold: float = 0.01,
+        end_silence_ms: int = 700,
+        start_ms: int = 90,
+        pre_roll_ms: int = 300,
+        min_duration: float = 0.3,
+        max_seconds: float = 1800.0,
+        max_memory_bytes: int = 16 * 1024 * 1024,
+        energy_gate: bool = True,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self._on_utterance = on_utterance
+        self._frame = max(1, sample_rate * _FRAME_MS // 1000)
+        # パワー（二乗平均）で比較する
+        self._min_level = threshold**2
+        self._noise_floor = self._min_level / _NOISE_FLOOR_RATIO
+        self._start_samples = sample_rate * start_ms // 1000
+        self._end_samples = sample_rate * end_silence_ms // 1000
+        self._min_samples = int(sample_rate * min_duration)
+        self._max_seconds = max_seconds
+        self._max_memory_bytes = max_memory_bytes
+        # False にするとゲートを使わず常にフレーム解析する（ベンチマーク比較用）
+        self._energy_gate = energy_gate
+
+        # 発話開始前の音声（開始判定までの遅れを取り戻すためのリングバッファ）
+        self._ring = np.zeros(max(1, sample_rate * pre_roll_ms // 1000), dtype=np.float32)
+        self._ring_pos = 0
+        self._ring_filled = 0
+
+        self._buffer: Optional[AudioBuffer] = None
+        # 次の発話用にコールバックの外で確保しておくバッファ
+        self._spare: Optional[AudioBuffer] = None
+        self.prepare()
+        self._speech_run = 0
+        self._silence_run = 0
+        self.gated_blocks = 0
+        self.analyzed_blocks = 0
+
+    @property
+    def in_speech(self) -> bool:
+        """発話中か"""
+        return self._buffer is not None
+
+    @property
+    def level(self) -> float:
+        """現在の判定しきい値（パワー）"""
+        return max(self._min_level, self._noise_floor * _NOISE_FLOOR_RATIO)
+
+    def feed(self, chunk: npt.NDArray[np.float32]) -> None:
+        """録音ブロックを1つ処理する"""
+        samples = chunk[:, 0] if chunk.ndim > 1 else chunk
+        if not len(samples):
+            return
+        energy = float(np.dot(samples, samples)) / len(samples)
+        level = self.level
+
+        if self._energy_gate and energy < level:
+            self.gated_blocks += 1
+            speech = False
+        else:
+            self.analyzed_blocks += 1
+            speech = self._is_speech(samples, level)
+
+        if self._buffer is None:
+            self._remember(samples)
+            if not speech:
+                self._speech_run = 0
+                self._noise_floor += _NOISE_FLOOR_ALPHA * (energy - self._noise_floor)
+                return
+            self._speech_run += len(samples)
+            if self._speech_run >= self._start_samples:
+                self._start()
+            return
+
+        full = not self._buffer.append(samples)
+        self._silence_run = 0 if speech else self._silence_run + len(samples)
+        if full or self._silence_run >= self._end_samples:
+            self._finish()
+
+    def prepare(self) -> None:
+        """次の発話のバッファを確保しておく（コールバックの外から、発話を受け取るたびに呼ぶ）"""
+        if self._spare is None:
+            self._spare = self._new_buffer()
+
+    def _new_buffer(self) -> AudioBuffer:
+        return AudioBuffer(self.sample_rate, self._max_memory_bytes, self._max_seconds)
+
+    def flush(self) -> None:
+        """発話中なら、そこまでを1発話として確定する（モード終了時）"""
+        if self._buffer is not None:
+            self._finish()
+
+    def _is_speech(self, samples: npt.NDArray[np.float32], level: float) -> bool:
+        """フレームごとのパワーとゼロ交差率で、ブロックの過半数が発話かを判定する"""
+        count = len(samples) // self._frame
+        if count:
+            frames = samples[: count * self._frame].reshape(count, self._frame)
+        else:
+            frames = samples.reshape(1, -1)
+        energy = np.einsum("ij,ij->i", frames, frames) / frames.shape[1]
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frames.shape[1]
+        voiced = np.count_nonzero((energy >= level) & (zcr < _MAX_ZERO_CROSSING_RATE))
+        return voiced * 2 >= len(frames)
+
+    def _remember(self, samples: npt.NDArray[np.float32]) -> None:
+        """直近 pre_roll_ms ぶんをリングバッファに書き込む（確保済み配列へのコピーのみ）"""
+        size = len(self._ring)
+        n = len(samples)
+        if n >= size:
+            self._ring[:] = samples[-size:]
+            self._ring_pos = 0
+            self._ring_filled = size
+            return
+        end = self._ring_pos + n
+        if end <= size:
+            self._ring[self._ring_pos : end] = samples
+        else:
+            split = size - self._ring_pos
+            self._ring[self._ring_pos :] = samples[:split]
+            self._ring[: n - split] = samples[split:]
+        self._ring_pos = end % size
+        self._ring_filled = min(size, self._ring_filled + n)
+
+    def _start(self) -> None:
+        """発話を開始し、リングバッファの内容を先頭に入れる"""
+        buffer, self._spare = self._spare, None
+        # prepare() が間に合わなかったときだけコールバックの中で確保する
+        self._buffer = buffer if buffer is not None else self._new_buffer()
+        if self._ring_filled < len(self._ring):
+            self._buffer.append(self._ring[: self._ring_filled])
+        else:
+            self._buffer.append(self._ring[self._ring_pos :])
+            self._buffer.append(self._ring[: self._ring_pos])
+        self._ring_pos = self._ring_filled = 0
+        self._silence_run = 0
+
+    def _finish(self) -> None:
+        """発話を確定し、短すぎなければ on_utterance に渡す（短すぎれば閉じる。どちらも待たない）"""
+        buffer, self._buffer = self._buffer, None
+        self._speech_run = 0
+        assert buffer is not None
+        if len(buffer) - self._silence_run >= self._min_samples:
+            self._on_utterance(buffer)
+        else:
+            buffer.close()
+        self._silence_run = 0
@@ -1,11 +1,15 @@
 """
 ワードリプレイスメント（音声認識後のテキスト変換）
 """
-import csv
+import os
 import sys
 import threading
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, List, Optional, Tuple
+
+from app.compiled_dictionary import CompiledDictionary, format_csv, hash_file
+from app.metrics import metrics
+from app.rule_editor import RuleChanges
 
 
 def _get_csv_path() -> Path:
@@ -15,11 +19,69 @@ def _get_csv_path() -> Path:
     return Path(__file__).parent.parent / "__generated__" / "word_replacement.csv"
 
 
+def _get_compiled_path() -> Path:
+    """コンパイル済み辞書のパス（CSV と同じユーザーデータディレクトリ）"""
+    return _get_csv_path().with_suffix(".bin")
+
+
+class IncrementalReplacer:
+    """
+    チャンクごとに届くテキスト（ストリーミングの STT・Gemini の出力）にワード変換を適用する。
+
+    feed() は入力してよい変換済みテキストを返し、後続のチャンク次第でルールの入力に
+    一致しうる末尾だけを保留する。feed() の戻り値をすべて連結して flush() を足すと、
+    全文に apply() した結果と一致する。
+    """
+
+    def __init__(self, dictionary: CompiledDictionary) -> None:
+        self._dictionary = dictionary
+        self._pending = ""
+
+    @property
+    def pending(self) -> str:
+        """保留中の（まだ変換していない）テキスト"""
+        return self._pending
+
+    def feed(self, chunk: str) -> str:
+        """チャンクを追加し、確定した部分の変換結果を返す（なければ空文字）"""
+        text = self._pending + chunk
+        # できるだけ長い先頭部分を確定させる（保留する末尾を最短にする）
+        for split in range(len(text), 0, -1):
+            head = text[:split]
+            if self._open_ended(head):
+                continue
+            trace: List[str] = []
+            replaced = self._dictionary.apply(head, trace)
+            # 変換の途中のどの段階でも、末尾がルールの入力の途中までになっていなければ、
+            # 後続のテキストと境界をまたいで一致するルールはない
+            if not any(self._open_ended(stage) for stage in trace):
+                self._pending = text[split:]
+                return replaced
+        self._pending = text
+        return ""
+
+    def flush(self) -> str:
+        """保留中のテキストを変換して返す（ストリームの終わり）"""
+        text, self._pending = self._pending, ""
+        return self._dictionary.apply(text)
+
+    def _open_ended(self, text: str) -> bool:
+        """text の末尾が、いずれかのルールの入力の途中までと一致するか"""
+        max_bytes = self._dictionary.max_key_bytes
+        for n in range(1, min(len(text), max_bytes) + 1):
+            suffix = text[-n:]
+            if len(suffix.encode("utf-8")) >= max_bytes:
+                break
+            if self._dictionary.has_longer_key_with_prefix(suffix):
+                return True
+        return False
+
+
 class WordReplacementManager:
     """音声認識結果に対してワード変換ルールを適用するマネージャー"""
 
     def __init__(self) -> None:
-        self._rules: List[Tuple[str, str]] = []
+        self._dictionary = CompiledDictionary.from_rules([])
         self._lock = threading.Lock()
         csv_path = _get_csv_path()
         if csv_path.exists():
@@ -28,50 +90,178 @@ class WordReplacementManager:
             self.save_csv()
 
     def _load_csv(self) -> None:
-        """CSVファイルからルールを読み込む（input,output 形式）"""
-        rules: List[Tuple[str, str]] = []
+        """
+        コンパイル済み辞書を mmap で読み込む。
+        CSV のハッシュが変わっている場合だけ再コンパイルする。
+        """
+        csv_path = _get_csv_path()
+        compiled_path = _get_compiled_path()
         try:
-            with open(_get_csv_path(), "r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    input_word = row.get("input", "").strip()
-                    output_word = row.get("output", "").strip()
-                    if input_word and output_word is not None:
-                        rules.append((input_word, output_word))
+            stat = csv_path.stat()
+            with self._lock:
+                if self._dictionary.is_fresh_for(stat):
+                    return
+            dictionary = self._open_compiled(compiled_path)
+            if dictionary is None or not dictionary.is_fresh_for(stat):
+                if dictionary is not None and dictionary.source_hash == hash_file(csv_path):
+                    # 更新時刻だけ変わった（同じ内容で保存し直された）
+                    CompiledDictionary.restamp(compiled_path, stat)
+                    # 開いた時点のヘッダの値も合わせる（次の reload() で開き直さない）
+                    dictionary.source_size = stat.st_size
+                    dictionary.source_mtime_ns = stat.st_mtime_ns
+                else:
+                    if dictionary is not None:
+                        dictionary.close()
+                    CompiledDictionary.compile(csv_path.read_bytes(), stat, compiled_path)
+                    dictionary = CompiledDictionary.open(compiled_path)
         except Exception:
-            pass
+            return
+        self._replace(dictionary)
+
+    def _replace(
+        self, dictionary: CompiledDictionary, expected: Optional[CompiledDictionary] = None
+    ) -> bool:
+        """
+        辞書を差し替える（expected を渡すと、それが現在の辞書のときだけ差し替える）。
+        古い辞書は変換中・編集中の他のスレッドがまだ参照しているかもしれないので閉じず、
+        参照がなくなったときに mmap を解放させる。
+        """
         with self._lock:
-            self._rules = rules
+            if expected is not None and self._dictionary is not expected:
+                return False
+            self._dictionary = dictionary
+        return True
+
+    def reload(self) -> None:
+        """他プロセスが保存した CSV / コンパイル済み辞書を読み直す"""
+        self._load_csv()
+
+    @staticmethod
+    def _open_compiled(path: Path) -> Optional[CompiledDictionary]:
+        """既存のコンパイル済み辞書を開く（なければ・形式違いなら None）"""
+        if not path.exists():
+            return None
+        try:
+            return CompiledDictionary.open(path)
+        except (ValueError, OSError):
+            return None
 
     def apply(self, text: str) -> str:
         """ルール一覧を順番に適用してテキストを変換する"""
         with self._lock:
-            rules = list(self._rules)
-        for input_word, output_word in rules:
-            text = text.replace(input_word, output_word)
-        return text
+            dictionary = self._dictionary
+        replaced = dictionary.apply(text)
+        metrics.inc("stt_replacement_calls_total")
+        if replaced != text:
+            metrics.inc("stt_replacement_hits_total")
+        return replaced
+
+    def incremental(self) -> IncrementalReplacer:
+        """現在のルールでチャンクごとに変換するオブジェクトを作る（途中でルールが変わっても固定）"""
+        with self._lock:
+            dictionary = self._dictionary
+        return IncrementalReplacer(dictionary)
+
+    @property
+    def dictionary(self) -> CompiledDictionary:
+        """現在のコンパイル済み辞書（編集画面の元データ）"""
+        with self._lock:
+            return self._dictionary
 
     def get_rules(self) -> List[Tuple[str, str]]:
         """ルール一覧を取得する"""
         with self._lock:
-            return list(self._rules)
+            dictionary = self._dictionary
+        return list(dictionary)
 
     def set_rules(self, rules: List[Tuple[str, str]]) -> None:
         """ルールをメモリに設定する"""
-        with self._lock:
-            self._rules = [(inp, out) for inp, out in rules if inp]
+        self._replace(CompiledDictionary.from_rules([(inp, out) for inp, out in rules if inp]))
 
     def save_csv(self) -> None:
-        """config/word_replacement.csv にルールを保存する"""
+        """word_replacement.csv にルールを保存し、コンパイル済み辞書も更新する"""
+        with self._lock:
+            dictionary = self._dictionary
+        self._write(list(dictionary), dictionary)
+
+    def apply_changes(self, base: CompiledDictionary, changes: RuleChanges) -> None:
+        """
+        base に対する変更（編集・削除・追加した行だけ）を反映して保存する。
+        base を読み込んだ後に辞書が入れ替わっていたり、他プロセスが CSV を保存していたら
+        ValueError（読み込み直して編集し直してもらう）。
+        """
+        with self._lock:
+            if self._dictionary is not base:
+                raise ValueError("ルールが他で更新されています。読み込み直してください")
+        if self._changed_on_disk(base):
+            raise ValueError("ルールが他で更新されています。読み込み直してください")
+        if not changes:
+            return
+        rules: List[Tuple[str, str]] = []
+        for i in range(len(base)):
+            if i in changes.deletions:
+                continue
+            rule = changes.updates.get(i)
+            rules.append(base.rule(i) if rule is None else rule)
+        rules.extend(changes.additions)
+        rules = [(inp.strip(), out.strip()) for inp, out in rules]
+        rules = [(inp, out) for inp, out in rules if inp]
+        self._write(rules, base, parsed=True)
+
+    @staticmethod
+    def _changed_on_disk(base: CompiledDictionary) -> bool:
+        """CSV が base のコンパイル後に（内容の違うものに）書き換えられているか"""
+        if base.source_hash == bytes(32):
+            # メモリ上だけの辞書（CSV から作っていない）
+            return False
+        csv_path = _get_csv_path()
+        try:
+            stat = csv_path.stat()
+        except OSError:
+            return False
+        return not base.is_fresh_for(stat) and base.source_hash != hash_file(csv_path)
+
+    def _write(
+        self, rules: List[Tuple[str, str]], dictionary: CompiledDictionary, parsed: bool = False
+    ) -> None:
+        """
+        ルールを CSV に書き出してコンパイル済み辞書を更新する（書き出し中に辞書が
+        入れ替わっていなければ差し替える）。parsed なら CSV をパースし直さずにコンパイルする。
+        """
         csv_path = _get_csv_path()
         csv_path.parent.mkdir(parents=True, exist_ok=True)
-        with self._lock:
-            rules = list(self._rules)
-        with open(csv_path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["input", "output"])
-            for input_word, output_word in rules:
-                writer.writerow([input_word, output_word])
+        data = format_csv(rules)
+        tmp_path = csv_path.with_name(f"{csv_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, csv_path)
+
+        compiled_path = _get_compiled_path()
+        CompiledDictionary.compile(
+            data, csv_path.stat(), compiled_path, rules if parsed else None
+        )
+        compiled = CompiledDictionary.open(compiled_path)
+        if not self._replace(compiled, expected=dictionary):
+            compiled.close()
+
+
+_word_replacer: Optional[WordReplacementManager] = None
+_word_replacer_lock = threading.Lock()
+
+
+def get_word_replacer() -> WordReplacementManager:
+    """グローバルインスタンスを取得（初回アクセス時に辞書を読み込む）"""
+    global _word_replacer
+    if _word_replacer is None:
+        with _word_replacer_lock:
+            if _word_replacer is None:
+                _word_replacer = WordReplacementManager()
+                globals()["word_replacer"] = _word_replacer
+    return _word_replacer
 
 
-word_replacer = WordReplacementManager()
+def __getattr__(name: str) -> Any:
+    """グローバルインスタンス `word_replacer` を初回アクセスまで遅延生成する"""
+    if name == "word_replacer":
+        return get_word_replacer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
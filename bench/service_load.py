@@ -0,0 +1,135 @@
+"""
+サービスモードの負荷試験
+
+STT / Gemini の代わりに一定時間待つだけのスタンドインを使い、1インスタンスのサービスが
+何リクエスト/秒を捌けるかを測る。クライアントは keep-alive で送り続ける。
+
+    python bench/service_load.py --clients 32 --concurrency 8 --duration 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.compiled_dictionary import CompiledDictionary  # noqa: E402
+from app.pipeline import TranscriptionPipeline  # noqa: E402
+from app.service import PipelineService  # noqa: E402
+
+
+class StandInTranscriber:
+    """Google Speech の代わり（待つだけ）"""
+
+    def __init__(self, delay_ms: float) -> None:
+        self.delay = delay_ms / 1000
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        time.sleep(self.delay)
+        return "きょうはいいてんきですね"
+
+
+class StandInGemini:
+    """Gemini の代わり（待つだけ）"""
+
+    enabled = True
+    last_ok = True
+
+    def __init__(self, delay_ms: float) -> None:
+        self.delay = delay_ms / 1000
+
+    def correct(self, text: str) -> str:
+        time.sleep(self.delay)
+        return "今日はいい天気ですね"
+
+
+class StandInReplacer:
+    def __init__(self) -> None:
+        self._dictionary = CompiledDictionary.from_rules([("天気", "てんき")])
+
+    def apply(self, text: str) -> str:
+        return self._dictionary.apply(text)
+
+
+async def _client(port: int, body: bytes, deadline: float, latencies: List[float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = (
+        f"POST /transcribe?rate=16000 HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("latin-1") + body
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        writer.close()
+
+
+async def run(args: argparse.Namespace) -> None:
+    pipeline = TranscriptionPipeline(
+        StandInTranscriber(args.stt_ms), StandInGemini(args.gemini_ms), StandInReplacer()
+    )
+    service = PipelineService(pipeline, max_concurrency=args.concurrency)
+    await service.start()
+
+    # 3秒ぶんの 16kHz 音声
+    body = np.zeros(16000 * 3, dtype="<i2").tobytes()
+    latencies: List[float] = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(
+        *(_client(service.port, body, deadline, latencies) for _ in range(args.clients))
+    )
+    elapsed = time.perf_counter() - start
+    await service.close()
+
+    latencies.sort()
+    print(
+        f"clients={args.clients} concurrency={args.concurrency} "
+        f"upstream={args.stt_ms:.0f}+{args.gemini_ms:.0f}ms"
+    )
+    print(f"requests: {len(latencies)} in {elapsed:.1f}s")
+    throughput = f"throughput: {len(latencies) / elapsed:.1f} req/s"
+    upstream_s = (args.stt_ms + args.gemini_ms) / 1000
+    if upstream_s > 0:
+        # 上流の待ち時間だけで決まる理論上限
+        throughput += f" (upstream bound: {args.concurrency / upstream_s:.1f} req/s)"
+    print(throughput)
+    if latencies:
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"latency: p50={statistics.median(latencies):.0f}ms p95={p95:.0f}ms "
+            f"max={latencies[-1]:.0f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32, help="同時接続するクライアント数")
+    parser.add_argument("--concurrency", type=int, default=8, help="上流の同時呼び出し数")
+    parser.add_argument("--duration", type=float, default=10.0, help="計測時間（秒）")
+    parser.add_argument("--stt-ms", type=float, default=300.0, help="STT スタンドインの待ち時間")
+    parser.add_argument(
+        "--gemini-ms", type=float, default=200.0, help="Gemini スタンドインの待ち時間"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+長時間稼働のリーク検出（ソーク試験）
+
+VoiceInputEngine に、マイク入力・STT・Gemini・キー入力のスタンドインで発話を流し続け
+（ホットキーを押して離すところから入力までを1発話とする）、一定の発話数ごとに
+RSS・スレッド数・開いているファイル記述子の数・tracemalloc の確保量を記録する。
+ウォームアップ後の増加の傾き（1,000発話あたり）が閾値を超えたら終了コード 1 で終わり、
+増えた確保元の上位を表示する。
+
+    python bench/soak.py --utterances 10000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.compiled_dictionary import CompiledDictionary  # noqa: E402
+from app.config import config  # noqa: E402
+from app.engine import VoiceInputEngine  # noqa: E402
+from app.pipeline import TranscriptionPipeline  # noqa: E402
+
+RATE = 16000
+BLOCK = RATE // 10
+
+_PHRASES = [
+    "きょうはいいてんきですね",
+    "ぱいそんでじぇそんをぱーすする",
+    "どっかーこんてなをきどうする",
+    "",  # 何も聞き取れなかった発話（入力しない）
+    "じっと こみっと でへんこうをほぞんする",
+]
+
+
+class StandInStream:
+    """録音ブロックを start() の中でまとめて届ける入力ストリーム（開いた数・閉じた数を数える）"""
+
+    opened = 0
+    closed = 0
+
+    def __init__(self, audio: npt.NDArray[np.float32], callback: Callable[..., None]) -> None:
+        self._audio = audio
+        self._callback = callback
+        StandInStream.opened += 1
+
+    def start(self) -> None:
+        for start in range(0, len(self._audio), BLOCK):
+            block = self._audio[start : start + BLOCK].reshape(-1, 1)
+            self._callback(block, len(block), None, "")
+
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        StandInStream.closed += 1
+
+
+class StandInTranscriber:
+    """Google Speech の代わり（音声の長さで決まる文を返す）"""
+
+    def transcribe(self, audio: npt.NDArray[np.float32], language: str = "") -> str:
+        return _PHRASES[len(audio) // BLOCK % len(_PHRASES)]
+
+
+class StandInGemini:
+    """Gemini の代わり"""
+
+    enabled = True
+    last_ok = True
+
+    def correct(self, text: str) -> str:
+        return text.replace("ぱいそん", "Python").replace("じぇそん", "JSON") + "。"
+
+
+class StandInReplacer:
+    def __init__(self) -> None:
+        self._dictionary = CompiledDictionary.from_rules([("どっかー", "Docker")])
+
+    def apply(self, text: str) -> str:
+        return self._dictionary.apply(text)
+
+
+@dataclass
+class Sample:
+    utterances: int
+    rss_bytes: int
+    threads: int
+    fds: int
+    traced_bytes: int
+
+
+def _rss_bytes() -> int:
+    """現在の RSS（Linux は /proc、macOS は ps で取得）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        out = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(os.getpid())], capture_output=True, text=True
+        )
+        return int(out.stdout.strip() or 0) * 1024
+
+
+def _open_fds() -> int:
+    """開いているファイル記述子の数（数えるために開く1つを除く）"""
+    return len(os.listdir("/dev/fd")) - 1
+
+
+def _measure(utterances: int) -> Sample:
+    gc.collect()
+    return Sample(
+        utterances=utterances,
+        rss_bytes=_rss_bytes(),
+        threads=threading.active_count(),
+        fds=_open_fds(),
+        traced_bytes=tracemalloc.get_traced_memory()[0],
+    )
+
+
+def slope_per_1000(samples: List[Sample], value: Callable[[Sample], float]) -> float:
+    """発話数に対する value の最小二乗の傾き（1,000発話あたり）"""
+    if len(samples) < 2:
+        return 0.0
+    x = np.array([s.utterances for s in samples], dtype=np.float64)
+    y = np.array([value(s) for s in samples], dtype=np.float64)
+    return float(np.polyfit(x, y, 1)[0] * 1000)
+
+
+def _utterance(engine: VoiceInputEngine, timeout: float = 10.0) -> None:
+    """ホットキーを押して離し、入力が終わるまで待つ"""
+    engine.on_hotkey_press()
+    engine.on_hotkey_release()
+    deadline = time.perf_counter() + timeout
+    while engine.pending:
+        if time.perf_counter() > deadline:
+            raise TimeoutError("発話の処理が終わりません")
+        time.sleep(0.0005)
+
+
+def run(
+    utterances: int,
+    interval: int,
+    spill_bytes: int,
+    seed: int = 0,
+    progress: Optional[Callable[[Sample], None]] = None,
+) -> List[Sample]:
+    """utterances 発話を流し、interval 発話ごとの計測値を返す"""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.05, RATE * 4).astype(np.float32)
+    typed_chars = 0
+
+    def typer(text: str) -> None:
+        nonlocal typed_chars
+        typed_chars += len(text)
+
+    current: List[Any] = [noise[:BLOCK]]
+
+    def stream_factory(**kwargs: Any) -> StandInStream:
+        return StandInStream(current[0], kwargs["callback"])
+
+    saved = config.snapshot
+    # record_max_memory_bytes を小さくして、長めの発話は一時ファイルへの書き出しも通す
+    config._snapshot = saved.model_copy(
+        update={
+            "sample_rate": RATE,
+            "sound_enabled": False,
+            "history_enabled": False,
+            "profile_enabled": False,
+            "slo_target_ms": 0.0,
+            "learn_corrections": False,
+            "gemini_api_key": "soak",
+            "gemini_model": "soak",
+            "hotkey_profiles": [],
+            "record_max_memory_bytes": spill_bytes,
+        }
+    )
+    engine = VoiceInputEngine(
+        None,
+        None,
+        pipeline=TranscriptionPipeline(StandInTranscriber(), StandInGemini(), StandInReplacer()),
+        stream_factory=stream_factory,
+        typer=typer,
+    )
+    samples: List[Sample] = []
+    try:
+        for i in range(utterances):
+            if i % interval == 0:
+                samples.append(_measure(i))
+                if progress:
+                    progress(samples[-1])
+            seconds = rng.uniform(0.4, 4.0)
+            current[0] = noise[: int(seconds * RATE)]
+            _utterance(engine)
+        samples.append(_measure(utterances))
+        if progress:
+            progress(samples[-1])
+    finally:
+        engine.close()
+        config._snapshot = saved
+    if typed_chars == 0:
+        raise RuntimeError("何も入力されませんでした")
+    return samples
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="長時間稼働のリーク検出（ソーク試験）")
+    parser.add_argument("--utterances", type=int, default=10000, help="発話数")
+    parser.add_argument("--interval", type=int, default=250, help="計測する間隔（発話数）")
+    parser.add_argument("--warmup", type=int, default=1000, help="傾きの計算から除く最初の発話数")
+    parser.add_argument(
+        "--spill-bytes",
+        type=int,
+        default=64 * 1024,
+        help="録音をメモリに保持する上限（超えた発話は一時ファイルを使う）",
+    )
+    parser.add_argument("--max-rss-kb", type=float, default=1024.0, help="RSS の傾きの上限")
+    parser.add_argument(
+        "--max-traced-kb", type=float, default=256.0, help="tracemalloc の確保量の傾きの上限"
+    )
+    parser.add_argument("--max-threads", type=float, default=0.5, help="スレッド数の傾きの上限")
+    parser.add_argument("--max-fds", type=float, default=0.5, help="ファイル記述子の数の傾きの上限")
+    parser.add_argument("--top", type=int, default=10, help="表示する確保元の数")
+    parser.add_argument("--verbose", action="store_true", help="エンジンのログを表示する")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        # 発話ごとのログ（INFO）は出さない
+        logging.getLogger("voice_input").addFilter(lambda record: record.levelno >= logging.WARNING)
+
+    tracemalloc.start()
+    baseline: List[Any] = []
+
+    def progress(sample: Sample) -> None:
+        if sample.utterances == args.warmup:
+            baseline.append(tracemalloc.take_snapshot())
+        print(
+            f"{sample.utterances:>7} 発話  RSS {sample.rss_bytes / 1e6:7.1f}MB  "
+            f"スレッド {sample.threads:3d}  fd {sample.fds:4d}  "
+            f"tracemalloc {sample.traced_bytes / 1024:9.1f}KB"
+        )
+
+    start = time.perf_counter()
+    samples = run(args.utterances, args.interval, args.spill_bytes, progress=progress)
+    elapsed = time.perf_counter() - start
+    final = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    steady = [s for s in samples if s.utterances >= args.warmup]
+    checks = [
+        ("RSS", slope_per_1000(steady, lambda s: s.rss_bytes / 1024), args.max_rss_kb, "KB"),
+        (
+            "tracemalloc",
+            slope_per_1000(steady, lambda s: s.traced_bytes / 1024),
+            args.max_traced_kb,
+            "KB",
+        ),
+        ("スレッド", slope_per_1000(steady, lambda s: s.threads), args.max_threads, ""),
+        ("fd", slope_per_1000(steady, lambda s: s.fds), args.max_fds, ""),
+    ]
+    print()
+    print(f"{args.utterances} 発話 / {elapsed:.1f}秒（{args.utterances / elapsed:.0f} 発話/秒）")
+    print(f"入力ストリーム: 開いた {StandInStream.opened} / 閉じた {StandInStream.closed}")
+    failed = StandInStream.opened != StandInStream.closed
+    for name, slope, limit, unit in checks:
+        ok = slope <= limit
+        failed = failed or not ok
+        print(
+            f"  {name:<12} {slope:+10.2f}{unit} / 1,000発話"
+            f"（上限 {limit:g}{unit}） {'OK' if ok else 'NG'}"
+        )
+
+    if baseline:
+        print()
+        print(f"ウォームアップ後に増えた確保元（上位 {args.top}）:")
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = final.filter_traces(filters).compare_to(baseline[0].filter_traces(filters), "lineno")
+        for stat in diff[: args.top]:
+            print(f"  {stat}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
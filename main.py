@@ -14,17 +14,23 @@ macOSの設定:
     → 右Commandキーを押しながら話す → 離すとテキスト入力
 """
 
+import atexit
 import multiprocessing
 import sys
+import threading
 import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
-from app.config import config
-from app.engine import VoiceInputEngine
-from app.gemini import GeminiCorrector
-from app.google_speech import GoogleSpeechTranscriber
 from app.settings import SettingsWindow
 
+if TYPE_CHECKING:
+    from app.engine import VoiceInputEngine
+
+# メニューバー表示前に読み込むのは rumps と設定のみ。
+# numpy / sounddevice / pynput / Quartz / SpeechRecognition は
+# エンジン起動時（バックグラウンド）に読み込む。
+
 
 def _menubar_icon_path() -> str:
     """メニューバーアイコンのパスを返す（開発時・バンドル時対応）"""
@@ -44,10 +50,13 @@ try:
 
         _status_item: rumps.MenuItem
         _sound_item: rumps.MenuItem
+        _hands_free_item: rumps.MenuItem
 
         def __init__(self) -> None:
+            from app.config import config
+
             super().__init__("", icon=_menubar_icon_path(), quit_button="終了")
-            self._status_item = rumps.MenuItem("待機中...")
+            self._status_item = rumps.MenuItem("起動中...")
             # STTバックエンド表示
             backend_info = f"STT: Google Speech ({config.language})"
 
@@ -55,6 +64,12 @@ try:
             self._sound_item = rumps.MenuItem("🔊 サウンド", callback=self.toggle_sound)
             self._sound_item.state = config.sound_enabled
 
+            # ハンズフリーモード（エンジン起動後に有効）
+            self._hands_free_item = rumps.MenuItem(
+                "🎧 ハンズフリー", callback=self.toggle_hands_free
+            )
+            self.engine: Optional["VoiceInputEngine"] = None
+
             # 設定ウィンドウのインスタンス
             self._settings_window = SettingsWindow()
 
@@ -63,6 +78,7 @@ try:
                 None,
                 rumps.MenuItem(backend_info),
                 None,
+                self._hands_free_item,
                 self._sound_item,
                 rumps.MenuItem("設定", callback=self.open_settings),
             ]
@@ -74,44 +90,139 @@ try:
             self._status_item.title = "👨🏻‍💻 変換中..."
 
         def set_idle(self) -> None:
-            self._status_item.title = "待機中..."
+            self._status_item.title = (
+                "🎧 聞き取り中..." if self._hands_free_item.state else "待機中..."
+            )
 
         def set_error(self, msg: str) -> None:
             self._status_item.title = f"⚠️ {msg}"
 
         def toggle_sound(self, sender: rumps.MenuItem) -> None:
             """サウンドのON/OFFを切り替え"""
+            from app.config import config
+
             new_state = not sender.state
             sender.state = new_state
             config.save_sound_setting(new_state)
             status = "有効" if new_state else "無効"
             print(f"[設定] サウンド再生を{status}にしました")
 
+        def toggle_hands_free(self, sender: rumps.MenuItem) -> None:
+            """ハンズフリーモードのON/OFFを切り替え"""
+            if self.engine is None:
+                return
+            sender.state = self.engine.toggle_hands_free()
+            self.set_idle()
+
         def open_settings(self, _) -> None:
             """設定ウィンドウを開く"""
             self._settings_window.show()
 
+        def prewarm_settings(self) -> None:
+            """設定ウィンドウ用プロセスを事前起動しておく"""
+            self._settings_window.start_helper()
+
+        def add_settings_listener(self, listener: Callable[[str], None]) -> None:
+            """設定ウィンドウからの変更通知を listener にも渡す"""
+            self._settings_window.add_change_listener(listener)
+
     HAS_RUMPS = True
 except ImportError:
     HAS_RUMPS = False
     VoiceInputApp = None  # type: ignore
-    print("rumps未インストール。メニューバーUIなしで動作します。")
+    print("rumps未インストール。メニューバーUIなしで動作します。", file=sys.stderr)
+
+
+def _start_engine(app: Optional[Any] = None) -> "VoiceInputEngine":
+    """エンジンを初期化してキーボードリスナーを起動（重い依存はここで読み込む）"""
+    from app.config import config
+    from app.engine import VoiceInputEngine
+    from app.logging_setup import setup_logging
+    from app.metrics_server import start_metrics_server
+    from app.session_recorder import recorder_from_env
+
+    # ログファイルはアプリとして起動したときだけ（テスト・ベンチマーク・再生では書かない）
+    setup_logging()
+
+    # STT_RECORD_SESSION が設定されていれば、再現用にセッションを記録する
+    recorder = recorder_from_env()
+    if recorder:
+        atexit.register(recorder.close)
+
+    if config.service_url:
+        # 文字起こしはサービスに任せ、このプロセスは音声を送るだけにする
+        from app.service_client import RemotePipeline
+
+        engine = VoiceInputEngine(
+            None,
+            None,
+            app=app,
+            pipeline=RemotePipeline(config.service_url),
+            recorder=recorder,
+        )
+    elif config.pipeline_worker:
+        # 文字起こしを別プロセスで行い、録音コールバックや UI と GIL を共有しない
+        from app.pipeline_worker import WorkerPipeline
+
+        pipeline = WorkerPipeline()
+        pipeline.start()
+        atexit.register(pipeline.close)
+        if app:
+            # ワーカーは設定を自分のプロセスに読み込んでいるので、変更を送って読み直させる
+            app.add_settings_listener(pipeline.reload)
+        engine = VoiceInputEngine(None, None, app=app, pipeline=pipeline, recorder=recorder)
+    else:
+        # 設定ウィンドウと同じ Gemini のインスタンス（クライアント・モデルの計測を共有する）
+        from app.gemini import gemini
+        from app.google_speech import GoogleSpeechTranscriber
+
+        transcriber = GoogleSpeechTranscriber()
+        transcriber.load()
+        engine = VoiceInputEngine(transcriber, gemini, app=app, recorder=recorder)
+    engine.start_keyboard_listener()
+    start_metrics_server(config.metrics_port)
+    if app:
+        app.engine = engine
+        app.set_idle()
+        if config.settings_prewarm:
+            app.prewarm_settings()
+    return engine
 
 
 def main() -> None:
-    """メイン関数"""
-    transcriber = GoogleSpeechTranscriber()
-    transcriber.load()
-    gemini = GeminiCorrector()
+    """
+    メイン関数（`batch` は一括文字起こし、`serve` はパイプラインのサービスモード、
+    `replay` は記録したセッションの再生、`calibrate-audio` は入力デバイスのキャリブレーション、
+    `learn-corrections` は Gemini補正から学習した直し方の表示）
+    """
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from app.batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from app.service import main as service_main
+
+        sys.exit(service_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "calibrate-audio":
+        from app.audio_health import main as calibrate_main
+
+        sys.exit(calibrate_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        from app.session_replay import main as replay_main
+
+        sys.exit(replay_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "learn-corrections":
+        from app.correction_learner import main as learn_main
+
+        sys.exit(learn_main(sys.argv[2:]))
 
     if HAS_RUMPS:
         app = VoiceInputApp()
-        engine = VoiceInputEngine(transcriber, gemini, app=app)
-        engine.start_keyboard_listener()
+        # アイコンを先に表示し、エンジンはバックグラウンドで起動する
+        threading.Thread(target=_start_engine, args=(app,), daemon=True).start()
         app.run()
     else:
-        engine = VoiceInputEngine(transcriber, gemini)
-        engine.start_keyboard_listener()
+        _start_engine()
 
         try:
             while True:
@@ -0,0 +1,175 @@
+"""エンジンを動かすテストで共通の設定・スタンドイン・フィクスチャ"""
+
+import itertools
+import threading
+import time
+from typing import Any, Callable, Iterator, List, Optional, Union
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from app.config import ConfigSnapshot, config
+from app.engine import VoiceInputEngine
+from app.pipeline import TranscriptionPipeline
+
+RATE = 16000
+
+# テストの外（効果音・発話履歴・プロファイルのファイル）に何も残さない設定
+QUIET = {
+    "sample_rate": RATE,
+    "sound_enabled": False,
+    "history_enabled": False,
+    "profile_enabled": False,
+    "hotkey_profiles": [],
+}
+
+
+class FakeClock:
+    """テストが進める時計（秒）"""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class StandInTranscriber:
+    """STT の代わり（reply の文字列か reply(音声) を、delay 秒待ってから返す）"""
+
+    def __init__(
+        self,
+        reply: Union[str, Callable[[npt.NDArray[np.float32]], str]] = "てすと",
+        delay: float = 0.0,
+    ) -> None:
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+        # 呼ばれたときの言語（指定なしは空文字）
+        self.languages: List[str] = []
+
+    def transcribe(self, audio: npt.NDArray[np.float32], language: str = "") -> str:
+        self.calls += 1
+        self.languages.append(language)
+        if self.delay:
+            time.sleep(self.delay)
+        return self.reply(audio) if callable(self.reply) else self.reply
+
+
+class StandInCorrector:
+    """
+    Gemini補正の代わり（reply(テキスト) を返す）。
+    clock を渡すと delay 秒待つ代わりにその時計を進める。ok=False は失敗して元のテキストを返した扱い
+    """
+
+    def __init__(
+        self,
+        reply: Callable[[str], str] = lambda text: text,
+        delay: float = 0.0,
+        clock: Optional[FakeClock] = None,
+        enabled: bool = True,
+        ok: bool = True,
+    ) -> None:
+        self.reply = reply
+        self.delay = delay
+        self.clock = clock
+        self.enabled = enabled
+        self.last_ok = ok
+        self.calls = 0
+
+    def correct(self, text: str) -> str:
+        self.calls += 1
+        if self.clock is not None:
+            self.clock.advance(self.delay)
+        elif self.delay:
+            time.sleep(self.delay)
+        return self.reply(text)
+
+
+class StandInReplacer:
+    """ワード変換の代わり（何も変えない。ユーザーのルールを読まない）"""
+
+    def apply(self, text: str) -> str:
+        return text
+
+
+class TickingStream:
+    """10ms ごとにトーンのブロックを届ける入力ストリーム"""
+
+    def __init__(self, callback: Callable[..., None], freq: float) -> None:
+        self._callback = callback
+        self._freq = freq
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        block, n = RATE // 100, 0
+        while not self._stopping.wait(0.01):
+            t = (np.arange(block) + n) / RATE
+            samples = (0.3 * np.sin(2 * np.pi * self._freq * t)).astype(np.float32)
+            self._callback(samples.reshape(-1, 1), block, None, "")
+            n += block
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def quiet_config(monkeypatch: pytest.MonkeyPatch) -> Callable[..., ConfigSnapshot]:
+    """QUIET に update を重ねた設定に差し替える関数（テストの終わりに元に戻る）"""
+
+    def apply(**update: Any) -> ConfigSnapshot:
+        snap = config.snapshot.model_copy(update={**QUIET, **update})
+        monkeypatch.setattr(config, "_snapshot", snap)
+        return snap
+
+    return apply
+
+
+@pytest.fixture
+def ticking_streams() -> Callable[..., TickingStream]:
+    """engine の stream_factory に渡す関数（開くたびにトーンの周波数を変える）"""
+    freqs = itertools.count(200, 200)
+    return lambda **kwargs: TickingStream(kwargs["callback"], next(freqs))
+
+
+@pytest.fixture
+def make_engine() -> Iterator[Callable[..., VoiceInputEngine]]:
+    """
+    スタンドインのパイプラインでエンジンを作る関数（テストの終わりに close() して
+    文字起こしのスレッドを止める）。pipeline を渡さなければ transcriber / corrector から作る
+    """
+    engines: List[VoiceInputEngine] = []
+
+    def create(
+        transcriber: Optional[StandInTranscriber] = None,
+        corrector: Optional[StandInCorrector] = None,
+        **kwargs: Any,
+    ) -> VoiceInputEngine:
+        kwargs.setdefault("typer", lambda _text: None)
+        if "pipeline" not in kwargs:
+            kwargs["pipeline"] = TranscriptionPipeline(
+                transcriber or StandInTranscriber(),
+                corrector or StandInCorrector(enabled=False),
+                StandInReplacer(),
+            )
+        engine = VoiceInputEngine(None, None, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield create
+    for engine in engines:
+        engine.close()
@@ -0,0 +1,186 @@
+"""録音バッファのテスト"""
+
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pytest
+
+from app.audio_buffer import AudioBuffer
+from app.engine import VoiceInputEngine
+from test.conftest import StandInTranscriber
+
+ROOT = Path(__file__).parent.parent
+
+
+def _chunks(count: int, size: int = 512) -> list:
+    rng = np.random.default_rng(0)
+    return [rng.uniform(-1, 1, (size, 1)).astype(np.float32) for _ in range(count)]
+
+
+def test_small_recording_stays_in_memory(tmp_path: Path) -> None:
+    """上限以内の録音はメモリ上の配列のまま返すか"""
+    buffer = AudioBuffer(16000, 1024 * 1024, 60, spill_dir=tmp_path)
+    chunks = _chunks(10)
+    for chunk in chunks:
+        assert buffer.append(chunk)
+
+    audio = buffer.view()
+    assert not buffer.spilled
+    assert not isinstance(audio, np.memmap)
+    np.testing.assert_array_equal(audio, np.concatenate(chunks).flatten())
+    assert buffer.seconds == 5120 / 16000
+
+
+def test_long_recording_spills_to_memmap(tmp_path: Path) -> None:
+    """メモリ上限を超えたら一時ファイルに移し、memmap で全体を返すか"""
+    buffer = AudioBuffer(16000, 4096, 60, spill_dir=tmp_path)
+    chunks = _chunks(20)
+    for chunk in chunks:
+        buffer.append(chunk)
+
+    audio = buffer.view()
+    assert buffer.spilled
+    assert isinstance(audio, np.memmap)
+    np.testing.assert_array_equal(audio, np.concatenate(chunks).flatten())
+
+    # 閉じた後も渡した memmap は読める（名前のない一時ファイルなので何も残らない）
+    buffer.close()
+    assert float(audio[-1]) == float(chunks[-1][-1, 0])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_append_does_not_wait_for_disk(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """書き出しが止まっていても append() は待たず、view() は書き終えてから全体を返すか"""
+    gate = threading.Event()
+    original = AudioBuffer._write_block
+
+    def slow_write(self: AudioBuffer, block: np.ndarray) -> None:
+        gate.wait()
+        original(self, block)
+
+    monkeypatch.setattr(AudioBuffer, "_write_block", slow_write)
+    buffer = AudioBuffer(16000, 4096, 60, spill_dir=tmp_path)
+    chunks = _chunks(200)
+
+    start = time.perf_counter()
+    for chunk in chunks:
+        buffer.append(chunk)
+    assert time.perf_counter() - start < 1.0
+    assert buffer.spilled
+
+    threading.Timer(0.05, gate.set).start()
+    audio = buffer.view()
+    np.testing.assert_array_equal(audio, np.concatenate(chunks).flatten())
+    buffer.close()
+
+
+def test_view_flushes_partial_block_and_keeps_appending(tmp_path: Path) -> None:
+    """途中で view() しても、その後の追記を含めて順番どおりに読めるか"""
+    buffer = AudioBuffer(16000, 4096, 60, spill_dir=tmp_path)
+    chunks = _chunks(60, size=300)
+    for chunk in chunks[:30]:
+        buffer.append(chunk)
+    np.testing.assert_array_equal(buffer.view(), np.concatenate(chunks[:30]).flatten())
+
+    for chunk in chunks[30:]:
+        buffer.append(chunk)
+    np.testing.assert_array_equal(buffer.view(), np.concatenate(chunks).flatten())
+    buffer.close()
+
+
+class _FullDisk(io.BytesIO):
+    """書き込むとディスクが一杯になったように失敗する一時ファイル"""
+
+    def write(self, _data: Any) -> int:
+        raise OSError(28, "No space left on device")
+
+
+@pytest.fixture
+def failing_disk(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(tempfile, "TemporaryFile", lambda **_kwargs: _FullDisk())
+
+
+def test_view_raises_after_write_error(tmp_path: Path, failing_disk: None) -> None:
+    """書き出しに失敗した録音は空を返さず、その OSError を送出するか"""
+    buffer = AudioBuffer(16000, 4096, 60, spill_dir=tmp_path)
+    for chunk in _chunks(100):
+        buffer.append(chunk)
+    assert buffer.seconds > 3
+
+    with pytest.raises(OSError, match="No space left"):
+        buffer.view()
+    buffer.close()
+
+
+def test_engine_skips_recording_after_write_error(
+    failing_disk: None,
+    quiet_config: Callable[..., Any],
+    make_engine: Callable[..., VoiceInputEngine],
+    ticking_streams: Callable[..., Any],
+) -> None:
+    """書き出しに失敗した録音は、長さが足りていても文字起こしに渡さないか"""
+    quiet_config(record_max_memory_bytes=4096, min_duration=0.1)
+    transcriber = StandInTranscriber()
+    engine = make_engine(transcriber, stream_factory=ticking_streams)
+
+    engine.start_recording()
+    time.sleep(0.3)
+    engine.stop_recording()
+    engine.close()
+    assert transcriber.calls == 0
+    assert not engine.is_recording
+
+
+def test_max_duration_truncates_and_signals_stop(tmp_path: Path) -> None:
+    """最大録音時間を超えた分は捨て、達したら False を返すか"""
+    buffer = AudioBuffer(1000, 1024 * 1024, 1.0, spill_dir=tmp_path)
+    results = [buffer.append(chunk) for chunk in _chunks(3, size=400)]
+
+    assert results == [True, True, False]
+    assert buffer.full
+    assert len(buffer.view()) == 1000
+
+
+_PROBE = """
+import json, resource, sys
+import numpy as np
+import pytest
+
+from app.audio_buffer import AudioBuffer
+from app.engine import VoiceInputEngine
+from test.conftest import StandInTranscriber
+
+def peak():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+rate, block = 16000, 4096
+chunk = np.zeros((block, 1), dtype=np.float32)
+buffer = AudioBuffer(rate, 4 * 1024 * 1024, 3600)
+base = peak()
+for _ in range(30 * 60 * rate // block):
+    buffer.append(chunk)
+audio = buffer.view()
+print(json.dumps({"growth": peak() - base, "seconds": buffer.seconds, "spilled": buffer.spilled}))
+"""
+
+
+def test_thirty_minute_capture_keeps_peak_rss_flat() -> None:
+    """30分の録音でも最大常駐メモリがメモリ上限程度しか増えないか"""
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout)
+
+    assert data["spilled"]
+    assert data["seconds"] >= 30 * 60 - 1
+    # 30分の float32 は約 110MB。増加はメモリ上限（4MB）と書き出しの一時バッファ程度に収まる
+    assert data["growth"] < 16 * 1024 * 1024, data
@@ -0,0 +1,96 @@
+"""録音経路の計測とキャリブレーションのテスト"""
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from app.audio_health import AudioHealth, calibrate
+from app.metrics import MetricsRegistry
+
+
+class _Flags:
+    """sd.CallbackFlags と同じ属性を持つステータス"""
+
+    def __init__(self, input_overflow: bool = False, input_underflow: bool = False) -> None:
+        self.input_overflow = input_overflow
+        self.input_underflow = input_underflow
+
+    def __bool__(self) -> bool:
+        return self.input_overflow or self.input_underflow
+
+
+def test_counts_xruns_and_measures_callbacks() -> None:
+    """オーバーフロー・アンダーフローを数え、処理時間と間隔の揺れを測ってメトリクスに出すか"""
+    registry = MetricsRegistry()
+    health = AudioHealth(1000, registry=registry)
+    received = []
+
+    def slow_callback(indata: Any, frames: int, _time: Any, _status: Any) -> None:
+        received.append(frames)
+        time.sleep(0.002)
+
+    callback = health.wrap(slow_callback)
+    block = np.zeros((10, 1), dtype=np.float32)
+    for status in (_Flags(), _Flags(input_overflow=True), "input underflow", _Flags()):
+        callback(block, 10, None, status)
+        time.sleep(0.01)
+
+    assert received == [10, 10, 10, 10]
+    assert (health.callbacks, health.overflows, health.underflows) == (4, 1, 1)
+    assert 2 <= health.max_callback_ms < 50
+    # 期待間隔 10ms に対して約 12ms ごとに呼んでいる
+    assert 0 < health.mean_jitter_ms < 50
+    assert health.mean_block_ms == 10
+    assert registry.counter_value("stt_audio_xruns_total", kind="input_overflow") == 1
+    assert "stt_audio_callback_ms_count 4" in registry.render()
+    assert "stt_audio_callback_jitter_ms_count 3" in registry.render()
+
+
+class _FakeStream:
+    """小さいブロックではオーバーフローを報告するデバイス"""
+
+    def __init__(
+        self,
+        samplerate: int,
+        blocksize: int,
+        latency: Any,
+        callback: Callable[..., None],
+        **_kwargs: Any,
+    ) -> None:
+        self._rate = samplerate
+        self._blocksize = blocksize or 2048
+        self._callback = callback
+        self.latency = 0.005 if latency == "low" else 0.05
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run)
+        self._thread.start()
+
+    def _run(self) -> None:
+        block = np.zeros((self._blocksize, 1), dtype=np.float32)
+        status = _Flags(input_overflow=self._blocksize < 512)
+        while not self._stopping.wait(0.005):
+            self._callback(block, self._blocksize, None, status)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self) -> None:
+        pass
+
+
+def test_calibrate_picks_lowest_latency_without_overflow() -> None:
+    """オーバーフローしない組み合わせのうち、入力レイテンシが最小のものを選ぶか"""
+    best, trials = calibrate(_FakeStream, 16000, seconds=0.05)
+
+    assert len(trials) == 7
+    assert all(t.overflows > 0 for t in trials if t.blocksize in (128, 256))
+    assert best is not None
+    assert (best.blocksize, best.latency) == (512, "low")
+    assert abs(best.latency_ms - (5 + 512 / 16)) < 1e-6
@@ -0,0 +1,86 @@
+"""一括文字起こしのテスト"""
+
+import io
+import json
+import wave
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from app.audio_io import load_audio
+from app.batch import collect_inputs, run_batch
+from app.pipeline import PipelineResult
+
+
+class _FakePipeline:
+    """音声の長さを文字列にして返すパイプライン（ネットワークを使わない）"""
+
+    def process(self, audio: npt.NDArray[np.float32]) -> PipelineResult:
+        text = f"{len(audio)} samples"
+        return PipelineResult(
+            raw_text=text, corrected_text=text, replaced_text=text, audio_seconds=len(audio) / 16000
+        )
+
+
+def _fake_pipeline() -> _FakePipeline:
+    return _FakePipeline()
+
+
+def _write_wav(path: Path, seconds: float, rate: int = 16000, channels: int = 1) -> None:
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 0.5 * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(np.repeat(samples, channels).tobytes())
+
+
+def test_load_audio_mixes_down_and_resamples(tmp_path: Path) -> None:
+    """ステレオ 48kHz の WAV をモノラル 16kHz に変換するか"""
+    path = tmp_path / "stereo.wav"
+    _write_wav(path, 1.0, rate=48000, channels=2)
+
+    audio = load_audio(path, 16000)
+
+    assert audio.dtype == np.float32
+    assert len(audio) == 16000
+    assert 0.45 < float(np.abs(audio).max()) < 0.55
+
+
+def test_collect_inputs_from_directory_and_manifest(tmp_path: Path) -> None:
+    """ディレクトリ配下とマニフェスト（相対パス・コメント行）から入力を集めるか"""
+    (tmp_path / "sub").mkdir()
+    _write_wav(tmp_path / "b.wav", 0.1)
+    _write_wav(tmp_path / "sub" / "a.WAV", 0.1)
+    (tmp_path / "notes.txt").write_text("x")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# archived\nb.wav\n\nsub/a.WAV\n")
+
+    assert collect_inputs(tmp_path) == [tmp_path / "b.wav", tmp_path / "sub" / "a.WAV"]
+    assert collect_inputs(manifest) == [tmp_path / "b.wav", tmp_path / "sub" / "a.WAV"]
+
+
+def test_run_batch_writes_jsonl(tmp_path: Path) -> None:
+    """全ファイルを並列に処理し、失敗したファイルもエラーとして1行ずつ書き出すか"""
+    inputs = []
+    for i in range(6):
+        path = tmp_path / f"{i}.wav"
+        _write_wav(path, 0.5 + i * 0.1)
+        inputs.append(path)
+    broken = tmp_path / "broken.wav"
+    broken.write_bytes(b"not a wav")
+    inputs.append(broken)
+
+    output = io.StringIO()
+    stats = run_batch(inputs, output, workers=2, sample_rate=16000, pipeline_factory=_fake_pipeline)
+
+    records = {r["path"]: r for r in map(json.loads, output.getvalue().splitlines())}
+    assert len(records) == 7
+    assert stats["files"] == 7
+    assert stats["errors"] == 1
+    assert "error" in records[str(broken)]
+    assert records[str(tmp_path / "0.wav")]["text"] == "8000 samples"
+    assert records[str(tmp_path / "5.wav")]["replaced_text"] == "16000 samples"
+    assert abs(stats["audio_seconds"] - sum(0.5 + i * 0.1 for i in range(6))) < 1e-6
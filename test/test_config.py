@@ -0,0 +1,148 @@
+"""設定スナップショットと再読み込みのテスト"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from app import config as config_module
+from app.config import AppConfig
+
+
+@pytest.fixture
+def app_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> AppConfig:
+    monkeypatch.setattr(config_module, "_get_env_path", lambda: tmp_path / ".env")
+    return AppConfig(
+        gemini_api_key="",
+        gemini_prompt_file=tmp_path / "prompts.json",
+        settings_file=tmp_path / "settings.json",
+    )
+
+
+def test_snapshot_is_immutable(app_config: AppConfig) -> None:
+    """スナップショットは変更できない"""
+    with pytest.raises(Exception):
+        app_config.snapshot.sound_enabled = False  # type: ignore[misc]
+
+
+def test_save_publishes_new_snapshot(app_config: AppConfig) -> None:
+    """保存するたびに新しいバージョンのスナップショットに差し替わる"""
+    before = app_config.snapshot
+    app_config.save_prompt("新しいプロンプト {text}")
+    after = app_config.snapshot
+    assert after.version == before.version + 1
+    assert after.gemini_prompt == "新しいプロンプト {text}"
+    assert before.gemini_prompt != after.gemini_prompt
+
+
+def test_reset_prompt_to_default(app_config: AppConfig) -> None:
+    """デフォルトへのリセットがデッドロックせずに反映される"""
+    app_config.save_prompt("変更済み {text}")
+    default = app_config.reset_prompt_to_default()
+    assert app_config.snapshot.gemini_prompt == default
+
+
+def test_reload_picks_up_changes_from_other_process(app_config: AppConfig, tmp_path: Path) -> None:
+    """別プロセスが書き込んだファイルを reload で取り込む"""
+    other = AppConfig(
+        gemini_prompt_file=tmp_path / "prompts.json",
+        settings_file=tmp_path / "settings.json",
+    )
+    other.save_prompt("別プロセスのプロンプト {text}")
+    other.save_sound_setting(False)
+    other.save_gemini_settings("new-key", "gemini-test")
+
+    assert app_config.snapshot.gemini_api_key == ""
+    snapshot = app_config.reload()
+    assert snapshot is app_config.snapshot
+    assert snapshot.gemini_prompt == "別プロセスのプロンプト {text}"
+    assert snapshot.sound_enabled is False
+    assert snapshot.gemini_api_key == "new-key"
+    assert snapshot.gemini_model == "gemini-test"
+    assert json.loads((tmp_path / "settings.json").read_text())["sound_enabled"] is False
+
+
+def test_audio_calibration_saved_per_device(app_config: AppConfig, tmp_path: Path) -> None:
+    """入力デバイスごとのキャリブレーション結果が settings.json に保存され、読み直せるか"""
+    app_config.save_audio_calibration(
+        "MacBook Pro Microphone", {"blocksize": 256, "latency": "low"}
+    )
+    app_config.save_audio_calibration("USB Mic", {"blocksize": 1024, "latency": "high"})
+
+    assert app_config.snapshot.audio_calibration["USB Mic"] == {
+        "blocksize": 1024,
+        "latency": "high",
+    }
+    saved = json.loads((tmp_path / "settings.json").read_text(encoding="utf-8"))
+    assert set(saved["audio_calibration"]) == {"MacBook Pro Microphone", "USB Mic"}
+    assert app_config.reload().audio_calibration["MacBook Pro Microphone"]["blocksize"] == 256
+
+
+def test_hotkey_profiles_loaded_from_settings(app_config: AppConfig, tmp_path: Path) -> None:
+    """settings.json のホットキーごとの設定を読み込み、未設定なら hotkey だけを使うか"""
+    assert [p.hotkey for p in app_config.snapshot.active_hotkey_profiles] == ["cmd_r"]
+
+    settings_file = tmp_path / "settings.json"
+    saved = json.loads(settings_file.read_text(encoding="utf-8"))
+    saved["hotkey_profiles"] = [
+        {"hotkey": "cmd_r", "name": "文章"},
+        {"hotkey": "alt_r", "gemini": False, "language": "en", "insertion": "chunked"},
+    ]
+    settings_file.write_text(json.dumps(saved), encoding="utf-8")
+
+    first, second = app_config.reload().active_hotkey_profiles
+    assert (first.label, first.gemini, first.insertion) == ("文章", True, "type")
+    assert (second.label, second.gemini, second.language) == ("alt_r", False, "en")
+    assert second.insertion == "chunked"
+
+
+def test_invalid_value_skips_only_that_key(tmp_path: Path) -> None:
+    """不正な値のキーだけを読み飛ばし、他の設定もファイルもそのまま残すか"""
+    settings_file = tmp_path / "settings.json"
+    saved = {
+        "version": "1.0",
+        "slo_target_ms": -5,
+        "history_enabled": False,
+        "metrics_port": 9464,
+        "audio_calibration": {"USB Mic": {"blocksize": 1024}},
+        "unknown_key": "keep",
+    }
+    settings_file.write_text(json.dumps(saved), encoding="utf-8")
+
+    loaded = AppConfig(gemini_prompt_file=tmp_path / "prompts.json", settings_file=settings_file)
+
+    snap = loaded.snapshot
+    assert snap.slo_target_ms == 0.0
+    assert snap.history_enabled is False
+    assert snap.audio_calibration == {"USB Mic": {"blocksize": 1024}}
+    assert json.loads(settings_file.read_text(encoding="utf-8")) == saved
+
+    # アプリからの保存でも、不正な値・未知のキーは書き換えない
+    loaded.save_sound_setting(False)
+    assert json.loads(settings_file.read_text(encoding="utf-8")) == {
+        **saved,
+        "sound_enabled": False,
+    }
+
+
+def test_only_set_keys_are_written(app_config: AppConfig, tmp_path: Path) -> None:
+    """保存しても、設定していない値を既定値としてファイルに書かないか"""
+    app_config.save_sound_setting(False)
+    assert json.loads((tmp_path / "settings.json").read_text(encoding="utf-8")) == {
+        "version": "1.0",
+        "sound_enabled": False,
+    }
+
+
+def test_broken_json_is_backed_up(tmp_path: Path) -> None:
+    """JSON として読めないファイルだけを退避して作り直すか"""
+    settings_file = tmp_path / "settings.json"
+    settings_file.write_text('{"history_enabled": false,', encoding="utf-8")
+
+    loaded = AppConfig(gemini_prompt_file=tmp_path / "prompts.json", settings_file=settings_file)
+
+    assert loaded.snapshot.history_enabled is True
+    assert (tmp_path / "settings.json.bak").read_text(encoding="utf-8") == (
+        '{"history_enabled": false,'
+    )
+    assert json.loads(settings_file.read_text(encoding="utf-8")) == {"version": "1.0"}
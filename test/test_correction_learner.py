@@ -0,0 +1,267 @@
+"""Gemini補正の結果からの直し方の学習のテスト"""
+
+import random
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from app import word_replacement
+from app.config import config
+from app.correction_learner import _PROBE_INTERVAL, CorrectionLearner, diff_corrections, promote
+from app.history import UtteranceHistory
+from app.metrics import metrics
+from app.pipeline import PipelineResult, TranscriptionPipeline
+
+
+@pytest.fixture
+def learning(monkeypatch: pytest.MonkeyPatch) -> None:
+    snap = config.snapshot.model_copy(
+        update={
+            "learn_corrections": True,
+            "learn_min_count": 3,
+            "learn_auto_promote": False,
+            "gemini_api_key": "test",
+            "gemini_model": "test",
+        }
+    )
+    monkeypatch.setattr(config, "_snapshot", snap)
+
+
+@pytest.mark.parametrize(
+    "raw, corrected, expected",
+    [
+        (
+            "ぱいそんでじぇそんをぱーすする",
+            "PythonでJSONをパースする",
+            [("ぱいそん", "Python"), ("じぇそん", "JSON"), ("ぱーす", "パース")],
+        ),
+        (
+            "どっかーこんてなをきどうする",
+            "Dockerコンテナを起動する",
+            [
+                ("どっかーこんてな", "Dockerコンテナ"),
+                ("きどう", "起動"),
+            ],
+        ),
+        # 句読点の追加（挿入だけ）は置き換えとみなさない
+        ("きょうはいいてんき", "きょうはいいてんき。", []),
+    ],
+)
+def test_diff_corrections(raw: str, corrected: str, expected: List) -> None:
+    """Gemini が直した箇所を、入力と出力の組として取り出せるか"""
+    assert diff_corrections(raw, corrected) == expected
+
+
+def test_learns_stable_corrections_and_skips_covered_templates(learning: None) -> None:
+    """同じ直し方が続いたら学習し、学習済みルールだけで一致し続けた型は Gemini を省略するか"""
+    learner = CorrectionLearner()
+    raw, corrected = "ぱいそんでじぇそんをぱーすする", "PythonでJSONをパースする"
+    for _ in range(3):
+        learner.observe(raw, corrected)
+    assert {(r.input, r.output) for r in learner.rules()} == {
+        ("ぱいそん", "Python"),
+        ("じぇそん", "JSON"),
+        ("ぱーす", "パース"),
+    }
+    # 学習した時点では型の一致回数が足りない
+    assert learner.correct(raw) is None
+    for _ in range(2):
+        learner.observe(raw, corrected)
+    assert learner.correct(raw) == corrected
+    # 同じ型なら学習済みの語を入れ替えても補正できる
+    assert learner.correct("じぇそんでぱいそんをぱーすする") == "JSONでPythonをパースする"
+    # 型が違えば Gemini を呼ぶ
+    assert learner.correct("ぱいそんをきどうする") is None
+    assert learner.avoided == 2
+
+    # Gemini が学習済みルール以外も直した型は省略しない
+    other = "ぱいそんでじぇそんをよむ"
+    learner.observe(other, "PythonでJSONを読む")
+    for _ in range(5):
+        learner.observe(other, "PythonでJSONをよむ")
+    assert learner.correct(other) is None
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_only_consistent_corrections_are_learned(seed: int, learning: None) -> None:
+    """
+    いつも同じに直される語だけを学習し、直されたりされなかったりする語は学習しないか。
+    省略したときの補正結果は、Gemini（ここでは規則どおりに直す関数）と一致するか
+    """
+    rng = random.Random(seed)
+    always = {"ぱいそん": "Python", "じぇそん": "JSON", "どっかー": "Docker"}
+    sometimes = {"りあくと": "React", "きどう": "起動"}
+    fillers = ["を", "で", "と", "の", "する", "つかう", "みる"]
+
+    def gemini(words: List[str], fixes: Dict[str, bool]) -> str:
+        out = []
+        for word in words:
+            if word in always:
+                out.append(always[word])
+            elif word in sometimes and fixes[word]:
+                out.append(sometimes[word])
+            else:
+                out.append(word)
+        return "".join(out)
+
+    learner = CorrectionLearner()
+    vocabulary = list(always) + list(sometimes)
+    for _ in range(300):
+        words = [
+            rng.choice(vocabulary) if k % 2 == 0 else rng.choice(fillers)
+            for k in range(rng.randint(1, 5))
+        ]
+        raw = "".join(words)
+        learned = learner.correct(raw)
+        fixes = {word: rng.random() < 0.5 for word in sometimes}
+        expected = gemini(words, fixes)
+        if learned is not None:
+            # 型が一致し続けているのは「いつも直す語」だけの発話
+            assert not any(word in sometimes for word in words)
+            assert learned == expected
+        else:
+            learner.observe(raw, expected)
+
+    # 偶然続けて直された少数回のものを除けば、学習したのは「いつも直す語」の直し方だけ
+    frequent = {(r.input, r.output) for r in learner.rules() if r.seen >= 10}
+    assert frequent == set(always.items())
+    assert learner.avoided > 0
+
+
+class _Transcriber:
+    def transcribe(self, audio: np.ndarray, language: str = "") -> str:
+        return "ぱいそんでじぇそんをぱーすする"
+
+
+class _Corrector:
+    enabled = True
+    last_ok = True
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def correct(self, text: str) -> str:
+        self.calls += 1
+        return "PythonでJSONをパースする"
+
+
+class _FailingCorrector(_Corrector):
+    """APIエラーなどで元のテキストを返す"""
+
+    last_ok = False
+
+    def correct(self, text: str) -> str:
+        self.calls += 1
+        return text
+
+
+class _Replacer:
+    def apply(self, text: str) -> str:
+        return text
+
+
+def test_pipeline_skips_gemini_when_covered(learning: None) -> None:
+    """学習済みの型の発話は Gemini を呼ばず、省略した段として記録するか"""
+    learner = CorrectionLearner()
+    corrector = _Corrector()
+    pipeline = TranscriptionPipeline(_Transcriber(), corrector, _Replacer(), learner=learner)
+    audio = np.zeros(1600, dtype=np.float32)
+    for _ in range(5):
+        learner.observe("ぱいそんでじぇそんをぱーすする", "PythonでJSONをパースする")
+    before = metrics.counter_value("stt_gemini_avoided_total")
+
+    result = pipeline.process(audio)
+
+    assert corrector.calls == 0
+    assert result.text == "PythonでJSONをパースする"
+    assert result.skipped == "gemini:learned"
+    assert result.gemini_ms == 0.0
+    assert metrics.counter_value("stt_gemini_avoided_total") == before + 1
+
+
+def test_failed_corrections_are_not_learned(learning: None) -> None:
+    """Gemini が元のテキストを返した（失敗した）発話は学習せず、失敗として記録するか"""
+    learner = CorrectionLearner()
+    submitted: List[tuple] = []
+    learner.submit = lambda raw, corrected: submitted.append((raw, corrected))  # type: ignore
+    audio = np.zeros(1600, dtype=np.float32)
+
+    failed = TranscriptionPipeline(
+        _Transcriber(), _FailingCorrector(), _Replacer(), learner=learner
+    )
+    result = failed.process(audio)
+    assert result.skipped == "gemini:failed"
+    assert submitted == []
+
+    TranscriptionPipeline(_Transcriber(), _Corrector(), _Replacer(), learner=learner).process(audio)
+    assert submitted == [("ぱいそんでじぇそんをぱーすする", "PythonでJSONをパースする")]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_covered_templates_are_probed(seed: int, learning: None) -> None:
+    """省略している型も一定の回数ごとに Gemini を呼び、直し方が変わったら省略をやめるか"""
+    rng = random.Random(seed)
+    learner = CorrectionLearner()
+    raw, corrected = "ぱいそんでじぇそんをぱーすする", "PythonでJSONをパースする"
+    for _ in range(rng.randint(5, 30)):
+        learner.observe(raw, corrected)
+
+    # 一致し続ける間は、_PROBE_INTERVAL 回のうち1回だけ Gemini を呼ぶ
+    for _ in range(rng.randint(1, 4)):
+        results = []
+        for _ in range(_PROBE_INTERVAL):
+            results.append(learner.correct(raw))
+            if results[-1] is None:
+                learner.observe(raw, corrected)
+        assert results.count(None) == 1
+        assert set(results) == {None, corrected}
+
+    # Gemini の直し方が変わったら、確かめた回で省略をやめる
+    while learner.correct(raw) is not None:
+        pass
+    learner.observe(raw, "PythonでJSONを解析する")
+    assert learner.correct(raw) is None
+
+
+def test_learn_from_history_and_promote(
+    learning: None, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """発話履歴から学習し、学習済みルールをワード変換ルールに追加できるか"""
+    monkeypatch.setattr(word_replacement, "_get_csv_path", lambda: tmp_path / "rules.csv")
+    manager = word_replacement.WordReplacementManager()
+    manager.set_rules([("じぇそん", "JSON")])
+    manager.save_csv()
+    monkeypatch.setattr(word_replacement, "word_replacer", manager, raising=False)
+
+    history = UtteranceHistory(tmp_path / "history.sqlite3")
+    for i in range(4):
+        history.record(
+            PipelineResult(
+                raw_text="ぱいそんでじぇそんをぱーすする",
+                corrected_text="PythonでJSONをパースする",
+                gemini_ms=300.0,
+                created_at=1_700_000_000.0 + i,
+            )
+        )
+    # Gemini を通していない発話・Gemini が失敗した発話は学習しない
+    history.record(PipelineResult(raw_text="ぱいそん", corrected_text="ぱいそん"))
+    history.record(
+        PipelineResult(
+            raw_text="ぱいそんでじぇそんをぱーすする",
+            corrected_text="ぱいそんでじぇそんをぱーすする",
+            gemini_ms=5000.0,
+            skipped="gemini:failed",
+        )
+    )
+    history.flush()
+
+    learner = CorrectionLearner()
+    assert learner.learn_history(history) == 4
+    history.close()
+
+    added = promote((r.input, r.output) for r in learner.rules())
+    assert sorted(added) == [("ぱいそん", "Python"), ("ぱーす", "パース")]
+    assert manager.get_rules() == [("じぇそん", "JSON")] + added
+    assert word_replacement.WordReplacementManager().get_rules() == manager.get_rules()
@@ -0,0 +1,82 @@
+"""発話を続けて処理してもスレッド・ファイル記述子が増えないことのテスト"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from app.engine import VoiceInputEngine
+from test.conftest import RATE, StandInTranscriber
+
+BLOCK = RATE // 10
+
+
+class _Stream:
+    """録音ブロックを start() の中で届ける入力ストリーム"""
+
+    def __init__(self, audio: npt.NDArray[np.float32], callback: Callable[..., None]) -> None:
+        self._audio = audio
+        self._callback = callback
+
+    def start(self) -> None:
+        for start in range(0, len(self._audio), BLOCK):
+            block = self._audio[start : start + BLOCK].reshape(-1, 1)
+            self._callback(block, len(block), None, "")
+
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def quiet(quiet_config: Callable[..., Any]) -> None:
+    # 長めの発話は一時ファイルへの書き出しを通す
+    quiet_config(record_max_memory_bytes=32 * 1024)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_utterances_reuse_one_thread_and_keep_order(
+    seed: int, quiet: None, make_engine: Callable[..., VoiceInputEngine]
+) -> None:
+    """次々に届いた発話を1本のスレッドで順に処理し、スレッドと fd が増えないか"""
+    rng = random.Random(seed)
+    typed: List[str] = []
+    current: List[Any] = [None]
+    # 音声の長さ（ブロック数）を文字起こし結果として返す
+    transcriber = StandInTranscriber(lambda audio: f"発話{len(audio) // BLOCK}", delay=0.002)
+    engine = make_engine(
+        transcriber,
+        stream_factory=lambda **kwargs: _Stream(current[0], kwargs["callback"]),
+        typer=typed.append,
+    )
+    noise = np.random.default_rng(seed).normal(0, 0.05, RATE * 2).astype(np.float32)
+
+    def burst(count: int) -> List[str]:
+        expected = []
+        for _ in range(count):
+            blocks = rng.randint(4, 20)
+            current[0] = noise[: blocks * BLOCK]
+            expected.append(f"発話{blocks}")
+            # 前の発話の処理を待たずに次の発話を録音する
+            engine.on_hotkey_press()
+            engine.on_hotkey_release()
+        deadline = time.perf_counter() + 10
+        while engine.pending and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        return expected
+
+    expected = burst(20)
+    threads, fds = threading.active_count(), len(os.listdir("/dev/fd"))
+    expected += burst(200)
+    engine.close()
+
+    assert typed == expected
+    assert threading.active_count() <= threads
+    assert len(os.listdir("/dev/fd")) <= fds
@@ -0,0 +1,212 @@
+"""Gemini へのリクエストの組み立て（システム指示・出力トークン数の上限・使用量）のテスト"""
+
+import random
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+
+from app.config import GeminiModel, config
+from app.gemini import (
+    GeminiCorrector,
+    GeminiRequest,
+    output_token_budget,
+    split_prompt,
+    thinking_budget,
+)
+from app.metrics import metrics
+
+PROMPT = "以下のテキストを補正してください。補正後のテキストのみを出力してください：\n{text}"
+
+
+@pytest.fixture
+def gemini_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    snap = config.snapshot.model_copy(
+        update={
+            "gemini_api_key": "test",
+            "gemini_models": [GeminiModel(name="budget-test")],
+            "gemini_prompt": PROMPT,
+            "gemini_output_token_ratio": 1.5,
+            "gemini_max_output_tokens": 4096,
+        }
+    )
+    monkeypatch.setattr(config, "_snapshot", snap)
+
+
+def _response(text: str, finish_reason: str = "STOP", **usage: int) -> Any:
+    return SimpleNamespace(
+        text=text,
+        candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name=finish_reason))],
+        usage_metadata=SimpleNamespace(**usage) if usage else None,
+    )
+
+
+def test_prompt_is_sent_as_system_instruction(gemini_config: None) -> None:
+    """プロンプトはシステム指示として使い回し、テキストだけをユーザーの入力として送るか"""
+    sent: List[GeminiRequest] = []
+
+    def request(req: GeminiRequest) -> Any:
+        sent.append(req)
+        return _response("Python")
+
+    corrector = GeminiCorrector(request=request)
+    assert corrector.correct("ぱいそん") == "Python"
+    assert corrector.correct("じぇそん") == "Python"
+
+    first, second = sent
+    assert first.system_instruction == split_prompt(PROMPT)
+    assert "{text}" not in first.system_instruction
+    assert (first.contents, second.contents) == ("ぱいそん", "じぇそん")
+    # プロンプトが変わらない間は同じシステム指示を使い回す
+    assert second.system_instruction is first.system_instruction
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_output_budget_follows_input_length(seed: int) -> None:
+    """上限は入力と同じ長さの補正結果が収まり、入力が長くなるほど大きく、最大値を超えないか"""
+    rng = random.Random(seed)
+    ratio = rng.uniform(1.0, 3.0)
+    limit = rng.randint(64, 8192)
+    lengths = sorted(rng.randint(1, 10000) for _ in range(50))
+    budgets = [output_token_budget("あ" * n, ratio, limit) for n in lengths]
+
+    assert budgets == sorted(budgets)
+    for n, budget in zip(lengths, budgets):
+        assert budget <= limit
+        assert budget >= min(limit, n)
+
+
+def test_truncated_output_falls_back_to_input(gemini_config: None) -> None:
+    """上限で打ち切られた出力は使わず、元のテキストを返すか"""
+    sent: List[GeminiRequest] = []
+
+    def request(req: GeminiRequest) -> Any:
+        sent.append(req)
+        return _response("Pythonで" + "JSON" * 50, finish_reason="MAX_TOKENS")
+
+    before = metrics.counter_value("stt_gemini_truncated_total", model="budget-test")
+    corrector = GeminiCorrector(request=request)
+
+    assert corrector.correct("ぱいそんでじぇそん") == "ぱいそんでじぇそん"
+    assert sent[0].max_output_tokens == output_token_budget("ぱいそんでじぇそん", 1.5, 4096)
+    assert metrics.counter_value("stt_gemini_truncated_total", model="budget-test") == before + 1
+    # 打ち切りは API の失敗ではない
+    assert corrector.router.stats("budget-test").failures == 0
+
+
+@pytest.mark.parametrize(
+    "model, default, expected",
+    [
+        (GeminiModel(name="gemini-2.5-flash"), 0, 0),
+        (GeminiModel(name="gemini-2.5-pro", thinking_budget=128), 0, 128),
+        (GeminiModel(name="gemini-2.5-flash"), 512, 512),
+        # 思考を受け付けないモデルには thinking_config を送らない
+        (GeminiModel(name="gemini-2.0-flash", thinking_budget=128), 0, None),
+    ],
+)
+def test_thinking_budget(model: GeminiModel, default: int, expected: int) -> None:
+    """モデルごとの思考トークン数の上限（省略時は全体の設定）"""
+    assert thinking_budget(model, default) == expected
+
+
+def test_thinking_tokens_do_not_eat_the_output_budget(
+    gemini_config: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """思考トークンは出力の上限とは別枠で送り、思考で使われても補正結果を使うか"""
+    snap = config.snapshot.model_copy(
+        update={"gemini_models": [GeminiModel(name="gemini-2.5-pro", thinking_budget=200)]}
+    )
+    monkeypatch.setattr(config, "_snapshot", snap)
+    text = "ぱいそんでじぇそんをぱーすする"
+    output_tokens = output_token_budget(text, 1.5, 4096)
+    sent: List[GeminiRequest] = []
+
+    def request(req: GeminiRequest) -> Any:
+        sent.append(req)
+        # 思考に上限いっぱい使い、残りで補正結果を出力した
+        assert req.max_output_tokens - req.thinking_budget >= output_tokens
+        return _response(
+            "PythonでJSONをパースする", thoughts_token_count=200, candidates_token_count=9
+        )
+
+    def thoughts() -> str:
+        prefix = 'stt_gemini_tokens_sum{kind="thoughts",model="gemini-2.5-pro"} '
+        lines = [line for line in metrics.render().splitlines() if line.startswith(prefix)]
+        return lines[0][len(prefix) :] if lines else "0"
+
+    before = float(thoughts())
+    corrector = GeminiCorrector(request=request)
+
+    assert corrector.correct(text) == "PythonでJSONをパースする"
+    assert corrector.last_ok
+    assert sent[0].thinking_budget == 200
+    assert sent[0].max_output_tokens == output_tokens + 200
+    assert float(thoughts()) == before + 200
+
+
+def test_thinking_is_off_by_default(gemini_config: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    """gemini-2.5 系でも既定では思考させず、出力の上限をそのまま送るか"""
+    snap = config.snapshot.model_copy(
+        update={"gemini_models": [GeminiModel(name="gemini-2.5-flash")]}
+    )
+    monkeypatch.setattr(config, "_snapshot", snap)
+    sent: List[GeminiRequest] = []
+
+    def request(req: GeminiRequest) -> Any:
+        sent.append(req)
+        return _response("Python", thoughts_token_count=0)
+
+    GeminiCorrector(request=request).correct("ぱいそん")
+    assert sent[0].thinking_budget == 0
+    assert sent[0].max_output_tokens == output_token_budget("ぱいそん", 1.5, 4096)
+
+
+def test_token_usage_is_measured(gemini_config: None) -> None:
+    """送ったトークン数と受け取ったトークン数をモデルごとに記録するか"""
+
+    def request(req: GeminiRequest) -> Any:
+        return _response("Python", prompt_token_count=40, candidates_token_count=3)
+
+    def count(kind: str) -> str:
+        prefix = f'stt_gemini_tokens_count{{kind="{kind}",model="budget-test"}} '
+        lines = [line for line in metrics.render().splitlines() if line.startswith(prefix)]
+        return lines[0][len(prefix) :] if lines else "0"
+
+    before = {kind: int(count(kind)) for kind in ("prompt", "output")}
+    GeminiCorrector(request=request).correct("ぱいそん")
+
+    assert int(count("prompt")) == before["prompt"] + 1
+    assert int(count("output")) == before["output"] + 1
+    assert 'stt_gemini_tokens_sum{kind="thoughts",model="budget-test"}' not in metrics.render()
+
+
+def test_last_ok_only_for_complete_responses(
+    gemini_config: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """完全な応答のときだけ last_ok が立ち、元のテキストを返したときは立たないか"""
+    responses: List[Any] = [
+        _response("Python"),
+        _response("Pythonで", finish_reason="MAX_TOKENS"),
+        RuntimeError("503"),
+        _response(""),
+    ]
+
+    def request(req: GeminiRequest) -> Any:
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    corrector = GeminiCorrector(request=request)
+    results = []
+    for _ in range(4):
+        corrector.correct("ぱいそんで")
+        results.append(corrector.last_ok)
+    assert results == [True, False, False, False]
+
+    # APIキーがなければ呼ばずに元のテキストを返す
+    monkeypatch.setattr(
+        config, "_snapshot", config.snapshot.model_copy(update={"gemini_api_key": ""})
+    )
+    assert corrector.correct("ぱいそん") == "ぱいそん"
+    assert not corrector.last_ok
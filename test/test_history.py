@@ -0,0 +1,110 @@
+"""発話履歴ストアのテスト"""
+
+from pathlib import Path
+
+import numpy as np
+
+from app.history import UtteranceHistory
+from app.pipeline import PipelineResult
+
+
+def _result(i: int, raw: str, corrected: str) -> PipelineResult:
+    return PipelineResult(
+        raw_text=raw,
+        corrected_text=corrected,
+        replaced_text=corrected,
+        audio_seconds=1.0,
+        stt_ms=100.0 + i,
+        gemini_ms=200.0,
+        created_at=1_700_000_000.0 + i,
+    )
+
+
+def test_record_and_page(tmp_path: Path) -> None:
+    """非同期に書き込んだ発話をキーセットページングで辿れるか"""
+    history = UtteranceHistory(tmp_path / "history.sqlite3")
+    for i in range(250):
+        history.record(_result(i, f"はつわ{i}", f"発話{i}"))
+    history.flush()
+
+    first = history.page(limit=100)
+    assert [e.raw_text for e in first[:2]] == ["はつわ249", "はつわ248"]
+    assert first[0].stt_ms == 349.0
+
+    ids = [e.id for e in first]
+    before = first[-1].id
+    while True:
+        page = history.page(before_id=before, limit=100)
+        if not page:
+            break
+        ids.extend(e.id for e in page)
+        before = page[-1].id
+    assert len(ids) == 250 == len(set(ids))
+    history.close()
+
+
+def test_full_text_search(tmp_path: Path) -> None:
+    """生テキスト・補正後テキストの全文検索"""
+    history = UtteranceHistory(tmp_path / "history.sqlite3")
+    history.record(_result(0, "ぱいそんでじぇそんをぱーすする", "PythonでJSONをパースする"))
+    history.record(_result(1, "どっかーこんてなをきどうする", "Dockerコンテナを起動する"))
+    history.record(_result(2, "きょうはいいてんき", "今日はいい天気"))
+    history.flush()
+
+    assert [e.raw_text for e in history.page(query="ぱいそん")] == [
+        "ぱいそんでじぇそんをぱーすする"
+    ]
+    assert [e.corrected_text for e in history.page(query="Docker")] == ["Dockerコンテナを起動する"]
+    # trigram で扱えない短い語も部分一致で探せる
+    assert [e.corrected_text for e in history.page(query="天気")] == ["今日はいい天気"]
+    assert history.page(query="存在しない語") == []
+    history.close()
+
+
+def test_store_compressed_audio(tmp_path: Path, monkeypatch) -> None:
+    """設定が有効なら圧縮した音声を保存する"""
+    from app.config import config
+
+    monkeypatch.setattr(
+        config, "_snapshot", config.snapshot.model_copy(update={"history_store_audio": True})
+    )
+    history = UtteranceHistory(tmp_path / "history.sqlite3")
+    history.record(_result(0, "a", "a"), np.zeros(16000, dtype=np.float32))
+    history.flush()
+
+    entry = history.page()[0]
+    assert entry.audio_path is not None
+    assert (tmp_path / "history_audio" / entry.audio_path).exists()
+    history.close()
+
+
+def test_skipped_stages_and_old_schema(tmp_path: Path) -> None:
+    """省略した段を保存し、列のない古い履歴ファイルにも列を足して書き込めるか"""
+    import sqlite3
+
+    path = tmp_path / "history.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE utterances (id INTEGER PRIMARY KEY, created_at REAL NOT NULL, "
+        "raw_text TEXT NOT NULL, corrected_text TEXT NOT NULL, replaced_text TEXT NOT NULL, "
+        "audio_seconds REAL NOT NULL, stt_ms REAL NOT NULL, gemini_ms REAL NOT NULL, "
+        "replace_ms REAL NOT NULL, type_ms REAL NOT NULL, audio_path TEXT, "
+        "audio_sample_rate INTEGER)"
+    )
+    conn.execute(
+        "INSERT INTO utterances VALUES (1, 0, 'ふるい', '古い', '古い', 1, 1, 1, 1, 1, NULL, NULL)"
+    )
+    conn.commit()
+    conn.close()
+
+    history = UtteranceHistory(path)
+    result = _result(1, "あたらしい", "あたらしい")
+    result.skipped = "gemini:slo"
+    history.record(result)
+    history.flush()
+
+    assert [(e.raw_text, e.skipped) for e in history.page()] == [
+        ("あたらしい", "gemini:slo"),
+        ("ふるい", ""),
+    ]
+    history.close()
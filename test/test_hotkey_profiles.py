@@ -0,0 +1,65 @@
+"""ホットキーごとの設定（Gemini補正の有無・言語・入力方法）のテスト"""
+
+import random
+import time
+from typing import Any, Callable, List
+
+import pytest
+
+from app.config import HotkeyProfile
+from app.engine import VoiceInputEngine, split_utf16_chunks
+from test.conftest import StandInCorrector, StandInTranscriber
+
+FULL = HotkeyProfile(hotkey="cmd_r", name="文章")
+FAST = HotkeyProfile(hotkey="alt_r", name="コマンド", gemini=False, language="en")
+
+
+@pytest.fixture
+def two_hotkeys(quiet_config: Callable[..., Any]) -> None:
+    quiet_config(min_duration=0.05, hotkey_profiles=[FULL, FAST])
+
+
+def _utterance(engine: VoiceInputEngine, press: HotkeyProfile, *others: HotkeyProfile) -> None:
+    engine.on_hotkey_press(press)
+    time.sleep(0.1)
+    # 録音中に別のホットキーを押して離しても、録音は続く
+    for other in others:
+        engine.on_hotkey_press(other)
+        engine.on_hotkey_release(other)
+        assert engine.is_recording
+    engine.on_hotkey_release(press)
+    while engine.pending:
+        time.sleep(0.01)
+
+
+def test_each_hotkey_uses_its_own_pipeline_options(
+    two_hotkeys: None,
+    make_engine: Callable[..., VoiceInputEngine],
+    ticking_streams: Callable[..., Any],
+) -> None:
+    """右 Option は Gemini補正を飛ばして英語で、右 Command は補正ありで処理されるか"""
+    transcriber = StandInTranscriber("ls -la")
+    corrector = StandInCorrector(lambda text: f"{text}（補正）")
+    typed: List[str] = []
+    engine = make_engine(transcriber, corrector, stream_factory=ticking_streams, typer=typed.append)
+
+    _utterance(engine, FAST, FULL)
+    _utterance(engine, FULL)
+
+    assert typed == ["ls -la", "ls -la（補正）"]
+    assert corrector.calls == 1
+    assert transcriber.languages == ["en", ""]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_utf16_chunks_keep_text_and_surrogates(seed: int) -> None:
+    """塊をつなぐと元の文字列に戻り、どの塊も20単位以下でサロゲートペアを分けないか"""
+    rng = random.Random(seed)
+    text = "".join(rng.choices("aあ漢😀👍🏻\n", k=rng.randint(0, 80)))
+
+    chunks = split_utf16_chunks(text)
+
+    assert "".join(chunks) == text
+    for chunk in chunks:
+        units = len(chunk.encode("utf-16-le")) // 2
+        assert 0 < units <= 20
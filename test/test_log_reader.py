@@ -0,0 +1,67 @@
+"""ログリーダー（末尾読み・遡り・追従・検索）のテスト"""
+
+from pathlib import Path
+
+from app import log_reader
+from app.log_reader import LogTailReader
+
+
+def _write_lines(path: Path, lines: list[str], mode: str = "w") -> None:
+    with open(path, mode, encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+
+
+def test_tail_and_page_backward(tmp_path: Path, monkeypatch) -> None:
+    """末尾 N 行の読み込みと遡りページングで全行を欠落なく辿れるか"""
+    monkeypatch.setattr(log_reader, "_READ_BLOCK", 64)
+    path = tmp_path / "voice_input.log"
+    lines = [f"{i:05d} [STT] こんにちは" for i in range(1000)]
+    _write_lines(path, lines)
+
+    reader = LogTailReader(path)
+    collected = reader.tail(100)
+    assert collected == lines[-100:]
+    while not reader.at_beginning:
+        collected = reader.older(137) + collected
+    assert collected == lines
+
+
+def test_follow_appended_lines(tmp_path: Path) -> None:
+    """追記された完全な行だけを追従して読むか"""
+    path = tmp_path / "voice_input.log"
+    _write_lines(path, ["a", "b"])
+    reader = LogTailReader(path)
+    assert reader.tail(10) == ["a", "b"]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("c\nd-partial")
+    assert reader.follow() == (["c"], False)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert reader.follow() == (["d-partial"], False)
+    assert reader.follow() == ([], False)
+
+
+def test_follow_detects_truncation(tmp_path: Path) -> None:
+    """クリア（削除）や切り詰めを検知するか"""
+    path = tmp_path / "voice_input.log"
+    _write_lines(path, ["a", "b"])
+    reader = LogTailReader(path)
+    reader.tail(10)
+    path.unlink()
+    assert reader.follow() == ([], True)
+    _write_lines(path, ["new"])
+    assert reader.follow() == (["new"], False)
+
+
+def test_search_returns_line_numbers(tmp_path: Path, monkeypatch) -> None:
+    """全体検索が行番号付きで新しい順に返るか"""
+    monkeypatch.setattr(log_reader, "_INDEX_BLOCK", 128)
+    path = tmp_path / "voice_input.log"
+    lines = [f"line {i}" + (" [Gemini補正] Python" if i % 100 == 0 else "") for i in range(1000)]
+    _write_lines(path, lines)
+
+    results = LogTailReader(path).search("Python", limit=3)
+    assert results == [(901, lines[900]), (801, lines[800]), (701, lines[700])]
+    assert LogTailReader(path).search("存在しない") == []
@@ -0,0 +1,48 @@
+"""非同期ログハンドラのテスト"""
+
+import logging
+import queue
+from pathlib import Path
+
+import pytest
+
+from app import logging_setup
+from app.config import config
+from app.engine import VoiceInputEngine
+from app.logging_setup import DroppingQueueHandler
+
+
+def test_full_queue_drops_without_blocking() -> None:
+    """キューが満杯のときは待たずに破棄して件数を数えるか"""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue)
+    logger = logging.getLogger("test_dropping_queue_handler")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(5):
+            logger.warning(f"Audio: input overflow {i}")
+    finally:
+        logger.removeHandler(handler)
+
+    assert log_queue.qsize() == 2
+    assert handler.dropped == 3
+    assert log_queue.get_nowait().getMessage() == "Audio: input overflow 0"
+
+
+def test_engine_does_not_open_log_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """エンジンを作ってもログファイルは開かない（ログの設定はアプリの起動時だけ）"""
+    monkeypatch.setattr(logging_setup, "LOG_DIR", tmp_path / "logs")
+    monkeypatch.setattr(logging_setup, "LOG_FILE", tmp_path / "logs" / "voice_input.log")
+    monkeypatch.setattr(
+        config,
+        "_snapshot",
+        config.snapshot.model_copy(update={"sound_enabled": False, "history_enabled": False}),
+    )
+    handlers = list(logging.getLogger("voice_input").handlers)
+
+    engine = VoiceInputEngine(None, None, pipeline=object(), typer=lambda _text: None)
+    engine.close()
+
+    assert logging.getLogger("voice_input").handlers == handlers
+    assert not (tmp_path / "logs").exists()
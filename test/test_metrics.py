@@ -0,0 +1,55 @@
+"""メトリクスのテスト"""
+
+import urllib.error
+import urllib.request
+
+from app.metrics import MetricsRegistry
+from app.metrics_server import MetricsServer
+
+
+def test_render_counters_histograms_and_gauges() -> None:
+    """カウンタ・ヒストグラム・ゲージを Prometheus テキスト形式で出力するか"""
+    registry = MetricsRegistry()
+    registry.describe("stt_utterances_total", "counter", "Transcribed utterances")
+    registry.inc("stt_utterances_total")
+    registry.inc("stt_utterances_total")
+    registry.inc("stt_errors_total", kind="request")
+    registry.observe("stt_latency_ms", 30, buckets=(10, 50))
+    registry.observe("stt_latency_ms", 70, buckets=(10, 50))
+    registry.gauge("stt_queue_depth", lambda: 3)
+
+    text = registry.render()
+
+    assert "# HELP stt_utterances_total Transcribed utterances" in text
+    assert "# TYPE stt_utterances_total counter" in text
+    assert "stt_utterances_total 2\n" in text
+    assert 'stt_errors_total{kind="request"} 1\n' in text
+    assert "# TYPE stt_latency_ms histogram" in text
+    assert 'stt_latency_ms_bucket{le="10"} 0\n' in text
+    assert 'stt_latency_ms_bucket{le="50"} 1\n' in text
+    assert 'stt_latency_ms_bucket{le="+Inf"} 2\n' in text
+    assert "stt_latency_ms_sum 100\n" in text
+    assert "stt_latency_ms_count 2\n" in text
+    assert "# TYPE stt_queue_depth gauge" in text
+    assert "stt_queue_depth 3\n" in text
+
+
+def test_server_serves_metrics_on_localhost() -> None:
+    """/metrics で現在の値を返し、それ以外のパスは 404 になるか"""
+    registry = MetricsRegistry()
+    registry.inc("stt_utterances_total", 5)
+    server = MetricsServer(0, registry)
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "stt_utterances_total 5" in response.read().decode("utf-8")
+        try:
+            urllib.request.urlopen(f"{url}/", timeout=5)
+            raise AssertionError("expected 404")
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.stop()
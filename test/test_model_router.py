@@ -0,0 +1,186 @@
+"""Gemini モデルの振り分けのテスト"""
+
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from app.config import GeminiModel, config
+from app.gemini import GeminiCorrector, GeminiRequest
+from app.model_router import ModelRouter
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+PRO = GeminiModel(name="pro", tier=0)
+FLASH = GeminiModel(name="flash", tier=0)
+LITE = GeminiModel(name="lite", tier=1)
+
+
+def test_measures_each_model_then_uses_fastest() -> None:
+    """未計測のモデルを優先順に1回ずつ試し、その後は最も速いモデルを使うか"""
+    clock = _Clock()
+    router = ModelRouter(clock=clock)
+    models = [PRO, FLASH, LITE]
+
+    first = router.choose(models)
+    assert (first.model, first.reason) == ("pro", "unmeasured")
+    # 応答が返る前の次のリクエストは、測っている途中のモデルではなく次の未計測のモデルへ
+    second = router.choose(models)
+    assert (second.model, second.reason) == ("flash", "unmeasured")
+    router.record("pro", 900.0, ok=True)
+    router.record("flash", 300.0, ok=True)
+
+    for _ in range(5):
+        clock.now += 1
+        route = router.choose(models)
+        assert (route.model, route.reason, route.estimate_ms) == ("flash", "fastest", 300.0)
+        router.record("flash", 300.0, ok=True)
+    # tier 0 が使える間は tier 1 を試さない
+    assert router.stats("lite").samples == 0
+
+
+def test_probes_stale_models() -> None:
+    """しばらく使っていないモデルに1リクエストだけ振り分けて測り直すか"""
+    clock = _Clock()
+    router = ModelRouter(clock=clock)
+    models = [PRO, FLASH]
+    for model, ms in (("pro", 900.0), ("flash", 300.0)):
+        router.choose(models)
+        router.record(model, ms, ok=True)
+
+    clock.now += 61
+    probe = router.choose(models)
+    assert (probe.model, probe.reason) == ("pro", "probe")
+    # プローブ中は他のリクエストを速いモデルへ
+    assert router.choose(models).model == "flash"
+    router.record("pro", 100.0, ok=True)
+    assert router.stats("pro").ewma_ms == pytest.approx(660.0)
+    assert router.choose(models).model == "flash"
+    # 次のプローブまでは pro に振り分けない
+    clock.now += 59
+    assert router.choose(models).reason == "fastest"
+
+
+def test_unhealthy_models_are_skipped_then_retried() -> None:
+    """続けて失敗したモデルはしばらく使わず、同じ tier になければ次の tier を使うか"""
+    clock = _Clock()
+    router = ModelRouter(clock=clock)
+    models = [FLASH, LITE]
+    router.choose(models)
+    router.record("flash", 200.0, ok=True)
+
+    for _ in range(3):
+        assert router.choose(models).model == "flash"
+        router.record("flash", 5000.0, ok=False)
+    route = router.choose(models)
+    assert (route.model, route.reason) == ("lite", "unmeasured")
+    router.record("lite", 400.0, ok=True)
+    assert router.stats("flash").ewma_ms == 200.0  # 失敗は応答時間に含めない
+
+    # すべて使えなくても、最も早く使えるようになるモデルに送る
+    for _ in range(3):
+        router.record("lite", 5000.0, ok=False)
+    clock.now += 1
+    assert (router.choose(models).model, router.choose(models).reason) == ("flash", "fallback")
+
+    clock.now += 30
+    assert router.choose(models).model == "flash"
+    router.record("flash", 250.0, ok=True)
+    assert router.stats("flash").failures == 0
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_routes_mostly_to_fastest_healthy_model(seed: int) -> None:
+    """応答時間が揺れても、ほとんどのリクエストが最も速い最上位 tier のモデルに届くか"""
+    rng = random.Random(seed)
+    clock = _Clock()
+    router = ModelRouter(clock=clock)
+    models = [GeminiModel(name=f"m{i}", tier=rng.randint(0, 1)) for i in range(4)]
+    top = min(m.tier for m in models)
+    means = {m.name: rng.uniform(100, 2000) for m in models}
+    fastest = min((m for m in models if m.tier == top), key=lambda m: means[m.name]).name
+
+    chosen: Counter = Counter()
+    for _ in range(600):
+        clock.now += 1
+        route = router.choose(models)
+        chosen[route.model] += 1
+        assert route.tier == top
+        router.record(route.model, means[route.model] * rng.uniform(0.8, 1.2), ok=True)
+
+    assert chosen[fastest] >= 0.9 * 600
+
+
+class _StandInResponse:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+def _stand_in(latency_ms: Dict[str, Callable[[int], float]]) -> Callable[[GeminiRequest], Any]:
+    """モデルごとに応答時間の異なる、API の代わりのエンドポイント"""
+    calls: Counter = Counter()
+
+    def request(req: GeminiRequest) -> Any:
+        calls[req.model] += 1
+        time.sleep(latency_ms[req.model](calls[req.model]) / 1000)
+        return _StandInResponse(f"{req.model}:{req.contents}")
+
+    return request
+
+
+def test_corrector_follows_changing_latency(monkeypatch: pytest.MonkeyPatch) -> None:
+    """速いモデルが遅くなったらもう一方に切り替え、プローブで速さが戻ったことに気づくか"""
+    monkeypatch.setattr(
+        config,
+        "_snapshot",
+        config.snapshot.model_copy(
+            update={
+                "gemini_api_key": "test",
+                "gemini_models": [PRO, FLASH],
+                "gemini_prompt": "{text}",
+            }
+        ),
+    )
+    clock = _Clock()
+    # flash は 6〜8回目だけ pro より遅い
+    request = _stand_in({"pro": lambda n: 20, "flash": lambda n: 60 if 6 <= n <= 8 else 2})
+    corrector = GeminiCorrector(request=request, router=ModelRouter(clock=clock))
+
+    used: List[str] = []
+    for _ in range(40):
+        clock.now += 10
+        assert corrector.correct("てすと").endswith(":てすと")
+        route = corrector.last_route
+        assert route is not None
+        used.append(f"{route.model}:{route.reason}")
+
+    assert used[:2] == ["pro:unmeasured", "flash:unmeasured"]
+    assert "pro:fastest" in used
+    assert used.count("flash:probe") >= 2
+    # 最後はプローブ以外すべて flash に戻っている
+    assert {u for u in used[-6:] if not u.endswith(":probe")} == {"flash:fastest"}
+
+
+def test_corrector_records_failures(monkeypatch: pytest.MonkeyPatch) -> None:
+    """API エラーは元のテキストを返し、そのモデルの失敗として数えるか"""
+    monkeypatch.setattr(
+        config,
+        "_snapshot",
+        config.snapshot.model_copy(update={"gemini_api_key": "test", "gemini_models": [FLASH]}),
+    )
+
+    def failing(req: GeminiRequest) -> Any:
+        raise TimeoutError("timeout")
+
+    corrector = GeminiCorrector(request=failing)
+    assert corrector.correct("てすと") == "てすと"
+    assert corrector.router.stats("flash").failures == 1
@@ -0,0 +1,211 @@
+"""ワーカープロセスのパイプラインのテスト"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+import app.settings as settings_module
+from app.pipeline import DEFAULT_OPTIONS, PipelineOptions, PipelineResult, StageCallback
+from app.pipeline_worker import WorkerPipeline
+from app.settings import CHANGE_CONFIG, CHANGE_REPLACEMENT, SettingsWindow
+
+
+class _EchoPipeline:
+    """音声の長さと合計を文字列にして返す（共有メモリの中身が届いているかの確認用）"""
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        if len(audio) == 0:
+            raise ValueError("empty")
+        text = f"{len(audio)}:{float(audio.sum()):.2f}"
+        if on_stage:
+            on_stage("stt", text)
+        return PipelineResult(raw_text=text, corrected_text=text, replaced_text=text)
+
+
+class _HeavyPipeline:
+    """GIL を長く握る処理（大きな JSON のパース）をする"""
+
+    def __init__(self) -> None:
+        self._payload = json.dumps([{"id": i, "text": "x" * 20} for i in range(200000)])
+
+    def process(
+        self,
+        audio: Any,
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        for _ in range(3):
+            json.loads(self._payload)
+        return PipelineResult(replaced_text="done")
+
+
+# ワーカープロセスの中で読み直した変更種別（ワーカー側のインメモリ状態の代わり）
+_reloaded: List[str] = []
+
+
+def _record_reload(change: str) -> None:
+    _reloaded.append(change)
+
+
+class _ReloadPipeline:
+    """それまでにワーカーが読み直した変更種別を返す"""
+
+    def process(
+        self,
+        audio: Any,
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        return PipelineResult(replaced_text=",".join(_reloaded))
+
+
+class _LoggingPipeline:
+    """処理のたびに "voice_input" ロガーへ INFO を出す"""
+
+    def __init__(self) -> None:
+        logging.getLogger("voice_input").info("[テスト] パイプラインを初期化しました")
+
+    def process(
+        self,
+        audio: Any,
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        logging.getLogger("voice_input").info(f"[STT] {len(audio)} samples")
+        return PipelineResult(replaced_text="ok")
+
+
+def _logging_pipeline() -> _LoggingPipeline:
+    return _LoggingPipeline()
+
+
+def _reload_pipeline() -> _ReloadPipeline:
+    return _ReloadPipeline()
+
+
+def _echo_pipeline() -> _EchoPipeline:
+    return _EchoPipeline()
+
+
+def _heavy_pipeline() -> _HeavyPipeline:
+    return _HeavyPipeline()
+
+
+@pytest.fixture
+def echo_worker():
+    pipeline = WorkerPipeline(_echo_pipeline)
+    yield pipeline
+    pipeline.close()
+
+
+def test_results_round_trip(echo_worker: WorkerPipeline) -> None:
+    """共有メモリで渡した音声をワーカーが読み、結果と途中結果がパイプで返るか"""
+    audio = np.full(48000, 0.25, dtype=np.float32)
+    stages: List[tuple] = []
+
+    result = echo_worker.process(audio, on_stage=lambda stage, text: stages.append((stage, text)))
+
+    assert result.text == "48000:12000.00"
+    assert stages == [("stt", "48000:12000.00")]
+    with pytest.raises(RuntimeError, match="empty"):
+        echo_worker.process(np.empty(0, dtype=np.float32))
+
+
+def test_concurrent_requests_get_their_own_results(echo_worker: WorkerPipeline) -> None:
+    """同時に投げた発話がそれぞれ自分の結果を受け取るか（セグメントは使い回す）"""
+    sizes = [1000 * (i + 1) for i in range(16)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        texts = list(
+            executor.map(lambda n: echo_worker.process(np.ones(n, dtype=np.float32)).text, sizes)
+        )
+
+    assert texts == [f"{n}:{n:.2f}" for n in sizes]
+
+
+def _max_callback_lateness_ms(pipeline: Any) -> float:
+    """5ms ごとに起きる録音コールバック相当のスレッドの遅れの最大値を、処理中に測る"""
+    lateness: List[float] = []
+    done = threading.Event()
+
+    def callback_loop() -> None:
+        interval = 0.005
+        next_at = time.perf_counter() + interval
+        while not done.is_set():
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            lateness.append((time.perf_counter() - next_at) * 1000)
+            next_at += interval
+
+    thread = threading.Thread(target=callback_loop)
+    thread.start()
+    try:
+        for _ in range(2):
+            pipeline.process(np.zeros(16000, dtype=np.float32))
+    finally:
+        done.set()
+        thread.join()
+    return max(lateness)
+
+
+def test_callback_timing_is_steady_with_worker() -> None:
+    """重い処理をワーカーで実行すると、同じプロセス内で実行するより録音コールバックが遅れないか"""
+    in_process = _max_callback_lateness_ms(_HeavyPipeline())
+
+    worker = WorkerPipeline(_heavy_pipeline)
+    worker.start()
+    try:
+        with_worker = _max_callback_lateness_ms(worker)
+    finally:
+        worker.close()
+
+    assert in_process > 50
+    assert with_worker < 20
+
+
+def test_settings_changes_reach_the_worker(monkeypatch: pytest.MonkeyPatch) -> None:
+    """設定ウィンドウからの変更通知がワーカーに届き、その後の発話から反映されるか"""
+    applied: List[str] = []
+    monkeypatch.setattr(settings_module, "apply_change", applied.append)
+    worker = WorkerPipeline(_reload_pipeline, on_reload=_record_reload)
+    window = SettingsWindow()
+    window.add_change_listener(worker.reload)
+    # 起動前の変更は送らない（起動時に最新の設定を読み込む）
+    window._handle_message(("changed", CHANGE_CONFIG))
+    try:
+        audio = np.zeros(160, dtype=np.float32)
+        assert worker.process(audio).text == ""
+
+        window._handle_message(("changed", CHANGE_REPLACEMENT))
+        window._handle_message(("changed", CHANGE_CONFIG))
+        assert worker.process(audio).text == f"{CHANGE_REPLACEMENT},{CHANGE_CONFIG}"
+    finally:
+        worker.close()
+
+    # このプロセスにも反映してからワーカーへ送る
+    assert applied == [CHANGE_CONFIG, CHANGE_REPLACEMENT, CHANGE_CONFIG]
+
+
+def test_worker_logs_reach_the_parent_logger(caplog: pytest.LogCaptureFixture) -> None:
+    """ワーカーの INFO ログが親プロセスの "voice_input" ロガー（ログファイル）まで届くか"""
+    caplog.set_level(logging.INFO, logger="voice_input")
+    worker = WorkerPipeline(_logging_pipeline)
+    try:
+        assert worker.process(np.zeros(160, dtype=np.float32)).text == "ok"
+    finally:
+        # 止める前にワーカーが送ったログを流し終える
+        worker.close()
+
+    messages = [r.getMessage() for r in caplog.records if r.processName != "MainProcess"]
+    assert "[テスト] パイプラインを初期化しました" in messages
+    assert "[STT] 160 samples" in messages
@@ -0,0 +1,149 @@
+"""発話ごとのプロファイラのテスト"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+import pytest
+
+import app.profiler as profiler_module
+from app.profiler import ProfileSession, SamplingProfiler
+
+
+def _busy_transcribe(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_profile_contains_hot_function(tmp_path: Path) -> None:
+    """採取対象スレッドの関数がラベル付きの folded 形式で書き出されるか"""
+    profiler = SamplingProfiler(tmp_path, interval_ms=1)
+    session = profiler.begin()
+
+    def worker() -> None:
+        session.watch_current_thread("transcribe")
+        _busy_transcribe(0.2)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    path = session.end(200)
+
+    assert path is not None and path.suffix == ".folded"
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines
+    assert any(line.startswith("transcribe;") and "_busy_transcribe" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_fast_and_cancelled_utterances_are_not_written(tmp_path: Path) -> None:
+    """しきい値未満の発話と取り消した発話はファイルを残さないか"""
+    profiler = SamplingProfiler(tmp_path, interval_ms=1, min_ms=500)
+    for finish in (lambda s: s.end(100), lambda s: s.cancel()):
+        session = profiler.begin()
+        session.watch_current_thread("transcribe")
+        _busy_transcribe(0.05)
+        finish(session)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_retention_keeps_total_size_bounded(tmp_path: Path) -> None:
+    """合計サイズが上限を超えたら古いファイルから削除されるか"""
+    profiler = SamplingProfiler(tmp_path, max_bytes=3000)
+    for i in range(10):
+        (tmp_path / f"old-{i}.folded").write_text("x" * 1000)
+        time.sleep(0.01)
+    session = profiler.begin()
+    session.watch_current_thread("transcribe")
+    _busy_transcribe(0.05)
+    newest = session.end(50)
+
+    files = list(tmp_path.glob("*.folded"))
+    assert newest in files
+    assert sum(f.stat().st_size for f in files) <= 3000 or len(files) == 1
+    assert not (tmp_path / "old-0.folded").exists()
+
+
+def test_sample_in_flight_is_not_added_after_end(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """スタックを辿っている途中で終わったセッションは、書き出した後に集計が変わらないか"""
+    walking = threading.Event()
+    release = threading.Event()
+    original = profiler_module._frame_label
+
+    def slow_label(code) -> str:
+        walking.set()
+        release.wait()
+        return original(code)
+
+    profiler = SamplingProfiler(tmp_path, interval_ms=1)
+    session = profiler.begin()
+    stop = threading.Event()
+
+    def worker() -> None:
+        session.watch_current_thread("transcribe")
+        stop.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    monkeypatch.setattr(profiler_module, "_frame_label", slow_label)
+    assert walking.wait(5)
+
+    # 採取スレッドがスタックを辿っている間に終える
+    session.counts.clear()
+    session.counts[("transcribe", "earlier")] += 1
+    path = session.end(100)
+    written = dict(session.counts)
+    release.set()
+    stop.set()
+    thread.join()
+    deadline = time.perf_counter() + 5
+    while profiler._sampler is not None and time.perf_counter() < deadline:
+        time.sleep(0.005)
+
+    assert path is not None
+    assert dict(session.counts) == written
+    assert path.read_text(encoding="utf-8") == "transcribe;earlier 1\n"
+
+
+def test_begin_profile_reads_env_and_creates_one_profiler(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, quiet_config: Callable[..., Any]
+) -> None:
+    """STT_PROFILE は import 後の変更も効き、同時に呼ばれてもプロファイラは1つだけ作るか"""
+    quiet_config()
+    created: List[SamplingProfiler] = []
+
+    class _SlowProfiler(SamplingProfiler):
+        def __init__(self) -> None:
+            time.sleep(0.05)
+            super().__init__(tmp_path)
+            created.append(self)
+
+    monkeypatch.setattr(profiler_module, "SamplingProfiler", _SlowProfiler)
+    monkeypatch.setattr(profiler_module, "_profiler", None)
+    monkeypatch.delenv("STT_PROFILE", raising=False)
+    assert profiler_module.begin_profile() is None
+
+    monkeypatch.setenv("STT_PROFILE", "1")
+    barrier = threading.Barrier(8)
+    sessions: List[Optional[ProfileSession]] = []
+
+    def begin() -> None:
+        barrier.wait()
+        sessions.append(profiler_module.begin_profile())
+
+    threads = [threading.Thread(target=begin) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert len(sessions) == 8 and all(session is not None for session in sessions)
+    for session in sessions:
+        assert session is not None
+        session.cancel()
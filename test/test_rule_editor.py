@@ -0,0 +1,165 @@
+"""ワード変換ルールの編集セッション（絞り込み・並べ替え・差分保存）のテスト"""
+
+import random
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from app import word_replacement
+from app.compiled_dictionary import CompiledDictionary
+from app.rule_editor import INPUT_COLUMN, OUTPUT_COLUMN, RuleEditor
+
+Rule = Tuple[str, str]
+
+
+def _random_rules(rng: random.Random, count: int) -> List[Rule]:
+    alphabet = "abcあい漢"
+    return [
+        (
+            "".join(rng.choices(alphabet, k=rng.randint(1, 4))),
+            "".join(rng.choices(alphabet, k=rng.randint(0, 4))),
+        )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_search_matches_naive(seed: int) -> None:
+    """ブロブの直接検索が、入力・出力への部分一致と同じルールを返すか（境界をまたがない）"""
+    rng = random.Random(seed)
+    rules = _random_rules(rng, rng.randint(1, 40))
+    dictionary = CompiledDictionary.from_rules(rules)
+    for _ in range(30):
+        query = "".join(rng.choices("abcあい漢", k=rng.randint(1, 3)))
+        expected = [i for i, (inp, out) in enumerate(rules) if query in inp or query in out]
+        assert dictionary.search(query) == expected, (rules, query)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_editor_matches_list_model(seed: int) -> None:
+    """編集・追加・削除・絞り込み・並べ替えを混ぜても、素朴なリスト実装と同じ表示・変更になるか"""
+    rng = random.Random(seed)
+    base_rules = _random_rules(rng, rng.randint(0, 30))
+    editor = RuleEditor(CompiledDictionary.from_rules(base_rules))
+    # 素朴な実装: ルール ID → ルール（削除したら None）
+    rules: List = list(base_rules)
+    query = ""
+    sort = None
+
+    def matches(i: int) -> bool:
+        return rules[i] is not None and (not query or query in rules[i][0] or query in rules[i][1])
+
+    def sorted_view(ids: List[int]) -> List[int]:
+        if sort is None:
+            return sorted(ids)
+        return sorted(ids, key=lambda i: (rules[i][sort[0]], i), reverse=sort[1])
+
+    def expected_view() -> List[int]:
+        return sorted_view([i for i in range(len(rules)) if matches(i)])
+
+    view = expected_view()
+    for _ in range(60):
+        op = rng.randrange(5)
+        if op == 0 and len(editor):
+            row = rng.randrange(len(editor))
+            column = rng.choice([INPUT_COLUMN, OUTPUT_COLUMN])
+            text = "".join(rng.choices("abcあい漢", k=rng.randint(0, 3)))
+            rule = list(rules[view[row]])
+            rule[column] = text
+            rules[view[row]] = tuple(rule)
+            editor.set_cell(row, column, text)
+        elif op == 1:
+            rules.append(("", ""))
+            editor.append()
+            view.append(len(rules) - 1)
+        elif op == 2 and len(editor):
+            row = rng.randrange(len(editor))
+            count = rng.randint(1, min(3, len(editor) - row))
+            for i in view[row : row + count]:
+                rules[i] = None
+            del view[row : row + count]
+            editor.remove_rows(row, count)
+        elif op == 3:
+            previous, query = query, rng.choice(["", query + rng.choice("abcあ"), "a", "あ", "漢"])
+            editor.set_filter(query)
+            if previous == query:
+                pass
+            elif previous and previous in query:
+                # 条件を狭めたときは表示中の行から絞る（並び順はそのまま）
+                view = [i for i in view if matches(i)]
+            else:
+                view = expected_view()
+        else:
+            sort = rng.choice(
+                [None, (INPUT_COLUMN, False), (INPUT_COLUMN, True), (OUTPUT_COLUMN, False)]
+            )
+            editor.sort(*(sort or (None,)))
+            # 並べ替えは表示中の行だけを並べ直す
+            view = sorted_view(view)
+
+        assert len(editor) == len(view)
+        assert [editor.rule_id(row) for row in range(len(editor))] == view
+        assert [editor.cell(row, 0) for row in range(len(editor))] == [rules[i][0] for i in view]
+
+    # 保存時に入力が空のルールは捨てられる
+    changes = editor.changes()
+    merged = [
+        changes.updates.get(i, rule)
+        for i, rule in enumerate(base_rules)
+        if i not in changes.deletions
+    ] + changes.additions
+    assert [r for r in merged if r[0]] == [r for r in rules if r is not None and r[0]]
+
+
+@pytest.fixture
+def csv_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "word_replacement.csv"
+    monkeypatch.setattr(word_replacement, "_get_csv_path", lambda: path)
+    return path
+
+
+def test_apply_changes_saves_only_edits(csv_path: Path) -> None:
+    """変更した行だけを渡して保存でき、次回起動時に読み込まれるか"""
+    manager = word_replacement.WordReplacementManager()
+    manager.set_rules([("ぱいそん", "Python"), ("じぇそん", "JSON"), ("えっくす", "X")])
+    manager.save_csv()
+
+    editor = RuleEditor(manager.dictionary)
+    editor.set_cell(0, OUTPUT_COLUMN, "パイソン")
+    editor.remove_rows(1, 1)
+    row = editor.append()
+    editor.set_cell(row, INPUT_COLUMN, " らすと ")
+    editor.set_cell(row, OUTPUT_COLUMN, "Rust")
+    editor.append()  # 空のまま（保存しない）
+
+    changes = editor.changes()
+    assert changes.updates == {0: ("ぱいそん", "パイソン")}
+    assert changes.deletions == {1}
+    manager.apply_changes(editor.base, changes)
+
+    expected = [("ぱいそん", "パイソン"), ("えっくす", "X"), ("らすと", "Rust")]
+    assert manager.get_rules() == expected
+    assert word_replacement.WordReplacementManager().get_rules() == expected
+    # 保存前の辞書に対する変更は受け付けない
+    with pytest.raises(ValueError):
+        manager.apply_changes(editor.base, changes)
+
+
+def test_open_and_filter_do_not_scale_with_rules() -> None:
+    """大きな辞書でも、開く・先頭を表示するのは一定時間で、絞り込みも速いか"""
+    rules = [(f"にゅうりょく{i}", f"出力{i}") for i in range(100000)]
+    dictionary = CompiledDictionary.from_rules(rules)
+
+    start = time.perf_counter()
+    editor = RuleEditor(dictionary)
+    cells = [editor.cell(row, 0) for row in range(50)]
+    assert time.perf_counter() - start < 0.01
+    assert len(editor) == 100000
+    assert cells[:2] == ["にゅうりょく0", "にゅうりょく1"]
+
+    start = time.perf_counter()
+    editor.set_filter("99999")
+    assert time.perf_counter() - start < 0.2
+    assert [editor.cell(row, 1) for row in range(len(editor))] == ["出力99999"]
@@ -0,0 +1,167 @@
+"""サービスモードのテスト"""
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from app.pipeline import DEFAULT_OPTIONS, PipelineOptions, PipelineResult, StageCallback
+from app.service import PipelineService
+from app.service_client import RemotePipeline
+
+
+class _SlowPipeline:
+    """上流呼び出しの代わりに待つだけのパイプライン（同時実行数を記録）"""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.options: List[PipelineOptions] = []
+        self._lock = threading.Lock()
+
+    def process(
+        self,
+        audio: npt.NDArray[np.float32],
+        on_stage: Optional[StageCallback] = None,
+        options: PipelineOptions = DEFAULT_OPTIONS,
+    ) -> PipelineResult:
+        with self._lock:
+            self.options.append(options)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            raw = f"{len(audio)} samples"
+            if on_stage:
+                on_stage("stt", raw)
+                on_stage("replace", raw.upper())
+            return PipelineResult(raw_text=raw, corrected_text=raw, replaced_text=raw.upper())
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _serve(pipeline: _SlowPipeline, max_concurrency: int) -> Iterator[PipelineService]:
+    loop = asyncio.new_event_loop()
+    service = PipelineService(pipeline, max_concurrency=max_concurrency)
+    loop.run_until_complete(service.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield service
+    finally:
+        asyncio.run_coroutine_threadsafe(service.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+@pytest.fixture
+def slow_pipeline() -> _SlowPipeline:
+    return _SlowPipeline(delay=0.05)
+
+
+@pytest.fixture
+def service(slow_pipeline: _SlowPipeline) -> Iterator[PipelineService]:
+    yield from _serve(slow_pipeline, max_concurrency=2)
+
+
+def test_transcribe_round_trip(service: PipelineService) -> None:
+    """音声を送ると補正・変換済みの結果が返り、接続を使い回せるか"""
+    client = RemotePipeline(f"http://127.0.0.1:{service.port}")
+    audio = np.zeros(16000, dtype=np.float32)
+
+    for _ in range(3):
+        result = client.process(audio)
+        assert result.raw_text == "16000 samples"
+        assert result.text == "16000 SAMPLES"
+
+
+def test_streaming_partial_results(service: PipelineService) -> None:
+    """stream では段ごとの途中結果が順に届き、最後に結果全体が返るか"""
+    client = RemotePipeline(f"http://127.0.0.1:{service.port}")
+    stages: List[Tuple[str, str]] = []
+
+    result = client.process(np.zeros(800, dtype=np.float32), on_stage=lambda *e: stages.append(e))
+
+    assert stages == [("stt", "800 samples"), ("replace", "800 SAMPLES")]
+    assert result.text == "800 SAMPLES"
+
+
+def test_options_are_forwarded(service: PipelineService, slow_pipeline: _SlowPipeline) -> None:
+    """ホットキーごとの指定（Gemini補正なし・言語）がサービスのパイプラインまで届くか"""
+    client = RemotePipeline(f"http://127.0.0.1:{service.port}")
+    options = PipelineOptions(gemini=False, language="en")
+
+    client.process(np.zeros(800, dtype=np.float32), options=options)
+    client.process(np.zeros(800, dtype=np.float32), on_stage=lambda *e: None, options=options)
+    client.process(np.zeros(800, dtype=np.float32))
+
+    assert slow_pipeline.options == [options, options, DEFAULT_OPTIONS]
+
+
+def test_concurrency_is_limited(service: PipelineService, slow_pipeline: _SlowPipeline) -> None:
+    """同時リクエスト数が上限を超えても、上流の同時実行数は上限以内に収まるか"""
+    client = RemotePipeline(f"http://127.0.0.1:{service.port}")
+    audio = np.zeros(1600, dtype=np.float32)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: client.process(audio), range(8)))
+
+    assert all(r.text == "1600 SAMPLES" for r in results)
+    assert slow_pipeline.max_active == 2
+
+
+def test_longest_recording_is_accepted(service: PipelineService) -> None:
+    """最大録音時間いっぱいの音声まで受け付け、それを超える本文には 413 を返すか"""
+    client = RemotePipeline(f"http://127.0.0.1:{service.port}")
+    audio = np.zeros(16000 * 1800, dtype=np.float32)
+
+    assert client.process(audio).raw_text == f"{len(audio)} samples"
+
+    too_long = service.max_body_bytes + 2
+    request = f"POST /transcribe HTTP/1.1\r\nContent-Length: {too_long}\r\n\r\n".encode()
+    status, body = _raw_request(service.port, request)
+    assert status == 413
+    assert b"too large" in body
+
+
+def _raw_request(port: int, request: bytes) -> Tuple[int, bytes]:
+    """生のリクエストを送り、ステータスコードと本文を返す"""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(request)
+        data = b""
+        while chunk := sock.recv(4096):
+            data += chunk
+            if b"\r\n\r\n" in data:
+                head, _, body = data.partition(b"\r\n\r\n")
+                length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+                if len(body) >= length:
+                    break
+    status = int(data.split(b" ", 2)[1])
+    return status, data.partition(b"\r\n\r\n")[2]
+
+
+@pytest.mark.parametrize(
+    "request_bytes, message",
+    [
+        (b"POST /transcribe HTTP/1.1\r\nContent-Length: abc\r\n\r\n", b"content-length"),
+        (b"POST /transcribe HTTP/1.1\r\nContent-Length: -4\r\n\r\n", b"content-length"),
+        (b"POST /transcribe?rate=0 HTTP/1.1\r\nContent-Length: 2\r\n\r\n\0\0", b"rate"),
+        (b"POST /transcribe?rate=fast HTTP/1.1\r\nContent-Length: 2\r\n\r\n\0\0", b"rate"),
+    ],
+)
+def test_malformed_requests_get_400(
+    service: PipelineService, request_bytes: bytes, message: bytes
+) -> None:
+    """不正な content-length・rate には 400 と理由を返すか"""
+    status, body = _raw_request(service.port, request_bytes)
+    assert status == 400
+    assert message in body
@@ -0,0 +1,110 @@
+"""セッションの記録と再生のテスト"""
+
+import itertools
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+import pytest
+
+from app.engine import VoiceInputEngine
+from app.pipeline import TranscriptionPipeline
+from app.session_recorder import SessionRecorder, load_session
+from app.session_replay import replay
+from test.conftest import StandInCorrector, StandInTranscriber
+
+
+@pytest.fixture
+def quiet(quiet_config: Callable[..., Any]) -> None:
+    quiet_config(min_duration=0.1)
+
+
+def _record_session(
+    path: Path, make_engine: Callable[..., VoiceInputEngine], streams: Callable[..., Any]
+) -> List[str]:
+    typed: List[str] = []
+    recorder = SessionRecorder(path)
+    numbers = itertools.count(1)
+    # 少し待ってから発話の番号を返す STT と、語尾を足す Gemini補正
+    transcriber = StandInTranscriber(lambda _audio: f"発話{next(numbers)}", delay=0.15)
+    corrector = StandInCorrector(lambda text: f"{text}です", delay=0.05)
+    engine = make_engine(
+        # ワード変換は再生と同じもの（ユーザーのルール）を使う
+        pipeline=TranscriptionPipeline(transcriber, corrector),
+        stream_factory=streams,
+        typer=typed.append,
+        recorder=recorder,
+    )
+    # 1発話目の文字起こし中に2発話目を録音し、キーリピートと短すぎる録音も混ぜる
+    engine.on_hotkey_press()
+    time.sleep(0.15)
+    engine.on_hotkey_press()
+    time.sleep(0.15)
+    engine.on_hotkey_release()
+    time.sleep(0.05)
+    engine.on_hotkey_press()
+    time.sleep(0.2)
+    engine.on_hotkey_release()
+    engine.on_hotkey_press()
+    time.sleep(0.02)
+    engine.on_hotkey_release()
+    while engine.pending:
+        time.sleep(0.01)
+    recorder.close()
+    return typed
+
+
+def test_record_then_replay_matches(
+    tmp_path: Path,
+    quiet: None,
+    make_engine: Callable[..., VoiceInputEngine],
+    ticking_streams: Callable[..., Any],
+) -> None:
+    """記録したセッションを2倍速で再生すると、同じテキストが記録どおりの処理時間で入力されるか"""
+    path = tmp_path / "session.jsonl"
+    typed = _record_session(path, make_engine, ticking_streams)
+    assert typed == ["発話1です", "発話2です"]
+
+    session = load_session(path)
+    assert [e["type"] for e in session["events"] if e["type"] != "stream"] == [
+        "press",
+        "press",
+        "release",
+        "press",
+        "release",
+        "press",
+        "release",
+    ]
+    assert len(session["streams"]) == 3
+    assert len(session["upstream"]["stt"]) == 2
+
+    report = replay(path, speed=2.0)
+
+    assert report.typed == typed
+    assert report.failures(tolerance_ms=40) == []
+    for result in report.replayed.values():
+        assert 50 <= result.stt_ms <= 120
+
+
+def test_replay_detects_changed_output(
+    tmp_path: Path,
+    quiet: None,
+    make_engine: Callable[..., VoiceInputEngine],
+    ticking_streams: Callable[..., Any],
+) -> None:
+    """上流の応答が記録と変わったら不一致として報告するか"""
+    path = tmp_path / "session.jsonl"
+    _record_session(path, make_engine, ticking_streams)
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    path.write_text(
+        "".join(
+            line.replace('"発話2です"', '"発話2でした"') if '"type": "gemini"' in line else line
+            for line in lines
+        ),
+        encoding="utf-8",
+    )
+
+    report = replay(path, speed=4.0)
+
+    assert report.typed == ["発話1です", "発話2でした"]
+    assert any("入力テキスト" in problem for problem in report.failures())
@@ -0,0 +1,130 @@
+"""レイテンシ目標（SLO）による Gemini補正の省略のテスト"""
+
+import random
+from typing import Any, Callable, List
+
+import numpy as np
+import pytest
+
+from app.config import config
+from app.engine import VoiceInputEngine
+from app.metrics import metrics
+from app.pipeline import PipelineResult, TranscriptionPipeline
+from app.slo_controller import SloController, percentile
+from test.conftest import FakeClock, StandInCorrector, StandInTranscriber
+
+
+@pytest.fixture
+def slo(monkeypatch: pytest.MonkeyPatch) -> None:
+    snap = config.snapshot.model_copy(
+        update={"slo_target_ms": 1500.0, "slo_recover_ratio": 0.8, "slo_max_queue": 2}
+    )
+    monkeypatch.setattr(config, "_snapshot", snap)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_percentile_is_nearest_rank(seed: int) -> None:
+    """p95 が値のいずれかで、それ以下の値が 95% 以上を占めるか"""
+    rng = random.Random(seed)
+    values = [rng.uniform(0, 3000) for _ in range(rng.randint(1, 200))]
+    p95 = percentile(values, 95)
+    assert p95 in values
+    assert sum(v <= p95 for v in values) >= 0.95 * len(values)
+    assert sum(v < p95 for v in values) < 0.95 * len(values)
+
+
+def test_disabled_by_default() -> None:
+    """目標が 0（既定）なら常に通す"""
+    controller = SloController(clock=FakeClock())
+    for _ in range(10):
+        controller.record(5000.0, {"gemini": 3000.0}, ())
+    assert controller.allow("gemini", queue_depth=10) is None
+
+
+def test_degrade_and_recover_with_hysteresis(slo: None) -> None:
+    """p95 が目標を超えたら省略し、目標の 8 割以下に戻るまで再開しないか"""
+    clock = FakeClock()
+    controller = SloController(clock=clock)
+
+    # 発話が少ないうちは判断しない
+    for _ in range(4):
+        controller.record(2500.0, {"gemini": 1200.0}, ())
+        assert controller.allow("gemini") is None
+    controller.record(2500.0, {"gemini": 1200.0}, ())
+    assert controller.allow("gemini") == "slo"
+    assert controller.degraded
+
+    # 省略した発話は Gemini の分を足して数えるため、1300ms で終わっても回復とみなさない
+    for _ in range(200):
+        clock.now += 1
+        controller.record(1300.0, {}, ("gemini",))
+        assert controller.allow("gemini", queue_depth=2) == "slo"
+    assert controller.p95_ms() == pytest.approx(2500.0)
+
+    # Gemini 自体が速くなったら、30秒ごとのプローブで測り直して再開する
+    probes = 0
+    for _ in range(600):
+        clock.now += 1
+        if controller.allow("gemini", queue_depth=1) is None:
+            if not controller.degraded:
+                break
+            probes += 1
+            controller.record(900.0, {"gemini": 200.0}, ())
+        else:
+            controller.record(700.0, {}, ("gemini",))
+    assert not controller.degraded
+    assert probes > 1
+    assert metrics.counter_value("stt_slo_transitions_total", stage="gemini", state="recovered")
+
+
+def test_does_not_recover_between_target_and_ratio(slo: None) -> None:
+    """p95 が目標以下でも、回復の閾値（目標の 8 割）を超えていれば省略を続けるか"""
+    clock = FakeClock()
+    controller = SloController(clock=clock)
+    for _ in range(5):
+        controller.record(2000.0, {"gemini": 500.0}, ())
+    assert controller.allow("gemini") == "slo"
+    for _ in range(200):
+        clock.now += 1
+        controller.record(800.0, {}, ("gemini",))  # 推定 1300ms（目標以下・閾値 1200ms 超）
+        assert controller.allow("gemini", queue_depth=2) == "slo"
+
+
+def test_queue_depth_skips_immediately(slo: None) -> None:
+    """処理待ちの発話が上限を超えたら、遅延に関係なく省略するか"""
+    controller = SloController(clock=FakeClock())
+    assert controller.allow("gemini", queue_depth=2) is None
+    assert controller.allow("gemini", queue_depth=3) == "queue"
+    assert not controller.degraded
+
+
+class _CapturingPipeline(TranscriptionPipeline):
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.results: List[PipelineResult] = []
+
+    def process(self, *args: Any, **kwargs: Any) -> PipelineResult:
+        result = super().process(*args, **kwargs)
+        self.results.append(result)
+        return result
+
+
+def test_engine_records_skipped_stages(
+    quiet_config: Callable[..., Any], make_engine: Callable[..., VoiceInputEngine]
+) -> None:
+    """目標を超え続けたらエンジンが Gemini補正を飛ばし、発話の記録に省略した段が残るか"""
+    quiet_config(slo_target_ms=50.0, gemini_api_key="test", gemini_model="test")
+    clock = FakeClock()
+    # Gemini補正に 60ms かかる（待たずにエンジンと SLO の時計を進める）
+    corrector = StandInCorrector(lambda _text: "テスト", delay=0.06, clock=clock)
+    pipeline = _CapturingPipeline(StandInTranscriber("てすと"), corrector)
+    engine = make_engine(pipeline=pipeline, clock=clock)
+
+    for _ in range(8):
+        engine._pending = 1
+        engine._transcribe_and_type(np.zeros(1600, dtype=np.float32))
+
+    assert corrector.calls == 5
+    assert [r.skipped for r in pipeline.results] == [""] * 5 + ["gemini:slo"] * 3
+    assert [r.replaced_text for r in pipeline.results[5:]] == ["てすと"] * 3
+    assert metrics.counter_value("stt_stage_skipped_total", stage="gemini", reason="slo") >= 3
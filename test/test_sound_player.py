@@ -0,0 +1,89 @@
+"""効果音プレーヤーのテスト"""
+
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+from app.sound_player import SoundPlayer
+
+
+def _write_wav(path: Path, seconds: float, rate: int) -> None:
+    samples = (np.full(int(seconds * rate), 0.5) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+
+
+def _render(player: SoundPlayer, blocks: int, frames: int = 256) -> np.ndarray:
+    out = []
+    for _ in range(blocks):
+        outdata = np.full((frames, 1), np.nan, dtype=np.float32)
+        player._callback(outdata, frames, None, None)
+        out.append(outdata[:, 0].copy())
+    return np.concatenate(out)
+
+
+def test_cue_is_decoded_once_and_resampled(tmp_path: Path) -> None:
+    """効果音を出力レートに変換してメモリに保持するか"""
+    path = tmp_path / "start.wav"
+    _write_wav(path, 0.1, 22050)
+    player = SoundPlayer(sample_rate=44100)
+
+    assert player.load(str(path))
+    assert len(player._cues[str(path)]) == 4410
+    assert not player.load(str(tmp_path / "missing.wav"))
+
+
+def test_callback_plays_cue_then_silence(tmp_path: Path) -> None:
+    """再生要求を出力コールバックで鳴らし終えたら無音に戻るか"""
+    path = tmp_path / "start.wav"
+    _write_wav(path, 0.01, 44100)  # 441 フレーム
+    player = SoundPlayer(sample_rate=44100)
+    player.load(str(path))
+    player._stream = object()  # 出力デバイスなしでコールバックだけを動かす
+
+    player.play(str(path))
+    out = _render(player, 3)
+
+    assert np.allclose(out[:441], 0.5, atol=1e-3)
+    assert np.all(out[441:] == 0)
+
+
+def test_new_request_replaces_current_cue(tmp_path: Path) -> None:
+    """再生中に次の要求が来たら、新しい効果音を先頭から鳴らすか"""
+    long_path, short_path = tmp_path / "long.wav", tmp_path / "short.wav"
+    _write_wav(long_path, 1.0, 1000)
+    _write_wav(short_path, 0.1, 1000)
+    player = SoundPlayer(sample_rate=1000)
+    player.load(str(long_path))
+    player.load(str(short_path))
+    player._stream = object()
+
+    player.play(str(long_path))
+    _render(player, 1, frames=100)
+    player.play(str(short_path))
+    out = _render(player, 2, frames=100)
+
+    assert np.allclose(out[:100], 0.5, atol=1e-3)
+    assert np.all(out[100:] == 0)
+
+
+def test_play_only_enqueues(tmp_path: Path) -> None:
+    """play() はキューに積むだけで、マイクロ秒オーダーで返るか"""
+    path = tmp_path / "start.wav"
+    _write_wav(path, 0.5, 44100)
+    player = SoundPlayer(sample_rate=44100)
+    player.load(str(path))
+    player._stream = object()
+
+    count = 10000
+    start = time.perf_counter()
+    for _ in range(count):
+        player.play(str(path))
+    per_call = (time.perf_counter() - start) / count
+
+    assert per_call < 50e-6
@@ -0,0 +1,91 @@
+"""起動時 import のバジェットテスト（Linux でも macOS 専用モジュールをスタブ化して実行）"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# メニューバー表示までに読み込まれてはいけない重い依存
+FORBIDDEN_MODULES = {
+    "numpy",
+    "sounddevice",
+    "pynput",
+    "Quartz",
+    "speech_recognition",
+    "PyQt6",
+    "google.genai",
+    "app.engine",
+    "app.google_speech",
+    "app.word_replacement",
+}
+# `import main` + VoiceInputApp() で新たに読み込まれるモジュール数の上限
+MAX_NEW_MODULES = 250
+# コールドスタートの import 時間の上限（秒）
+MAX_IMPORT_SECONDS = 1.0
+
+_PROBE = """
+import json, sys, time, types
+
+rumps = types.ModuleType("rumps")
+
+class MenuItem:
+    def __init__(self, title, callback=None):
+        self.title = title
+        self.state = False
+
+class App:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def run(self):
+        pass
+
+rumps.App = App
+rumps.MenuItem = MenuItem
+sys.modules["rumps"] = rumps
+
+before = set(sys.modules)
+start = time.perf_counter()
+import main
+app = main.VoiceInputApp()
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(set(sys.modules) - before)}))
+"""
+
+
+def _probe(tmp_path: Path) -> dict:
+    """
+    コピーしたアプリで計測する（設定・プロンプトのファイルはアプリからの相対パスに
+    読み書きされるので、作業ツリーの config/ や __generated__ には何も書かない）
+    """
+    for name in ("app", "ui", "assets", "config"):
+        if (ROOT / name).exists():
+            # __pycache__ も更新時刻ごとコピーして、作業ツリーと同じ条件で import する
+            shutil.copytree(ROOT / name, tmp_path / name)
+    shutil.copy2(ROOT / "main.py", tmp_path / "main.py")
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=tmp_path,
+        env={**os.environ, "HOME": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_menubar_import_budget(tmp_path: Path) -> None:
+    """メニューバー表示までの import がバジェット内に収まるか"""
+    probe = _probe(tmp_path)
+    modules = set(probe["modules"])
+
+    loaded = {m for m in FORBIDDEN_MODULES if m in modules}
+    assert not loaded, f"起動時に重いモジュールが読み込まれています: {sorted(loaded)}"
+    assert len(modules) <= MAX_NEW_MODULES, f"import 数がバジェット超過: {len(modules)}"
+    assert probe["elapsed"] <= MAX_IMPORT_SECONDS, (
+        f"import 時間がバジェット超過: {probe['elapsed']:.2f}s"
+    )
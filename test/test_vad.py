@@ -0,0 +1,186 @@
+"""発話区間検出（ハンズフリーモード）のテスト"""
+
+import threading
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+import app.vad as vad_module
+from app.audio_buffer import AudioBuffer
+from app.engine import VoiceInputEngine
+from app.vad import VoiceActivitySegmenter
+from test.conftest import StandInTranscriber
+
+RATE = 16000
+BLOCK = 1600  # 100ms
+
+
+def _tone(seconds: float) -> npt.NDArray[np.float32]:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+
+
+def _silence(seconds: float, noise: float = 0.001) -> npt.NDArray[np.float32]:
+    rng = np.random.default_rng(0)
+    return rng.normal(0, noise, int(seconds * RATE)).astype(np.float32)
+
+
+def _run(signal: npt.NDArray[np.float32], **kwargs) -> List[npt.NDArray[np.float32]]:
+    utterances: List[npt.NDArray[np.float32]] = []
+
+    def on_utterance(buffer: AudioBuffer) -> None:
+        utterances.append(np.array(buffer.view()))
+        buffer.close()
+
+    vad = VoiceActivitySegmenter(RATE, on_utterance, **kwargs)
+    for start in range(0, len(signal), BLOCK):
+        vad.feed(signal[start : start + BLOCK].reshape(-1, 1))
+    vad.flush()
+    return utterances
+
+
+def test_segments_each_utterance() -> None:
+    """無音で区切られた2つの発話を、直前の音声を含めてそれぞれ切り出すか"""
+    signal = np.concatenate([_silence(1), _tone(1.0), _silence(1.5), _tone(2.0), _silence(1.5)])
+
+    utterances = _run(signal, end_silence_ms=700, pre_roll_ms=300)
+
+    assert len(utterances) == 2
+    # 発話 + 直前（最大300ms）+ 終了判定までの無音（700ms）
+    assert 1.7 <= len(utterances[0]) / RATE <= 2.1
+    assert 2.7 <= len(utterances[1]) / RATE <= 3.1
+
+
+def test_silence_and_clicks_are_ignored() -> None:
+    """雑音だけの区間や短いクリック音では発話を開始しないか"""
+    vad_signal = np.concatenate([_silence(3), _tone(0.05), _silence(3)])
+
+    assert _run(vad_signal, start_ms=150) == []
+
+
+def test_silence_is_gated_without_frame_analysis() -> None:
+    """無音ブロックはエネルギーゲートで弾かれ、フレーム解析を行わないか"""
+    vad = VoiceActivitySegmenter(RATE, lambda buffer: buffer.close())
+    signal = _silence(10)
+    for start in range(0, len(signal), BLOCK):
+        vad.feed(signal[start : start + BLOCK])
+
+    assert vad.analyzed_blocks == 0
+    assert vad.gated_blocks == 100
+
+
+def test_max_duration_splits_long_speech() -> None:
+    """最大録音時間に達した発話はそこで確定するか"""
+    utterances = _run(_tone(5.0), max_seconds=2.0)
+
+    assert len(utterances) == 3
+    assert len(utterances[0]) == 2 * RATE
+
+
+def test_flush_emits_speech_in_progress() -> None:
+    """モード終了時に発話中なら、そこまでを1発話として渡すか"""
+    utterances = _run(np.concatenate([_silence(0.5), _tone(1.0)]))
+
+    assert len(utterances) == 1
+    assert len(utterances[0]) / RATE >= 1.0
+
+
+@pytest.fixture
+def stalled_disk(monkeypatch: pytest.MonkeyPatch) -> threading.Event:
+    """一時ファイルへの書き出しを、返したイベントがセットされるまで止める"""
+    gate = threading.Event()
+    original = AudioBuffer._write_block
+
+    def slow_write(self: AudioBuffer, block: npt.NDArray[np.float32]) -> None:
+        gate.wait()
+        original(self, block)
+
+    monkeypatch.setattr(AudioBuffer, "_write_block", slow_write)
+    yield gate
+    gate.set()
+
+
+def test_callback_does_not_wait_for_disk_or_allocate(
+    stalled_disk: threading.Event, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """一時ファイルに書き出した発話でも feed() は待たず、バッファも確保しないか"""
+    in_callback = [False]
+
+    class _CheckedBuffer(AudioBuffer):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            assert not in_callback[0], "録音コールバックの中でバッファを確保した"
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(vad_module, "AudioBuffer", _CheckedBuffer)
+    buffers: List[AudioBuffer] = []
+    vad = VoiceActivitySegmenter(RATE, buffers.append, max_memory_bytes=4096)
+    signal = np.concatenate([_silence(0.5), _tone(2.0), _silence(1.5), _tone(1.0), _silence(1.5)])
+
+    start = time.perf_counter()
+    for offset in range(0, len(signal), BLOCK):
+        count = len(buffers)
+        in_callback[0] = True
+        vad.feed(signal[offset : offset + BLOCK].reshape(-1, 1))
+        in_callback[0] = False
+        if len(buffers) > count:
+            # 受け取った側（エンジンの文字起こしのスレッド）が次のバッファを用意する
+            vad.prepare()
+    assert time.perf_counter() - start < 1.0
+
+    assert len(buffers) == 2 and all(buffer.spilled for buffer in buffers)
+    stalled_disk.set()
+    lengths = [len(buffer.view()) / RATE for buffer in buffers]
+    for buffer in buffers:
+        buffer.close()
+    assert 2.7 <= lengths[0] <= 3.1
+    assert 1.7 <= lengths[1] <= 2.1
+
+
+class _SignalStream:
+    """start() の中で信号全体を 100ms ごとのブロックとして届ける入力ストリーム"""
+
+    def __init__(self, signal: npt.NDArray[np.float32], callback: Callable[..., None]) -> None:
+        self._signal = signal
+        self._callback = callback
+
+    def start(self) -> None:
+        for offset in range(0, len(self._signal), BLOCK):
+            block = self._signal[offset : offset + BLOCK].reshape(-1, 1)
+            self._callback(block, len(block), None, "")
+
+    def stop(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def test_hands_free_reads_utterances_off_the_callback(
+    stalled_disk: threading.Event,
+    quiet_config: Callable[..., Any],
+    make_engine: Callable[..., VoiceInputEngine],
+) -> None:
+    """ハンズフリーの発話は文字起こしのスレッドで読まれ、書き出しが止まっても録音は進むか"""
+    quiet_config(record_max_memory_bytes=4096, vad_silence_ms=700, min_duration=0.3)
+    signal = np.concatenate([_silence(0.5), _tone(2.0), _silence(1.5), _tone(1.0), _silence(1.5)])
+    typed: List[str] = []
+    engine = make_engine(
+        StandInTranscriber(lambda audio: f"{len(audio) / RATE:.1f}"),
+        stream_factory=lambda **kwargs: _SignalStream(signal, kwargs["callback"]),
+        typer=typed.append,
+    )
+
+    start = time.perf_counter()
+    engine.toggle_hands_free()
+    assert time.perf_counter() - start < 1.0
+    assert typed == []
+
+    stalled_disk.set()
+    engine.toggle_hands_free()
+    engine.close()
+    assert len(typed) == 2
+    assert 2.7 <= float(typed[0]) <= 3.1
+    assert 1.7 <= float(typed[1]) <= 2.1
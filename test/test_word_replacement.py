@@ -0,0 +1,223 @@
+"""ワード変換（コンパイル済み辞書）のテスト"""
+
+import gc
+import os
+import random
+import time
+import tracemalloc
+import weakref
+from pathlib import Path
+
+import pytest
+
+from app import word_replacement
+from app.compiled_dictionary import CompiledDictionary, format_csv
+from app.rule_editor import RuleChanges
+from app.word_replacement import IncrementalReplacer
+
+
+def _naive_apply(rules: list[tuple[str, str]], text: str) -> str:
+    """従来実装（str.replace を順番に適用）"""
+    for input_word, output_word in rules:
+        text = text.replace(input_word, output_word)
+    return text
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_apply_matches_sequential_replace(seed: int) -> None:
+    """索引による適用結果が str.replace の逐次適用と一致するか"""
+    rng = random.Random(seed)
+    alphabet = "abcあい漢"
+    rules = [
+        (
+            "".join(rng.choices(alphabet, k=rng.randint(1, 3))),
+            "".join(rng.choices(alphabet, k=rng.randint(0, 3))),
+        )
+        for _ in range(rng.randint(1, 30))
+    ]
+    dictionary = CompiledDictionary.from_rules(rules)
+    for _ in range(50):
+        text = "".join(rng.choices(alphabet, k=rng.randint(0, 20)))
+        assert dictionary.apply(text) == _naive_apply(rules, text)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_matches_apply(seed: int) -> None:
+    """任意に分割して流しても、連結した出力が全文への apply() と一致するか"""
+    rng = random.Random(seed)
+    alphabet = "abcあい漢"
+    rules = [
+        (
+            "".join(rng.choices(alphabet, k=rng.randint(1, 4))),
+            "".join(rng.choices(alphabet, k=rng.randint(0, 3))),
+        )
+        for _ in range(rng.randint(1, 30))
+    ]
+    dictionary = CompiledDictionary.from_rules(rules)
+    for _ in range(50):
+        text = "".join(rng.choices(alphabet, k=rng.randint(0, 30)))
+        cuts = sorted(rng.sample(range(len(text) + 1), k=min(len(text) + 1, rng.randint(0, 6))))
+        chunks = [text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])]
+        replacer = IncrementalReplacer(dictionary)
+        output = "".join(replacer.feed(chunk) for chunk in chunks) + replacer.flush()
+        assert output == dictionary.apply(text), (rules, chunks)
+
+
+def test_incremental_holds_back_only_partial_match() -> None:
+    """ルールの入力の途中までの末尾だけを保留し、それ以外はすぐに返すか"""
+    dictionary = CompiledDictionary.from_rules([("ぱいそん", "Python"), ("じぇそん", "JSON")])
+    replacer = IncrementalReplacer(dictionary)
+
+    assert replacer.feed("これはぱい") == "これは"
+    assert replacer.pending == "ぱい"
+    assert replacer.feed("そんでじ") == "Pythonで"
+    assert replacer.feed("ぇそんを") == "JSONを"
+    assert replacer.pending == ""
+    assert replacer.flush() == ""
+    assert dictionary.has_longer_key_with_prefix("じぇ")
+    assert not dictionary.has_longer_key_with_prefix("じぇそん")
+
+
+def test_programming_terms() -> None:
+    """プログラミング用語の変換"""
+    dictionary = CompiledDictionary.from_rules([("ぱいそん", "Python"), ("じぇそん", "JSON")])
+    assert dictionary.apply("ぱいそんでじぇそんをぱーすする") == "PythonでJSONをぱーすする"
+    assert list(dictionary) == [("ぱいそん", "Python"), ("じぇそん", "JSON")]
+
+
+@pytest.fixture
+def csv_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "word_replacement.csv"
+    monkeypatch.setattr(word_replacement, "_get_csv_path", lambda: path)
+    return path
+
+
+def test_compiled_artifact_rebuilt_only_on_change(csv_path: Path) -> None:
+    """CSV のハッシュが変わったときだけ再コンパイルされるか"""
+    csv_path.write_bytes(format_csv([("ぱいそん", "Python")]))
+    manager = word_replacement.WordReplacementManager()
+    compiled_path = csv_path.with_suffix(".bin")
+    assert manager.apply("ぱいそん") == "Python"
+    inode = compiled_path.stat().st_ino
+
+    # 内容が同じなら（更新時刻が変わっても）再コンパイルしない
+    csv_path.write_bytes(format_csv([("ぱいそん", "Python")]))
+    word_replacement.WordReplacementManager()
+    assert compiled_path.stat().st_ino == inode
+
+    csv_path.write_bytes(format_csv([("ぱいそん", "パイソン")]))
+    manager = word_replacement.WordReplacementManager()
+    assert compiled_path.stat().st_ino != inode
+    assert manager.apply("ぱいそん") == "パイソン"
+
+
+def test_save_csv_roundtrip(csv_path: Path) -> None:
+    """set_rules → save_csv の内容が次回起動時に読み込まれるか"""
+    manager = word_replacement.WordReplacementManager()
+    manager.set_rules([("じぇそん", "JSON"), ("", "無視")])
+    manager.save_csv()
+    assert word_replacement.WordReplacementManager().get_rules() == [("じぇそん", "JSON")]
+
+
+def test_same_content_is_restamped_and_not_hashed_again(
+    csv_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """更新時刻だけ変わった CSV はヘッダを書き直し、次の起動ではハッシュを計算しないか"""
+    csv_path.write_bytes(format_csv([("ぱいそん", "Python")]))
+    word_replacement.WordReplacementManager()
+    compiled_path = csv_path.with_suffix(".bin")
+    inode = compiled_path.stat().st_ino
+
+    hashed: list[Path] = []
+    real_hash_file = word_replacement.hash_file
+
+    def counting_hash_file(path: Path) -> bytes:
+        hashed.append(path)
+        return real_hash_file(path)
+
+    monkeypatch.setattr(word_replacement, "hash_file", counting_hash_file)
+    stat = csv_path.stat()
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    manager = word_replacement.WordReplacementManager()
+    assert len(hashed) == 1
+    assert compiled_path.stat().st_ino == inode
+    assert CompiledDictionary.open(compiled_path).is_fresh_for(csv_path.stat())
+    assert manager.dictionary.is_fresh_for(csv_path.stat())
+
+    word_replacement.WordReplacementManager()
+    manager.reload()
+    assert len(hashed) == 1
+    assert manager.apply("ぱいそん") == "Python"
+
+
+def test_reload_keeps_replaced_dictionary_readable(csv_path: Path) -> None:
+    """読み直しで差し替えた古い辞書は閉じず（使用中でも読める）、参照がなくなれば解放されるか"""
+    csv_path.write_bytes(format_csv([("ぱいそん", "Python")]))
+    manager = word_replacement.WordReplacementManager()
+    held = manager.dictionary
+    held_mm = weakref.ref(held._mm)
+
+    csv_path.write_bytes(format_csv([("ぱいそん", "パイソン")]))
+    manager.reload()
+    # 変換中・編集画面などが持っている辞書はそのまま読める
+    assert held.rule(0) == ("ぱいそん", "Python")
+    assert held.apply("ぱいそん") == "Python"
+    assert manager.apply("ぱいそん") == "パイソン"
+
+    del held
+    gc.collect()
+    assert held_mm() is None
+
+
+def _startup(csv_path: Path) -> tuple[float, int]:
+    """コンパイル済み辞書がある状態での起動時間と、その間に確保したメモリの最大量"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    manager = word_replacement.WordReplacementManager()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert manager.apply("ぱいそん0") == "Python0"
+    return elapsed, peak
+
+
+def test_startup_stays_flat_as_dictionary_grows(csv_path: Path) -> None:
+    """辞書が大きくなっても、起動（mmap するだけ）の時間とメモリが増えないか"""
+    results = []
+    for count in (100, 100_000):
+        csv_path.write_bytes(format_csv([(f"ぱいそん{i}", f"Python{i}") for i in range(count)]))
+        word_replacement.WordReplacementManager()  # コンパイル
+        results.append(min(_startup(csv_path) for _ in range(3)))
+
+    (small_s, small_peak), (large_s, large_peak) = results
+    # 10万件の CSV をパースすれば数十MB・数百ms かかる
+    assert large_peak < 64 * 1024
+    assert large_peak < small_peak + 16 * 1024
+    assert large_s < small_s + 0.02
+
+
+def test_apply_changes_rejects_rules_saved_by_another_process(csv_path: Path) -> None:
+    """別プロセスが保存した後の古い辞書に対する変更は、保存せずにエラーにするか"""
+    csv_path.write_bytes(format_csv([("ぱいそん", "Python")]))
+    helper = word_replacement.WordReplacementManager()
+    engine = word_replacement.WordReplacementManager()
+    base = helper.dictionary
+
+    # メインプロセスが学習した直し方を追加した
+    engine.apply_changes(engine.dictionary, RuleChanges(additions=[("じぇそん", "JSON")]))
+
+    with pytest.raises(ValueError):
+        helper.apply_changes(base, RuleChanges(additions=[("どっかー", "Docker")]))
+    assert word_replacement.WordReplacementManager().get_rules() == [
+        ("ぱいそん", "Python"),
+        ("じぇそん", "JSON"),
+    ]
+
+    helper.reload()
+    helper.apply_changes(helper.dictionary, RuleChanges(additions=[("どっかー", "Docker")]))
+    assert [inp for inp, _ in word_replacement.WordReplacementManager().get_rules()] == [
+        "ぱいそん",
+        "じぇそん",
+        "どっかー",
+    ]
@@ -0,0 +1,104 @@
+"""
+ワード変換ルールのテーブルモデル
+
+QTableWidget のように全セルのアイテムを作らず、表示中のセルだけを RuleEditor から
+その都度引く。件数に関係なくタブを開く時間は一定で、絞り込み・並べ替えは
+RuleEditor の行番号の配列を入れ替えるだけ。
+"""
+
+from typing import Any, List
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from app.compiled_dictionary import CompiledDictionary
+from app.rule_editor import RuleEditor
+
+_HEADERS = ["入力", "出力"]
+
+
+class ReplacementTableModel(QAbstractTableModel):
+    """RuleEditor を表示・編集するモデル"""
+
+    def __init__(self, dictionary: CompiledDictionary) -> None:
+        super().__init__()
+        self.editor = RuleEditor(dictionary)
+
+    def reset(self, dictionary: CompiledDictionary) -> None:
+        """辞書を読み込み直す（編集内容は捨てる）"""
+        self.beginResetModel()
+        query = self.editor.query
+        self.editor = RuleEditor(dictionary)
+        self.editor.set_filter(query)
+        self.endResetModel()
+
+    # ========== QAbstractTableModel ==========
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.editor)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(_HEADERS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.editor.cell(index.row(), index.column())
+        return None
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        self.editor.set_cell(index.row(), index.column(), str(value))
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEditable
+
+    def headerData(
+        self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole
+    ) -> Any:
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return _HEADERS[section]
+        # 表示位置ではなく元のルール番号（並べ替え・絞り込み中でも同じ行は同じ番号）
+        return str(self.editor.rule_id(section) + 1)
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder) -> None:
+        """列見出しのクリックで並べ替える（column が -1 なら適用順に戻す）"""
+        self.beginResetModel()
+        self.editor.sort(None if column < 0 else column, order == Qt.SortOrder.DescendingOrder)
+        self.endResetModel()
+
+    # ========== 編集操作 ==========
+
+    def set_filter(self, query: str) -> None:
+        self.beginResetModel()
+        self.editor.set_filter(query)
+        self.endResetModel()
+
+    def append_row(self) -> int:
+        """空行を末尾に追加し、その行番号を返す"""
+        row = len(self.editor)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.editor.append()
+        self.endInsertRows()
+        return row
+
+    def remove_rows(self, rows: List[int]) -> None:
+        """行を削除する（連続する行はまとめて、下から順に）"""
+        # 下から (先頭, 末尾) の連続区間にまとめる
+        ranges: List[List[int]] = []
+        for row in sorted(set(rows), reverse=True):
+            if ranges and ranges[-1][0] == row + 1:
+                ranges[-1][0] = row
+            else:
+                ranges.append([row, row])
+        for first, last in ranges:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            self.editor.remove_rows(first, last - first + 1)
+            self.endRemoveRows()
@@ -2,20 +2,25 @@
 設定ウィンドウUI（統合版）
 """
 
-from pathlib import Path
+import time
+from typing import Callable, List, Optional
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QTextCursor
 from PyQt6.QtWidgets import (
+    QAbstractItemView,
     QDialog,
     QFrame,
     QHBoxLayout,
     QHeaderView,
     QLabel,
     QLineEdit,
+    QListWidget,
     QMessageBox,
+    QPlainTextEdit,
     QPushButton,
     QScrollArea,
+    QTableView,
     QTableWidget,
     QTableWidgetItem,
     QTabWidget,
@@ -26,17 +31,29 @@ from PyQt6.QtWidgets import (
 
 from app.config import config
 from app.gemini import gemini
+from app.history import get_history
+from app.log_reader import LogTailReader
+from app.logging_setup import LOG_FILE
+from app.settings import CHANGE_CONFIG, CHANGE_REPLACEMENT
 from app.word_replacement import word_replacer
+from ui.replacement_model import ReplacementTableModel
 
-# ログファイルパス
-LOG_FILE = Path.home() / ".sst-python" / "logs" / "voice_input.log"
+# 履歴タブ: 1ページの件数
+HISTORY_PAGE_SIZE = 100
+
+# ログタブ: 初回・遡りで読み込む行数、追従間隔（ミリ秒）、検索結果の上限
+LOG_PAGE_LINES = 500
+LOG_FOLLOW_INTERVAL_MS = 1000
+LOG_SEARCH_LIMIT = 200
 
 
 class SettingsDialog(QDialog):
     """設定ダイアログ（メイン）"""
 
-    def __init__(self) -> None:
+    def __init__(self, notify: Optional[Callable[[str], None]] = None) -> None:
         super().__init__()
+        # 保存時にメインプロセス（エンジン）へ再読み込みを通知する
+        self._notify = notify
         self.setWindowTitle("🎤 音声入力設定")
         self.setMinimumSize(900, 700)
         self._setup_ui()
@@ -62,6 +79,10 @@ class SettingsDialog(QDialog):
         replacement_tab = self._create_replacement_tab()
         self.tabs.addTab(replacement_tab, "🔄 ワード変換")
 
+        # 履歴タブ
+        history_tab = self._create_history_tab()
+        self.tabs.addTab(history_tab, "🕘 履歴")
+
         main_layout.addWidget(self.tabs)
         self.setLayout(main_layout)
 
@@ -140,15 +161,9 @@ class SettingsDialog(QDialog):
 
         # Gemini設定ステータス + 保存ボタン
         gemini_btn_layout = QHBoxLayout()
-        self.gemini_status_label = QLabel(
-            "✅ Gemini補正: 有効"
-            if config.gemini_enabled
-            else "⚠️ Gemini補正: 無効（APIキーを設定してください）"
-        )
+        self.gemini_status_label = QLabel()
         self.gemini_status_label.setFont(QFont("Helvetica", 11))
-        self.gemini_status_label.setStyleSheet(
-            "color: #4CAF50;" if config.gemini_enabled else "color: #FF9800;"
-        )
+        self._show_gemini_status()
         gemini_btn_layout.addWidget(self.gemini_status_label)
         gemini_btn_layout.addStretch()
 
@@ -314,14 +329,42 @@ class SettingsDialog(QDialog):
         line1.setFrameShadow(QFrame.Shadow.Sunken)
         layout.addWidget(line1)
 
-        # ログテキストエリア
-        self.log_text = QTextEdit()
+        # 検索行
+        search_layout = QHBoxLayout()
+        self.log_search_edit = QLineEdit()
+        self.log_search_edit.setFont(QFont("Helvetica", 12))
+        self.log_search_edit.setPlaceholderText("ログ全体を検索...")
+        self.log_search_edit.returnPressed.connect(self._on_search_log)
+        search_layout.addWidget(self.log_search_edit)
+
+        search_btn = QPushButton("🔍 検索")
+        search_btn.setMinimumSize(100, 30)
+        search_btn.setFont(QFont("Helvetica", 12))
+        search_btn.clicked.connect(self._on_search_log)
+        search_layout.addWidget(search_btn)
+        layout.addLayout(search_layout)
+
+        # 検索結果（検索時のみ表示）
+        self.log_search_results = QListWidget()
+        self.log_search_results.setFont(QFont("Monaco", 11))
+        self.log_search_results.setMaximumHeight(150)
+        self.log_search_results.hide()
+        layout.addWidget(self.log_search_results)
+
+        # 遡り読み込みボタン
+        self.log_older_btn = QPushButton("⬆️ さらに古いログを読み込む")
+        self.log_older_btn.setFont(QFont("Helvetica", 11))
+        self.log_older_btn.clicked.connect(self._on_load_older_log)
+        layout.addWidget(self.log_older_btn)
+
+        # ログテキストエリア（末尾の一部だけを保持し、追記を追従する）
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
         self.log_text.setFont(QFont("Monaco", 11))
         self.log_text.setMinimumHeight(400)
         self.log_text.setStyleSheet(
             """
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1E1E1E;
                 color: #D4D4D4;
                 border: 1px solid #3E3E3E;
@@ -387,8 +430,12 @@ class SettingsDialog(QDialog):
         layout.addLayout(button_layout)
         widget.setLayout(layout)
 
-        # 初回ロード
+        # 初回ロード + 追記の追従
+        self._log_reader = LogTailReader(LOG_FILE)
         self._load_log()
+        self._log_timer = QTimer(self)
+        self._log_timer.timeout.connect(self._follow_log)
+        self._log_timer.start(LOG_FOLLOW_INTERVAL_MS)
 
         return widget
 
@@ -407,7 +454,8 @@ class SettingsDialog(QDialog):
 
         # 説明
         description = QLabel(
-            "音声認識結果の特定の文字列を別の文字列に変換します。ルールは上から順番に適用されます。"
+            "音声認識結果の特定の文字列を別の文字列に変換します。"
+            "ルールは番号の順に適用されます（並べ替えは表示だけで、適用順は変わりません）。"
         )
         description.setFont(QFont("Helvetica", 11))
         description.setStyleSheet("color: gray;")
@@ -420,14 +468,33 @@ class SettingsDialog(QDialog):
         line1.setFrameShadow(QFrame.Shadow.Sunken)
         layout.addWidget(line1)
 
-        # テーブル
-        self.replacement_table = QTableWidget()
-        self.replacement_table.setColumnCount(2)
-        self.replacement_table.setHorizontalHeaderLabels(["入力", "出力"])
+        # 検索
+        search_layout = QHBoxLayout()
+        self.replacement_search_edit = QLineEdit()
+        self.replacement_search_edit.setPlaceholderText("入力・出力で絞り込み")
+        self.replacement_search_edit.setClearButtonEnabled(True)
+        self.replacement_search_edit.textChanged.connect(self._on_filter_replacement)
+        search_layout.addWidget(self.replacement_search_edit)
+        self.replacement_count_label = QLabel("")
+        self.replacement_count_label.setFont(QFont("Helvetica", 10))
+        self.replacement_count_label.setStyleSheet("color: gray;")
+        search_layout.addWidget(self.replacement_count_label)
+        layout.addLayout(search_layout)
+
+        # テーブル（表示中の行だけをモデルから引く。見出しのクリックで並べ替え）
+        self.replacement_model = ReplacementTableModel(word_replacer.dictionary)
+        self.replacement_table = QTableView()
+        self.replacement_table.setModel(self.replacement_model)
         self.replacement_table.setFont(QFont("Helvetica", 12))
         header = self.replacement_table.horizontalHeader()
         if header is not None:
             header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            header.setSortIndicatorClearable(True)
+            header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        vertical_header = self.replacement_table.verticalHeader()
+        if vertical_header is not None:
+            vertical_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.replacement_table.setSortingEnabled(True)
         self.replacement_table.setMinimumHeight(350)
         layout.addWidget(self.replacement_table)
 
@@ -529,6 +596,116 @@ class SettingsDialog(QDialog):
 
         return widget
 
+    def refresh(self) -> None:
+        """
+        再表示時に最新の状態を読み込む（事前起動モード用）。
+        非表示の間にメインプロセスや別の画面が保存した設定・ルール・履歴を読み直す。
+        """
+        self.status_label.setText("")
+        self.replacement_status_label.setText("")
+        config.reload()
+        self.api_key_edit.setText(config.gemini_api_key)
+        self.model_edit.setText(config.gemini_model)
+        self.text_edit.setPlainText(config.gemini_prompt)
+        self._show_gemini_status()
+        word_replacer.reload()
+        self._load_replacement_rules()
+        self._history_cursors = [None]
+        self._load_history_page()
+        self._load_log()
+
+    def _show_gemini_status(self) -> None:
+        """Gemini補正の有効/無効を表示"""
+        if config.gemini_enabled:
+            self.gemini_status_label.setText("✅ Gemini補正: 有効")
+            self.gemini_status_label.setStyleSheet("color: #4CAF50;")
+        else:
+            self.gemini_status_label.setText("⚠️ Gemini補正: 無効（APIキーを設定してください）")
+            self.gemini_status_label.setStyleSheet("color: #FF9800;")
+
+    def _notify_change(self, change: str) -> None:
+        """メインプロセスへ設定変更を通知（失敗しても保存自体は成功扱い）"""
+        if self._notify is None:
+            return
+        try:
+            self._notify(change)
+        except Exception:
+            pass
+
+    def _create_history_tab(self) -> QWidget:
+        """履歴タブを作成"""
+        widget = QWidget()
+        layout = QVBoxLayout()
+        layout.setSpacing(15)
+        layout.setContentsMargins(25, 25, 25, 25)
+
+        # ヘッダー
+        header = QLabel("🕘 発話履歴")
+        header.setFont(QFont("Helvetica", 18, QFont.Weight.Bold))
+        header.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(header)
+
+        # 検索行
+        search_layout = QHBoxLayout()
+        self.history_search_edit = QLineEdit()
+        self.history_search_edit.setFont(QFont("Helvetica", 12))
+        self.history_search_edit.setPlaceholderText("音声認識・補正結果を検索...")
+        self.history_search_edit.returnPressed.connect(self._on_search_history)
+        search_layout.addWidget(self.history_search_edit)
+
+        search_btn = QPushButton("🔍 検索")
+        search_btn.setMinimumSize(100, 30)
+        search_btn.setFont(QFont("Helvetica", 12))
+        search_btn.clicked.connect(self._on_search_history)
+        search_layout.addWidget(search_btn)
+        layout.addLayout(search_layout)
+
+        # テーブル（1ページぶんだけ保持）
+        self.history_table = QTableWidget()
+        self.history_table.setColumnCount(5)
+        self.history_table.setHorizontalHeaderLabels(
+            ["日時", "音声認識", "Gemini補正", "入力テキスト", "処理時間"]
+        )
+        self.history_table.setFont(QFont("Helvetica", 11))
+        self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        header_view = self.history_table.horizontalHeader()
+        if header_view is not None:
+            header_view.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            header_view.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
+            header_view.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)
+        self.history_table.setMinimumHeight(350)
+        layout.addWidget(self.history_table)
+
+        # ページ送り
+        page_layout = QHBoxLayout()
+        self.history_prev_btn = QPushButton("◀ 新しい")
+        self.history_prev_btn.setFont(QFont("Helvetica", 12))
+        self.history_prev_btn.clicked.connect(self._on_history_prev)
+        page_layout.addWidget(self.history_prev_btn)
+
+        page_layout.addStretch()
+        self.history_page_label = QLabel("")
+        self.history_page_label.setFont(QFont("Helvetica", 10))
+        self.history_page_label.setStyleSheet("color: gray;")
+        page_layout.addWidget(self.history_page_label)
+        page_layout.addStretch()
+
+        self.history_next_btn = QPushButton("古い ▶")
+        self.history_next_btn.setFont(QFont("Helvetica", 12))
+        self.history_next_btn.clicked.connect(self._on_history_next)
+        page_layout.addWidget(self.history_next_btn)
+        layout.addLayout(page_layout)
+
+        widget.setLayout(layout)
+
+        # キーセットページング: 各ページの before_id を積んでおき「新しい」で戻る
+        self._history_cursors: List[Optional[int]] = [None]
+        self._history_next_cursor: Optional[int] = None
+        self._history_query = ""
+        self._load_history_page()
+
+        return widget
+
     # ========== 設定タブのアクション ==========
 
     def _on_save_gemini(self) -> None:
@@ -544,12 +721,8 @@ class SettingsDialog(QDialog):
         try:
             config.save_gemini_settings(api_key, model)
             gemini.reset_client()
-            if config.gemini_enabled:
-                self.gemini_status_label.setText("✅ Gemini補正: 有効")
-                self.gemini_status_label.setStyleSheet("color: #4CAF50;")
-            else:
-                self.gemini_status_label.setText("⚠️ Gemini補正: 無効（APIキーを設定してください）")
-                self.gemini_status_label.setStyleSheet("color: #FF9800;")
+            self._notify_change(CHANGE_CONFIG)
+            self._show_gemini_status()
         except Exception as ex:
             self.gemini_status_label.setText(f"❌ 保存エラー: {ex}")
             self.gemini_status_label.setStyleSheet("color: red;")
@@ -579,6 +752,7 @@ class SettingsDialog(QDialog):
 
         try:
             config.save_prompt(new_prompt)
+            self._notify_change(CHANGE_CONFIG)
             self.status_label.setText(
                 "✅ プロンプトを保存しました。次回の音声入力から反映されます。"
             )
@@ -600,6 +774,7 @@ class SettingsDialog(QDialog):
         if reply == QMessageBox.StandardButton.Yes:
             try:
                 default_prompt = config.reset_prompt_to_default()
+                self._notify_change(CHANGE_CONFIG)
                 self.text_edit.setPlainText(default_prompt)
                 self.status_label.setText("✅ デフォルトプロンプトに戻しました")
                 self.status_label.setStyleSheet("color: #4CAF50;")
@@ -610,44 +785,45 @@ class SettingsDialog(QDialog):
     # ========== ワード変換タブのアクション ==========
 
     def _load_replacement_rules(self) -> None:
-        """ワード変換ルールをテーブルに読み込む"""
-        rules = word_replacer.get_rules()
-        self.replacement_table.setRowCount(len(rules))
-        for row, (input_word, output_word) in enumerate(rules):
-            self.replacement_table.setItem(row, 0, QTableWidgetItem(input_word))
-            self.replacement_table.setItem(row, 1, QTableWidgetItem(output_word))
+        """ワード変換ルールを読み込み直す（辞書を参照するだけなので件数によらず一定時間）"""
+        self.replacement_model.reset(word_replacer.dictionary)
+        self._update_replacement_count()
+
+    def _update_replacement_count(self) -> None:
+        editor = self.replacement_model.editor
+        if editor.query:
+            self.replacement_count_label.setText(f"{len(editor)} / {editor.total} 件")
+        else:
+            self.replacement_count_label.setText(f"{editor.total} 件")
+
+    def _on_filter_replacement(self, text: str) -> None:
+        """入力のたびに絞り込む"""
+        self.replacement_model.set_filter(text.strip())
+        self._update_replacement_count()
 
     def _on_add_replacement_row(self) -> None:
         """空行を末尾に追加"""
-        row = self.replacement_table.rowCount()
-        self.replacement_table.insertRow(row)
-        self.replacement_table.setItem(row, 0, QTableWidgetItem(""))
-        self.replacement_table.setItem(row, 1, QTableWidgetItem(""))
-        self.replacement_table.editItem(self.replacement_table.item(row, 0))
+        row = self.replacement_model.append_row()
+        index = self.replacement_model.index(row, 0)
+        self.replacement_table.scrollTo(index)
+        self.replacement_table.setCurrentIndex(index)
+        self.replacement_table.edit(index)
+        self._update_replacement_count()
 
     def _on_delete_replacement_row(self) -> None:
         """選択行を削除"""
-        selected_rows = sorted(
-            {index.row() for index in self.replacement_table.selectedIndexes()},
-            reverse=True,
+        self.replacement_model.remove_rows(
+            [index.row() for index in self.replacement_table.selectedIndexes()]
         )
-        for row in selected_rows:
-            self.replacement_table.removeRow(row)
+        self._update_replacement_count()
 
     def _on_save_replacement(self) -> None:
-        """ワード変換ルールを保存"""
-        rules = []
-        for row in range(self.replacement_table.rowCount()):
-            input_item = self.replacement_table.item(row, 0)
-            output_item = self.replacement_table.item(row, 1)
-            input_word = input_item.text().strip() if input_item else ""
-            output_word = output_item.text().strip() if output_item else ""
-            if input_word:
-                rules.append((input_word, output_word))
-
+        """ワード変換ルールを保存（変更した行だけを渡す）"""
+        editor = self.replacement_model.editor
         try:
-            word_replacer.set_rules(rules)
-            word_replacer.save_csv()
+            word_replacer.apply_changes(editor.base, editor.changes())
+            self._load_replacement_rules()
+            self._notify_change(CHANGE_REPLACEMENT)
             self.replacement_status_label.setText("✅ 保存しました")
             self.replacement_status_label.setStyleSheet("color: #4CAF50;")
         except Exception as ex:
@@ -657,22 +833,81 @@ class SettingsDialog(QDialog):
     # ========== ログタブのアクション ==========
 
     def _load_log(self) -> None:
-        """ログファイルを読み込んで表示"""
+        """ログファイルの末尾だけを読み込んで表示"""
         try:
             if LOG_FILE.exists():
-                with open(LOG_FILE, "r", encoding="utf-8") as f:
-                    log_content = f.read()
-                    self.log_text.setPlainText(log_content)
-                    # 最後の行にスクロール
-                    cursor = self.log_text.textCursor()
-                    cursor.movePosition(QTextCursor.MoveOperation.End)
-                    self.log_text.setTextCursor(cursor)
+                lines = self._log_reader.tail(LOG_PAGE_LINES)
+                self.log_text.setPlainText("\n".join(lines))
+                # 最後の行にスクロール
+                self._scroll_log_to_end()
             else:
+                self._log_reader.tail(0)
                 self.log_text.setPlainText(
                     "ログファイルがまだ作成されていません。\n音声入力を開始するとログが記録されます。"
                 )
         except Exception as ex:
             self.log_text.setPlainText(f"エラー: ログファイルの読み込みに失敗しました\n{ex}")
+        self.log_older_btn.setEnabled(not self._log_reader.at_beginning)
+
+    def _scroll_log_to_end(self) -> None:
+        cursor = self.log_text.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        self.log_text.setTextCursor(cursor)
+
+    def _on_load_older_log(self) -> None:
+        """読み込み済み範囲より前のログを先頭に追加（遡りページング）"""
+        try:
+            lines = self._log_reader.older(LOG_PAGE_LINES)
+        except Exception as ex:
+            self.log_text.appendPlainText(f"エラー: ログの読み込みに失敗しました: {ex}")
+            return
+        if lines:
+            scrollbar = self.log_text.verticalScrollBar()
+            distance_from_bottom = scrollbar.maximum() - scrollbar.value()
+            cursor = QTextCursor(self.log_text.document())
+            cursor.movePosition(QTextCursor.MoveOperation.Start)
+            cursor.insertText("\n".join(lines) + "\n")
+            # 表示位置を保つ
+            scrollbar.setValue(scrollbar.maximum() - distance_from_bottom)
+        self.log_older_btn.setEnabled(not self._log_reader.at_beginning)
+
+    def _follow_log(self) -> None:
+        """追記されたログを末尾に追加（表示中のみ）"""
+        if not self.isVisible():
+            return
+        try:
+            lines, rotated = self._log_reader.follow()
+        except Exception:
+            return
+        if rotated:
+            self._load_log()
+            return
+        if not lines:
+            return
+        scrollbar = self.log_text.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        for line in lines:
+            self.log_text.appendPlainText(line)
+        if at_bottom:
+            self._scroll_log_to_end()
+
+    def _on_search_log(self) -> None:
+        """ログ全体を検索して結果を一覧表示"""
+        query = self.log_search_edit.text()
+        self.log_search_results.clear()
+        if not query:
+            self.log_search_results.hide()
+            return
+        try:
+            results = self._log_reader.search(query, limit=LOG_SEARCH_LIMIT)
+        except Exception as ex:
+            results = []
+            self.log_search_results.addItem(f"エラー: 検索に失敗しました: {ex}")
+        for line_no, line in results:
+            self.log_search_results.addItem(f"{line_no}: {line}")
+        if not results and self.log_search_results.count() == 0:
+            self.log_search_results.addItem("一致する行はありません")
+        self.log_search_results.show()
 
     def _on_refresh_log(self) -> None:
         """ログを更新"""
@@ -692,6 +927,61 @@ class SettingsDialog(QDialog):
             try:
                 if LOG_FILE.exists():
                     LOG_FILE.unlink()
+                self._log_reader.tail(0)
                 self.log_text.setPlainText("ログをクリアしました。")
             except Exception as ex:
                 self.log_text.setPlainText(f"エラー: ログのクリアに失敗しました\n{ex}")
+
+    # ========== 履歴タブのアクション ==========
+
+    def _load_history_page(self) -> None:
+        """現在のカーソル位置から1ページぶんの履歴を読み込む"""
+        try:
+            entries = get_history().page(
+                before_id=self._history_cursors[-1],
+                limit=HISTORY_PAGE_SIZE,
+                query=self._history_query,
+            )
+        except Exception as ex:
+            entries = []
+            self.history_page_label.setText(f"❌ 読み込みエラー: {ex}")
+
+        self.history_table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            values = [
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.created_at)),
+                entry.raw_text,
+                entry.corrected_text,
+                entry.replaced_text,
+                f"{entry.total_ms:.0f} ms",
+            ]
+            for col, value in enumerate(values):
+                self.history_table.setItem(row, col, QTableWidgetItem(value))
+
+        page_no = len(self._history_cursors)
+        self._history_next_cursor = entries[-1].id if len(entries) == HISTORY_PAGE_SIZE else None
+        self.history_prev_btn.setEnabled(page_no > 1)
+        self.history_next_btn.setEnabled(self._history_next_cursor is not None)
+        if entries:
+            self.history_page_label.setText(f"{page_no} ページ目")
+        elif not self.history_page_label.text().startswith("❌"):
+            self.history_page_label.setText("履歴はありません")
+
+    def _on_search_history(self) -> None:
+        """検索語を変えて先頭ページから読み込む"""
+        self._history_query = self.history_search_edit.text().strip()
+        self._history_cursors = [None]
+        self._load_history_page()
+
+    def _on_history_next(self) -> None:
+        """古い履歴のページへ"""
+        if self._history_next_cursor is None:
+            return
+        self._history_cursors.append(self._history_next_cursor)
+        self._load_history_page()
+
+    def _on_history_prev(self) -> None:
+        """新しい履歴のページへ"""
+        if len(self._history_cursors) > 1:
+            self._history_cursors.pop()
+            self._load_history_page()